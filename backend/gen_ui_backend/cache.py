@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from gen_ui_backend.metrics import llm_cache_lookups
+
+# Words which don't change what a request asks for ("show me the canned fruit" and
+# "canned fruit please"). Negations, comparisons and conjunctions are not among them.
+STOPWORDS = frozenset(
+    """a all an any are be can could display do get give i is it just let list me
+    my of our please see show some that the their them there these this those to us
+    want we what which would you""".split()
+)
+
+
+class LRUCache:
+    """A thread-safe LRU cache whose entries optionally expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def connect_shared(path: str) -> sqlite3.Connection:
+    """Open a SQLite file which several worker processes read and write at once.
+
+    Write-ahead logging lets readers carry on while one process writes, and writers
+    wait for each other's locks instead of failing.
+    """
+    db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def content_words(text: str) -> List[str]:
+    """The words of `text` other than stop-words, lowercased and in order."""
+    return [w for w in re.findall(r"\w+", text.lower()) if w not in STOPWORDS]
+
+
+class HashingEmbeddings:
+    """Local bag-of-words and character trigram embeddings, hashed into a fixed size.
+
+    These need no model or network access, and are good enough to tell that two short
+    requests are rephrasings of each other.
+    """
+
+    def __init__(self, size: int = 1024) -> None:
+        self.size = size
+
+    def _index(self, feature: str) -> int:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.size
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.size, dtype=np.float32)
+        text = " ".join(re.findall(r"\w+", text.lower()))
+        for word in text.split():
+            vector[self._index("w:" + word)] += 1.0
+        padded = f" {text} "
+        for i in range(len(padded) - 2):
+            vector[self._index("c:" + padded[i : i + 3])] += 0.5
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+IndexedText = Tuple[np.ndarray, FrozenSet[str]]
+
+
+def _split_prompt(prompt: str) -> Tuple[str, str]:
+    """Split a serialized chat prompt into (fixed instructions, user text)."""
+    try:
+        messages = json.loads(prompt)
+    except json.JSONDecodeError:
+        return "", prompt
+    fixed, user = [], []
+    for message in messages if isinstance(messages, list) else []:
+        kind = message.get("id", [""])[-1]
+        content = message.get("kwargs", {}).get("content", "")
+        (user if kind == "HumanMessage" else fixed).append(str(content))
+    return "\n".join(fixed), "\n".join(user)
+
+
+def mark_cached(generations: List[Any]) -> List[Any]:
+    """Copies of cached generations with `cached` set in their `generation_info`.
+
+    Chat models return cache hits as they were stored, usage metadata included, so
+    this is how callbacks (e.g. the token metrics) tell them from billed calls.
+    """
+    marked = []
+    for generation in generations:
+        info = {**(generation.generation_info or {}), "cached": True}
+        marked.append(generation.copy(update={"generation_info": info}))
+    return marked
+
+
+class LLMResponseCache(BaseCache):
+    """Two-tier LLM response cache.
+
+    The exact tier is keyed by a hash of the prompt and the llm string, which covers the
+    model, its parameters and any bound tool / structured output schema. The semantic
+    tier, off unless `similarity_threshold` is set, only applies to prompts with the
+    same llm string, system messages and numbers. It returns the response to the most
+    similar earlier user message if the two differ in stop-words only, and the cosine
+    similarity of their other words is above `similarity_threshold`. Similar words
+    alone aren't enough: "canned" and "frozen", or "canned" and "not canned", ask for
+    different filters.
+
+    Set `path` to also persist entries to a SQLite file, so they survive restarts and
+    are shared by the worker processes using the same file: each picks up the entries
+    the others added before a semantic lookup. Each write deletes the file's expired
+    rows, and its oldest ones beyond `max_rows`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = None,
+        path: Optional[str] = None,
+        embeddings: Optional[HashingEmbeddings] = None,
+        max_rows: int = 10_000,
+    ) -> None:
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = embeddings or HashingEmbeddings()
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        # Partition -> entry key -> embedding and content words of its user message.
+        self._vectors: Dict[str, "OrderedDict[str, IndexedText]"] = {}
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._synced_rowid = 0
+        if path:
+            self._db = connect_shared(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, partition TEXT, text TEXT, value TEXT, created REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created)"
+            )
+            self._db.commit()
+            self._load_semantic_index(maxsize)
+
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache":
+        """Configure a cache from the `LLM_CACHE_*` environment variables."""
+        ttl = os.environ.get("LLM_CACHE_TTL")
+        threshold = os.environ.get("LLM_CACHE_SIMILARITY")
+        return cls(
+            maxsize=int(os.environ.get("LLM_CACHE_SIZE", "1024")),
+            ttl=float(ttl) if ttl else None,
+            similarity_threshold=float(threshold) if threshold else None,
+            path=os.environ.get("LLM_CACHE_PATH") or None,
+            max_rows=int(os.environ.get("LLM_CACHE_MAX_ROWS", "10000")),
+        )
+
+    @staticmethod
+    def _keys(prompt: str, llm_string: str) -> Tuple[str, str, str]:
+        key = hashlib.sha256(f"{prompt}\x00{llm_string}".encode()).hexdigest()
+        fixed, text = _split_prompt(prompt)
+        # Numbers carry meaning ("under $2" vs "under $3"), so they are never fuzzy-matched.
+        numbers = " ".join(sorted(re.findall(r"\d+(?:\.\d+)?", text)))
+        partition = hashlib.sha256(
+            f"{llm_string}\x00{fixed}\x00{numbers}".encode()
+        ).hexdigest()
+        return key, partition, text
+
+    def _load_semantic_index(self, maxsize: int) -> None:
+        assert self._db is not None
+        rows = self._db.execute(
+            "SELECT rowid, key, partition, text FROM llm_cache "
+            "ORDER BY created DESC LIMIT ?",
+            (maxsize,),
+        ).fetchall()
+        for rowid, key, partition, text in reversed(rows):
+            self._add_vector(partition, key, text)
+        self._synced_rowid = max((row[0] for row in rows), default=0)
+
+    def _sync_semantic_index(self) -> None:
+        """Index the entries other processes have written to the file since last time."""
+        if self._db is None or self.similarity_threshold is None:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, key, partition, text FROM llm_cache WHERE rowid > ? "
+                "ORDER BY rowid",
+                (self._synced_rowid,),
+            ).fetchall()
+            if rows:
+                self._synced_rowid = rows[-1][0]
+            # The rows include this process's own entries, which are already indexed.
+            new = [row for row in rows if row[1] not in self._vectors.get(row[2], ())]
+        for _, key, partition, text in new:
+            self._add_vector(partition, key, text)
+
+    def _add_vector(self, partition: str, key: str, text: str) -> None:
+        if self.similarity_threshold is None:
+            return
+        words = content_words(text)
+        vector = self.embeddings.embed(" ".join(words))
+        with self._lock:
+            vectors = self._vectors.setdefault(partition, OrderedDict())
+            vectors[key] = (vector, frozenset(words))
+            while len(vectors) > self._entries.maxsize:
+                vectors.popitem(last=False)
+
+    def _get(self, key: str) -> Optional[List[Any]]:
+        value = self._entries.get(key)
+        if value is not None or self._db is None:
+            return value
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl is not None and row[1] + self.ttl < time.time()):
+            return None
+        value = [loads(item) for item in json.loads(row[0])]
+        self._entries.set(key, value)
+        return value
+
+    def _most_similar(self, partition: str, text: str) -> Optional[str]:
+        with self._lock:
+            vectors = self._vectors.get(partition)
+            if not vectors:
+                return None
+            keys = list(vectors)
+            entries = list(vectors.values())
+        words = content_words(text)
+        scores = np.stack([vector for vector, _ in entries]) @ self.embeddings.embed(
+            " ".join(words)
+        )
+        for best in np.argsort(-scores):
+            if scores[best] < self.similarity_threshold:
+                break
+            if entries[best][1] == frozenset(words):
+                return keys[best]
+        return None
+
+    def _count(self, result: str) -> None:
+        self.stats[result] += 1
+        llm_cache_lookups.inc(result=result)
+
+    def report(self) -> Dict[str, Any]:
+        lookups = sum(self.stats.values())
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return {
+            **self.stats,
+            "hit_rate": hits / lookups if lookups else None,
+            "entries": len(self._entries),
+            "semantic": self.similarity_threshold is not None,
+        }
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key, partition, text = self._keys(prompt, llm_string)
+        value = self._get(key)
+        if value is not None:
+            self._count("exact_hits")
+            return mark_cached(value)
+
+        if self.similarity_threshold is not None:
+            self._sync_semantic_index()
+            similar_key = self._most_similar(partition, text)
+            value = self._get(similar_key) if similar_key else None
+            if value is not None:
+                self._count("semantic_hits")
+                return mark_cached(value)
+
+        self._count("misses")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key, partition, text = self._keys(prompt, llm_string)
+        self._entries.set(key, list(return_val))
+        self._add_vector(partition, key, text)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        partition,
+                        text,
+                        json.dumps([dumps(item) for item in return_val]),
+                        time.time(),
+                    ),
+                )
+                self._prune()
+                self._db.commit()
+
+    def _prune(self) -> None:
+        """Delete the file's expired rows, and the oldest beyond `max_rows`.
+
+        The row just written is the newest, so the largest rowid, which other
+        processes sync from, is never deleted.
+        """
+        assert self._db is not None
+        if self.ttl is not None:
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,)
+            )
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self._entries.clear()
+        with self._lock:
+            self._vectors.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
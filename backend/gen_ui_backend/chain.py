@@ -1,24 +1,28 @@
-from typing import List, Optional, TypedDict
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Dict, List, Optional, TypedDict
 
 from langchain.output_parsers.openai_tools import JsonOutputToolsParser
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import merge_configs
 from langgraph.graph import END, StateGraph
 from langgraph.graph.graph import CompiledGraph
 
-from gen_ui_backend.tools.github import github_repo
-from gen_ui_backend.tools.invoice import invoice_parser
-from gen_ui_backend.tools.weather import weather_data
-from gen_ui_backend.charts.chain import create_graph
 from gen_ui_backend.charts.schema import (
     ChartType,
     DataDisplayTypeAndDescription,
     Filter,
-    Order,
-    filter_schema,
+    Fruits,
 )
+from gen_ui_backend.models import cached_chain, get_chat_model
+from gen_ui_backend.tools.github import github_repo
+from gen_ui_backend.tools.invoice import invoice_parser
+from gen_ui_backend.tools.weather import weather_data
 
 class GenerativeUIState(TypedDict, total=False):
     input: HumanMessage
@@ -27,10 +31,10 @@ class GenerativeUIState(TypedDict, total=False):
     tool_calls: Optional[List[dict]]
     """A list of parsed tool calls."""
     tool_result: Optional[dict]
-    """The result of a tool call."""
+    """The result of each tool call, keyed by tool call id."""
     display_formats: List[DataDisplayTypeAndDescription]
     """The types of display formats available for the chart."""
-    orders: List[Order]
+    orders: List[Fruits]
     """List of orders to process."""
     selected_filters: Optional[List[Filter]]
     """The filters generated by the LLM to apply to the orders."""
@@ -43,29 +47,46 @@ class GenerativeUIState(TypedDict, total=False):
 
 
 
-def invoke_model(state: GenerativeUIState, config: RunnableConfig) -> GenerativeUIState:
-    tools_parser = JsonOutputToolsParser()
-    initial_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are a helpful assistant. You're provided a list of tools, and an input from the user.\n"
-                + "Your job is to determine whether or not you have a tool which can handle the users input, or respond with plain text.",
-            ),
-            MessagesPlaceholder("input"),
-        ]
-    )
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0, streaming=True)
+INITIAL_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a helpful assistant. You're provided a list of tools, and an input from the user.\n"
+            + "Your job is to determine whether or not you have a tool which can handle the users input, or respond with plain text.",
+        ),
+        MessagesPlaceholder("input"),
+    ]
+)
+
+TOOLS_PARSER = JsonOutputToolsParser(return_id=True)
+
+
+@cached_chain
+def tools_chain() -> Runnable:
+    model = get_chat_model(streaming=True)
     tools = [github_repo, invoice_parser, weather_data]
     model_with_tools = model.bind_tools(tools)
-    chain = initial_prompt | model_with_tools
-    result = chain.invoke({"input": state["input"]}, config)
+    return INITIAL_PROMPT | model_with_tools
+
+
+def invoke_model(state: GenerativeUIState, config: RunnableConfig) -> GenerativeUIState:
+    result = tools_chain().invoke({"input": state["input"]}, config)
+    return model_result(result, config)
+
+
+async def ainvoke_model(
+    state: GenerativeUIState, config: RunnableConfig
+) -> GenerativeUIState:
+    result = await tools_chain().ainvoke({"input": state["input"]}, config)
+    return model_result(result, config)
+
 
+def model_result(result: object, config: RunnableConfig) -> GenerativeUIState:
     if not isinstance(result, AIMessage):
         raise ValueError("Invalid result from model. Expected AIMessage.")
 
     if isinstance(result.tool_calls, list) and len(result.tool_calls) > 0:
-        parsed_tools = tools_parser.invoke(result, config)
+        parsed_tools = TOOLS_PARSER.invoke(result, config)
         return {"tool_calls": parsed_tools}
     else:
         return {"result": str(result.content)}
@@ -80,20 +101,97 @@ def invoke_tools_or_return(state: GenerativeUIState) -> str:
         raise ValueError("Invalid state. No result or tool calls found.")
 
 
-def invoke_tools(state: GenerativeUIState) -> GenerativeUIState:
-    tools_map = {
-        "github-repo": github_repo,
-        "invoice-parser": invoice_parser,
-        "weather-data": weather_data,
-    }
+TOOLS_MAP = {
+    "github-repo": github_repo,
+    "invoice-parser": invoice_parser,
+    "weather-data": weather_data,
+}
 
-    if state["tool_calls"] is not None:
-        tool = state["tool_calls"][0]
-        selected_tool = tools_map[tool["type"]]
-        return {"tool_result": selected_tool.invoke(tool["args"])}
-    else:
+
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "30"))
+
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "github-repo": min(TOOL_TIMEOUT, 10),
+    "invoice-parser": min(TOOL_TIMEOUT, 5),
+    "weather-data": TOOL_TIMEOUT,
+}
+"""Seconds each tool may run before its call is reported as timed out."""
+
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", "32"))
+"""Threads shared by every request's sync tool calls."""
+
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def tool_config(config: RunnableConfig, tool_call: dict) -> RunnableConfig:
+    # Each tool run emits its own on_tool_end event as it finishes, so streamed events
+    # deliver partial results tagged with the call id before the node completes.
+    return merge_configs(config, {"metadata": {"tool_call_id": tool_call["id"]}})
+
+
+def tool_error(tool_call: dict, err: BaseException) -> dict:
+    if isinstance(err, (TimeoutError, asyncio.TimeoutError, FuturesTimeoutError)):
+        timeout = TOOL_TIMEOUTS[tool_call["type"]]
+        return {"error": f"{tool_call['type']} timed out after {timeout}s."}
+    return {"error": str(err)}
+
+
+def invoke_tools(state: GenerativeUIState, config: RunnableConfig) -> GenerativeUIState:
+    if state["tool_calls"] is None:
+        raise ValueError("No tool calls found in state.")
+
+    tool_calls = state["tool_calls"]
+    start = time.monotonic()
+    futures = [
+        tool_executor.submit(
+            TOOLS_MAP[tool_call["type"]].invoke,
+            tool_call["args"],
+            tool_config(config, tool_call),
+        )
+        for tool_call in tool_calls
+    ]
+
+    tool_result = {}
+    for tool_call, future in zip(tool_calls, futures):
+        deadline = start + TOOL_TIMEOUTS[tool_call["type"]]
+        try:
+            tool_result[tool_call["id"]] = future.result(
+                timeout=max(deadline - time.monotonic(), 0)
+            )
+        except Exception as err:
+            tool_result[tool_call["id"]] = tool_error(tool_call, err)
+            # Don't start a call which timed out waiting for a thread.
+            future.cancel()
+    return {"tool_result": tool_result}
+
+
+async def ainvoke_tools(
+    state: GenerativeUIState, config: RunnableConfig
+) -> GenerativeUIState:
+    if state["tool_calls"] is None:
         raise ValueError("No tool calls found in state.")
 
+    async def call(tool_call: dict) -> Any:
+        try:
+            return await asyncio.wait_for(
+                TOOLS_MAP[tool_call["type"]].ainvoke(
+                    tool_call["args"], tool_config(config, tool_call)
+                ),
+                timeout=TOOL_TIMEOUTS[tool_call["type"]],
+            )
+        except Exception as err:
+            return tool_error(tool_call, err)
+
+    results = await asyncio.gather(
+        *(call(tool_call) for tool_call in state["tool_calls"])
+    )
+    return {
+        "tool_result": {
+            tool_call["id"]: result
+            for tool_call, result in zip(state["tool_calls"], results)
+        }
+    }
+
 # class ToUpdateCharts(BaseModel):
 #     """Transfers work to a specialized assistant to update charts."""
 
@@ -115,8 +213,8 @@ def invoke_tools(state: GenerativeUIState) -> GenerativeUIState:
 def create_graph() -> CompiledGraph:
     workflow = StateGraph(GenerativeUIState)
 
-    workflow.add_node("invoke_model", invoke_model)  # type: ignore
-    workflow.add_node("invoke_tools", invoke_tools)
+    workflow.add_node("invoke_model", RunnableLambda(invoke_model, ainvoke_model))  # type: ignore
+    workflow.add_node("invoke_tools", RunnableLambda(invoke_tools, ainvoke_tools))
     workflow.add_conditional_edges("invoke_model", invoke_tools_or_return)
     workflow.set_entry_point("invoke_model")
     workflow.set_finish_point("invoke_tools")
@@ -0,0 +1,137 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from gen_ui_backend.charts.datasets import Dataset
+
+# Props shared by every pie display format (see `DISPLAY_FORMATS` in frontend/app/filters.tsx).
+PIE_SERIES = {
+    "highlightScope": {"faded": "global", "highlighted": "item"},
+    "faded": {"innerRadius": 30, "additionalRadius": -30},
+}
+PIE_LAYOUT = {
+    "margin": {"top": 10, "bottom": 10, "left": 10, "right": 10},
+    "legend": {"hidden": False},
+}
+PIE_LEGEND_SLOT_PROPS = {
+    "legend": {
+        "direction": "column",
+        "position": {"vertical": "middle", "horizontal": "right"},
+        "padding": 0,
+    },
+}
+
+
+def group_by(codes: np.ndarray, num_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Group rows by an integer code.
+
+    Returns the codes present, in order of first appearance (the key order a JS
+    `reduce` into an object gives), and the row count of every code.
+    """
+    present, first_seen = np.unique(codes, return_index=True)
+    counts = np.bincount(codes, minlength=num_groups)
+    return present[np.argsort(first_seen, kind="stable")], counts
+
+
+def descending(values: np.ndarray) -> np.ndarray:
+    """A stable descending sort order, matching `Array.prototype.sort` in the frontend."""
+    return np.argsort(-values, kind="stable")
+
+
+def average_price_by(dataset: Dataset, indices: np.ndarray, column: str) -> Dict:
+    vocab, codes = dataset.encoded(column, lowercase=False)
+    codes = codes[indices]
+    groups, counts = group_by(codes, len(vocab))
+    totals = np.bincount(
+        codes, weights=dataset.numeric("retailPrice")[indices], minlength=len(vocab)
+    )
+    averages = totals[groups] / counts[groups]
+    order = descending(averages)
+    dataset_rows = [
+        {column: label, "averagePrice": average}
+        for label, average in zip(
+            vocab[groups][order].tolist(), averages[order].tolist()
+        )
+    ]
+    return {
+        "xAxis": [{"scaleType": "band", "dataKey": column}],
+        "series": [{"dataKey": "averagePrice", "label": "Average Price"}],
+        "dataset": dataset_rows,
+    }
+
+
+def pie_props(data: List[Dict], legend_column: bool = True) -> Dict:
+    props = {"series": [{"data": data, **PIE_SERIES}], **PIE_LAYOUT}
+    if legend_column:
+        props["slotProps"] = PIE_LEGEND_SLOT_PROPS
+    return props
+
+
+def pie_slices(labels: List[str], counts: np.ndarray, sort: bool = True) -> List[Dict]:
+    """Pie slices with ids in group order, optionally sorted by count descending."""
+    order = descending(counts) if sort else np.arange(len(labels))
+    values = counts.tolist()
+    return [
+        {"id": int(i), "value": values[i], "label": labels[i]} for i in order.tolist()
+    ]
+
+
+def bar_average_retail_price_by_fruit(dataset: Dataset, indices: np.ndarray) -> Dict:
+    return average_price_by(dataset, indices, "name")
+
+
+def bar_average_retail_price_by_form(dataset: Dataset, indices: np.ndarray) -> Dict:
+    return average_price_by(dataset, indices, "form")
+
+
+def pie_fruit_form_distribution(dataset: Dataset, indices: np.ndarray) -> Dict:
+    vocab, codes = dataset.encoded("form", lowercase=False)
+    groups, counts = group_by(codes[indices], len(vocab))
+    labels = [form[:1].upper() + form[1:] for form in vocab[groups].tolist()]
+    return pie_props(
+        pie_slices(labels, counts[groups], sort=False), legend_column=False
+    )
+
+
+def fruit_pie(dataset: Dataset, indices: np.ndarray) -> Dict:
+    vocab, codes = dataset.encoded("name", lowercase=False)
+    groups, counts = group_by(codes[indices], len(vocab))
+    return pie_props(pie_slices(vocab[groups].tolist(), counts[groups]))
+
+
+def retail_price_pie(dataset: Dataset, indices: np.ndarray) -> Dict:
+    # `Math.round` rounds halves up, unlike `np.round`.
+    buckets = np.floor(dataset.numeric("retailPrice")[indices] + 0.5).astype(np.int64)
+    # Integer-like keys of a JS object iterate in ascending order, so the slice ids
+    # follow the sorted buckets rather than the order they first appear in.
+    groups, codes = np.unique(buckets, return_inverse=True)
+    counts = np.bincount(codes.ravel(), minlength=len(groups))
+    labels = [str(bucket) for bucket in groups.tolist()]
+    return pie_props(pie_slices(labels, counts))
+
+
+AGGREGATIONS: Dict[str, Callable[[Dataset, np.ndarray], Dict]] = {
+    "bar_average_retail_price_by_fruit": bar_average_retail_price_by_fruit,
+    "bar_average_retail_price_by_form": bar_average_retail_price_by_form,
+    "pie_fruit_form_distribution": pie_fruit_form_distribution,
+    "fruit_pie": fruit_pie,
+    "retail_price_pie": retail_price_pie,
+}
+"""Chart props builders, keyed by display format key.
+
+Each mirrors the `propsFn` of the same key in the frontend's `DISPLAY_FORMATS`, so the
+chart can be rendered from the (per-group sized) props instead of every filtered row.
+"""
+
+
+def aggregate(
+    dataset: Dataset, indices: np.ndarray, display_format: Optional[str]
+) -> Optional[Dict]:
+    """Build the chart props for `display_format` over the rows at `indices`.
+
+    Returns None for display formats without a server-side aggregation.
+    """
+    builder = AGGREGATIONS.get(display_format or "")
+    if builder is None:
+        return None
+    return builder(dataset, np.asarray(indices, dtype=np.intp))
@@ -0,0 +1,170 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from gen_ui_backend.charts.chain import (
+    AgentExecutorState,
+    chart_props,
+    chart_type_chain,
+    chart_type_input,
+    display_format_chain_and_input,
+    filters_chain,
+    get_product_names,
+    get_table,
+)
+from gen_ui_backend.charts.fast_path import fast_path_filters
+from gen_ui_backend.charts.filters import filter_indices
+from gen_ui_backend.charts.views import filter_key
+from gen_ui_backend.scheduler import BATCH, priority
+
+BATCH_MAX_CONCURRENCY = int(os.environ.get("CHARTS_BATCH_MAX_CONCURRENCY", 8))
+"""How many calls each LLM stage of a batch may have in flight at once, at most."""
+
+
+def unique_inputs(inputs: List[str]) -> Dict[str, List[int]]:
+    """Map each distinct (whitespace-trimmed) input to its positions in `inputs`."""
+    positions: Dict[str, List[int]] = {}
+    for i, text in enumerate(inputs):
+        positions.setdefault(text.strip(), []).append(i)
+    return positions
+
+
+async def agenerate_all_filters(
+    state: AgentExecutorState, texts: List[str], config: RunnableConfig
+) -> List[Any]:
+    """Filters for every input: from the fast path where possible, else one LLM batch."""
+    table = get_table(state)
+    results: List[Any] = [fast_path_filters(text, table) for text in texts]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        chain = filters_chain(tuple(get_product_names(state)))
+        outputs = await chain.abatch(
+            [texts[i] for i in pending], config, return_exceptions=True
+        )
+        for i, output in zip(pending, outputs):
+            results[i] = output
+    return results
+
+
+async def agenerate_all_chart_types(
+    state: AgentExecutorState, texts: List[str], config: RunnableConfig
+) -> List[Any]:
+    inputs = [chart_type_input({**state, "input": {"content": text}}) for text in texts]
+    outputs = await chart_type_chain().abatch(inputs, config, return_exceptions=True)
+    return [
+        output if isinstance(output, Exception) else output.chart_type
+        for output in outputs
+    ]
+
+
+async def astream_batch(
+    state: AgentExecutorState,
+    inputs: List[str],
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[Dict]:
+    """Run the chart graph's stages for many magic filter inputs on one dataset.
+
+    `state` holds what the inputs share (`dataset_id` or `fruits`, and
+    `display_formats`). Identical inputs are run once, each LLM stage is batched
+    with at most `max_concurrency` calls in flight (at batch priority, and never more
+    than BATCH_MAX_CONCURRENCY), and filtering and aggregation run once per distinct
+    filter set. Results are yielded as each input completes, with the positions in
+    `inputs` it answers.
+    """
+    config: RunnableConfig = {
+        "max_concurrency": min(
+            max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY
+        )
+    }
+    positions = unique_inputs(inputs)
+    texts = list(positions)
+
+    # Like the parallel graph, chart types don't wait for the filters. Interactive
+    # requests' model calls go first.
+    with priority(BATCH):
+        all_filters, chart_types = await asyncio.gather(
+            agenerate_all_filters(state, texts, config),
+            agenerate_all_chart_types(state, texts, config),
+        )
+
+    def result(i: int, **fields: Any) -> Dict:
+        return {"input": texts[i], "positions": positions[texts[i]], **fields}
+
+    # Group the display format calls by chart type, as each has its own schema.
+    groups: Dict[Any, List[Tuple[int, AgentExecutorState]]] = {}
+    for i, text in enumerate(texts):
+        for output in (all_filters[i], chart_types[i]):
+            if isinstance(output, Exception):
+                yield result(i, error=str(output))
+                break
+        else:
+            item_state: AgentExecutorState = {
+                **state,
+                "input": {"content": text},
+                "selected_filters": all_filters[i],
+                "chart_type": chart_types[i],
+            }
+            groups.setdefault(chart_types[i], []).append((i, item_state))
+
+    table = get_table(state)
+    selections: Dict[str, Any] = {}
+    charts: Dict[Tuple[str, Any], Optional[Dict]] = {}
+
+    async def display_formats(
+        items: List[Tuple[int, AgentExecutorState]],
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        chain = display_format_chain_and_input(items[0][1])[0]
+        batch = [display_format_chain_and_input(s)[1] for _, s in items]
+        async for j, output in chain.abatch_as_completed(
+            batch, config, return_exceptions=True
+        ):
+            yield items[j][0], output
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def drain(items: List[Tuple[int, AgentExecutorState]]) -> None:
+        answered = set()
+        try:
+            async for i, output in display_formats(items):
+                answered.add(i)
+                await queue.put((i, output))
+        except Exception as e:
+            # Every input still gets its item, or the loop below would wait forever.
+            for i, _ in items:
+                if i not in answered:
+                    await queue.put((i, e))
+
+    with priority(BATCH):
+        tasks = [asyncio.create_task(drain(items)) for items in groups.values()]
+    try:
+        for _ in range(sum(len(items) for items in groups.values())):
+            i, output = await queue.get()
+            if isinstance(output, Exception):
+                yield result(i, error=str(output))
+                continue
+            selected_filters = all_filters[i]
+            key = filter_key(selected_filters)
+            chart_key = (key, output.display_key)
+            try:
+                if key not in selections:
+                    selections[key] = filter_indices(table, selected_filters)
+                if chart_key not in charts:
+                    charts[chart_key] = chart_props(
+                        state, selected_filters, selections[key], output.display_key
+                    )
+            except Exception as e:
+                yield result(i, error=str(e))
+                continue
+            yield result(
+                i,
+                selected_filters=selected_filters.dict() if selected_filters else None,
+                chart_type=chart_types[i],
+                display_format=output.display_key,
+                props=charts[chart_key],
+            )
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,12 +1,28 @@
-from typing import List, Literal, Optional, TypedDict
+import os
+import re
+from typing import Any, Iterable, List, Literal, Optional, Tuple, TypedDict
 
+import numpy as np
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph
 from langgraph.graph.graph import CompiledGraph
 
+from gen_ui_backend.cache import LLMResponseCache, LRUCache
+from gen_ui_backend.charts.aggregate import aggregate
+from gen_ui_backend.charts.datasets import Dataset, get_dataset
+from gen_ui_backend.charts.fast_path import fast_path_filters
+from gen_ui_backend.charts.filters import filter_indices, is_narrowing
+from gen_ui_backend.charts.prompts import (
+    COMPACT_CHART_TYPE_PROMPT,
+    COMPACT_DISPLAY_FORMAT_PROMPT,
+    COMPACT_PROMPTS,
+    compact_display_formats,
+    compact_filters,
+)
 from gen_ui_backend.charts.schema import (
     ChartType,
     DataDisplayTypeAndDescription,
@@ -14,6 +30,38 @@ from gen_ui_backend.charts.schema import (
     Fruits,
     filter_schema,
 )
+from gen_ui_backend.charts.views import filter_key, views
+from gen_ui_backend.metrics import filter_rows, instrumented_node
+from gen_ui_backend.models import cached_chain, get_chat_model
+
+GraphMode = Literal["sequential", "parallel", "single_call"]
+"""How the chart graph schedules its LLM calls.
+
+- `sequential`: filters, then chart type, then display format, one call after another.
+- `parallel`: filters and chart type are generated concurrently from the user input.
+- `single_call`: one structured-output call returns filters, chart type and display key.
+"""
+
+DEFAULT_GRAPH_MODE: GraphMode = os.environ.get("CHARTS_GRAPH_MODE", "parallel")  # type: ignore[assignment]
+
+llm_cache = LLMResponseCache.from_env()
+"""Shared response cache for the structured-output calls made by the chart nodes."""
+
+ROWS_PAGE_SIZE = int(os.environ.get("CHARTS_ROWS_PAGE_SIZE", 100))
+"""How many filtered rows each `filtered_rows` stream event carries."""
+
+ROWS_STREAM_PAGES = int(os.environ.get("CHARTS_ROWS_STREAM_PAGES", 1))
+"""How many pages of filtered rows are streamed; clients fetch more from /charts/rows."""
+
+ROWS_CACHE_SIZE = int(os.environ.get("CHARTS_ROWS_CACHE_SIZE", 32))
+"""How many filters' matching row positions are kept, least recently used first out."""
+
+selected_rows = LRUCache(maxsize=ROWS_CACHE_SIZE)
+"""Positions of the rows matching a filter, by (dataset id, version, filter key).
+
+Kept here rather than in the graph state, so they're neither returned to clients nor
+written to session checkpoints. They're recomputed once evicted.
+"""
 
 
 class AgentExecutorState(TypedDict, total=False):
@@ -21,14 +69,20 @@ class AgentExecutorState(TypedDict, total=False):
     """The user input"""
     display_formats: List[DataDisplayTypeAndDescription]
     """The types of display formats available for the chart."""
-    fruits: List[Fruits]
-    """List of orders to process."""
+    fruits: Optional[List[Fruits]]
+    """List of orders to process, cleared once the chart is built."""
+    dataset_id: Optional[str]
+    """The id of a server-side dataset to use instead of sending `fruits`."""
     selected_filters: Optional[List[Filter]]
     """The filters generated by the LLM to apply to the orders."""
+    previous_filters: Optional[Filter]
+    """In a session, the filters of the turn before this one."""
     chart_type: Optional[ChartType]
     """The type of chart which this format can be displayed on."""
     display_format: Optional[str]
     """The format to display the data in."""
+    dataset_version: Optional[str]
+    """The version of the dataset or `fruits` which `selected_filters` was applied to."""
     props: Optional[dict]
     """The props to pass to the chart component."""
 
@@ -44,43 +98,118 @@ def format_data_display_types_and_descriptions(
     ]
 
 
-def generate_filters(state: AgentExecutorState) -> AgentExecutorState:
-    
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """You are a helpful assistant. Your task is to determine the proper filters to apply, give a user input.
+request_tables = LRUCache(maxsize=64)
+"""Tables of the rows clients sent, by the id of their `fruits` list, so the nodes of a
+request (which all see the same list) build its table once."""
+
+
+def get_table(state: AgentExecutorState) -> Dataset:
+    if state.get("dataset_id"):
+        return get_dataset(state["dataset_id"])
+    fruits = state["fruits"]
+    cached = request_tables.get(id(fruits))
+    # Holding on to the list keeps its id from being reused while it's cached.
+    if cached is not None and cached[0] is fruits:
+        return cached[1]
+    table = Dataset.from_records("request", fruits)
+    request_tables.set(id(fruits), (fruits, table))
+    return table
+
+
+def get_product_names(state: AgentExecutorState) -> List[str]:
+    if state.get("dataset_id"):
+        return get_dataset(state["dataset_id"]).product_names()
+    return list(set(fruits["name"].lower() for fruits in state["fruits"]))
+
+
+FILTERS_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a helpful assistant. Your task is to determine the proper filters to apply, give a user input.
 The user input is in response to a 'magic filter' prompt. They expect their natural language description of the filters
 to be converted into a structured query. Today is July 25 2024.""",
-            ),
-            ("human", "{input}"),
-        ]
-    )
-    # print(state["fruits"])
-    unique_product_names: List[str] = list(
-        
-        set(fruits["name"].lower() for fruits in state["fruits"])
-    )
-    schema = filter_schema(unique_product_names)
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0).with_structured_output(
-        schema
-    )
-    chain = prompt | model
-    result = chain.invoke(input=state["input"]["content"])
-    # print(state['input'])
-    # print(result)
+        ),
+        ("human", "{input}"),
+    ]
+)
+
+
+REFINE_FILTERS_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a helpful assistant. Your task is to determine the proper filters to apply, give a user input.
+The user input is in response to a 'magic filter' prompt. They expect their natural language description of the filters
+to be converted into a structured query. Today is July 25 2024.
+
+The user is refining the filters they applied last: {previous_filters}
+Return the complete set of filters to apply now. Keep the previous filters unless the user changes or removes them.""",
+        ),
+        ("human", "{input}"),
+    ]
+)
+
+
+@cached_chain
+def filters_chain(product_names: Tuple[str, ...]) -> Runnable:
+    schema = filter_schema(list(product_names))
+    model = get_chat_model(cache=llm_cache).with_structured_output(schema)
+    return FILTERS_PROMPT | model
+
+
+@cached_chain
+def refine_filters_chain(product_names: Tuple[str, ...]) -> Runnable:
+    schema = filter_schema(list(product_names))
+    model = get_chat_model(cache=llm_cache).with_structured_output(schema)
+    return REFINE_FILTERS_PROMPT | model
+
+
+def filters_chain_and_input(state: AgentExecutorState) -> Tuple[Runnable, dict]:
+    product_names = tuple(get_product_names(state))
+    previous = state.get("selected_filters")
+    if previous is None:
+        return filters_chain(product_names), {"input": state["input"]["content"]}
+    return refine_filters_chain(product_names), {
+        "input": state["input"]["content"],
+        "previous_filters": previous.json(exclude_none=True),
+    }
+
+
+def filters_output(state: AgentExecutorState, result: BaseModel) -> AgentExecutorState:
     return {
-        "selected_filters": result,
+        "selected_filters": Filter(**result.dict()),
+        # Filters from an earlier turn of a session, if any.
+        "previous_filters": state.get("selected_filters"),
     }
 
 
-def generate_chart_type(state: AgentExecutorState) -> AgentExecutorState:
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """You are an expert data analyst. Your task is to determine the best type of chart to display the data based on the filters and user input.
+def generate_filters(state: AgentExecutorState) -> AgentExecutorState:
+    # Simple inputs ("frozen", "apples and pears") are parsed without the LLM.
+    result = fast_path_filters(
+        state["input"]["content"], get_table(state), state.get("selected_filters")
+    )
+    if result is None:
+        chain, input = filters_chain_and_input(state)
+        result = chain.invoke(input=input)
+    return filters_output(state, result)
+
+
+async def agenerate_filters(state: AgentExecutorState) -> AgentExecutorState:
+    result = fast_path_filters(
+        state["input"]["content"], get_table(state), state.get("selected_filters")
+    )
+    if result is None:
+        chain, input = filters_chain_and_input(state)
+        result = await chain.ainvoke(input=input)
+    return filters_output(state, result)
+
+
+CHART_TYPE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert data analyst. Your task is to determine the best type of chart to display the data based on the filters and user input.
 You are provided with three chart types: 'bar', 'line', and 'pie'. You will always display a table. 
 The data which is being filtered is a set of orders from an online store.
 The user has submitted an input that describes the filters they'd like to apply to the data.
@@ -91,48 +220,87 @@ to only display the table.
 Data display types: {data_display_types_and_descriptions}
 
 Based on their input and the filters that have been generated, select the best type of chart to display the data.""",
-            ),
-            (
-                "human",
-                """Magic filter input: {magic_filter_input}
+        ),
+        (
+            "human",
+            """Magic filter input: {magic_filter_input}
   
 Generated filters: {selected_filters}""",
-            ),
-        ]
-    )
+        ),
+    ]
+)
 
-    class ChartTypeSchema(BaseModel):
-        """Choose the best type of chart to display the data, based on the filters, user request, and ways to display the data on a given chart."""
 
-        chart_type: Literal["bar", "line", "pie"] = Field(
-            ..., description="The type of chart to display the data."
-        )
+class ChartTypeSchema(BaseModel):
+    """Choose the best type of chart to display the data, based on the filters, user request, and ways to display the data on a given chart."""
 
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0).with_structured_output(
-        ChartTypeSchema
+    chart_type: Literal["bar", "line", "pie"] = Field(
+        ..., description="The type of chart to display the data."
     )
-    chain = prompt | model
-    result = chain.invoke(
-        input={
+
+
+@cached_chain
+def chart_type_chain(compact: bool = COMPACT_PROMPTS) -> Runnable:
+    model = get_chat_model(cache=llm_cache).with_structured_output(ChartTypeSchema)
+    return (COMPACT_CHART_TYPE_PROMPT if compact else CHART_TYPE_PROMPT) | model
+
+
+def chart_type_input(
+    state: AgentExecutorState, compact: bool = COMPACT_PROMPTS
+) -> dict:
+    if compact:
+        return {
             "magic_filter_input": state["input"]["content"],
-            "selected_filters": state["selected_filters"],
-            "data_display_types_and_descriptions": format_data_display_types_and_descriptions(
-                state["display_formats"]
-            ),
+            "selected_filters": compact_filters(state.get("selected_filters")),
+            "display_formats": compact_display_formats(state["display_formats"]),
         }
+    return {
+        "magic_filter_input": state["input"]["content"],
+        # Not generated yet when filters and chart type run in parallel.
+        "selected_filters": state.get("selected_filters"),
+        "data_display_types_and_descriptions": format_data_display_types_and_descriptions(
+            state["display_formats"]
+        ),
+    }
+
+
+CHART_WORDS = re.compile(r"\b(?:chart|graph|plot|pie|bar|line|visuali[sz]e)s?\b", re.I)
+
+
+def keeps_chart(state: AgentExecutorState) -> bool:
+    """Whether a session follow-up keeps the last turn's chart type and display format.
+
+    Follow-ups usually only refine the filters ("now only canned"), so unless the
+    user mentions charts the model isn't asked again.
+    """
+    return bool(state.get("display_format")) and not CHART_WORDS.search(
+        state["input"]["content"]
     )
-    # print(result.chart_type)
+
+
+def generate_chart_type(state: AgentExecutorState) -> AgentExecutorState:
+    if keeps_chart(state):
+        return {"chart_type": state["chart_type"]}
+    result = chart_type_chain().invoke(input=chart_type_input(state))
     return {
         "chart_type": result.chart_type,
     }
 
 
-def generate_data_display_format(state: AgentExecutorState) -> AgentExecutorState:
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """You are an expert data analyst. Your task is to determine the best format to display the data based on the filters, chart type and user input.
+async def agenerate_chart_type(state: AgentExecutorState) -> AgentExecutorState:
+    if keeps_chart(state):
+        return {"chart_type": state["chart_type"]}
+    result = await chart_type_chain().ainvoke(input=chart_type_input(state))
+    return {
+        "chart_type": result.chart_type,
+    }
+
+
+DISPLAY_FORMAT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert data analyst. Your task is to determine the best format to display the data based on the filters, chart type and user input.
 
 The type of chart which the data will be displayed on is: {chart_type}.
 
@@ -142,96 +310,408 @@ The user will provide you with their original input to the 'magic filter' prompt
 You should use these inputs as context when making a decision on the best format to display the data.
 
 Select the best display format to show the data based on the filters, chart type and user input. You should always use the display type 'key' when selecting the format.""",
-            ),
-            (
-                "human",
-                """Magic filter input: {magic_filter_input}
+        ),
+        (
+            "human",
+            """Magic filter input: {magic_filter_input}
   
 Generated filters: {selected_filters}""",
-            ),
-        ]
-    )
+        ),
+    ]
+)
+
 
+@cached_chain
+def display_format_chain(
+    display_keys: Tuple[str, ...], compact: bool = COMPACT_PROMPTS
+) -> Runnable:
     class DataDisplayFormatSchema(BaseModel):
         """Choose the best format to display the data based on the filters and chart type."""
 
         display_key: str = Field(
             ...,
-            description=f"The key of the format to display the data in. Must be one of {', '.join([item['key'] for item in state['display_formats'] if item['chartType'] == state['chart_type']])}",
+            description=f"The key of the format to display the data in. Must be one of {', '.join(display_keys)}",
         )
 
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0).with_structured_output(
+    model = get_chat_model(cache=llm_cache).with_structured_output(
         DataDisplayFormatSchema
     )
-    chain = prompt | model
-    result = chain.invoke(
-        input={
+    return (COMPACT_DISPLAY_FORMAT_PROMPT if compact else DISPLAY_FORMAT_PROMPT) | model
+
+
+def display_format_chain_and_input(
+    state: AgentExecutorState, compact: bool = COMPACT_PROMPTS
+) -> Tuple[Runnable, dict]:
+    chain = display_format_chain(
+        tuple(
+            item["key"]
+            for item in state["display_formats"]
+            if item["chartType"] == state["chart_type"]
+        ),
+        compact,
+    )
+    if compact:
+        return chain, {
             "chart_type": state["chart_type"],
             "magic_filter_input": state["input"]["content"],
-            "selected_filters": state["selected_filters"],
-            "data_display_types_and_descriptions": format_data_display_types_and_descriptions(
+            "selected_filters": compact_filters(state["selected_filters"]),
+            "display_formats": compact_display_formats(
                 state["display_formats"], state["chart_type"]
             ),
         }
-    )
-    print(result.display_key)
+    return chain, {
+        "chart_type": state["chart_type"],
+        "magic_filter_input": state["input"]["content"],
+        "selected_filters": state["selected_filters"],
+        "data_display_types_and_descriptions": format_data_display_types_and_descriptions(
+            state["display_formats"], state["chart_type"]
+        ),
+    }
+
+
+def generate_data_display_format(state: AgentExecutorState) -> AgentExecutorState:
+    if keeps_chart(state):
+        return {"display_format": state["display_format"]}
+    chain, input = display_format_chain_and_input(state)
+    result = chain.invoke(input=input)
     return {
         "display_format": result.display_key,
     }
 
 
-def filter_data(state: AgentExecutorState) -> AgentExecutorState:
-    selected_filters = state["selected_filters"]
-    fruits = state["fruits"]
+async def agenerate_data_display_format(
+    state: AgentExecutorState,
+) -> AgentExecutorState:
+    if keeps_chart(state):
+        return {"display_format": state["display_format"]}
+    chain, input = display_format_chain_and_input(state)
+    result = await chain.ainvoke(input=input)
+    return {
+        "display_format": result.display_key,
+    }
 
-    name = selected_filters.name
-    retailPrice = selected_filters.retailPrice
-    form = selected_filters.form
-   
-
-    filtered_fruits = []
-    for fruit in fruits:
-        is_match = True
-
-        if name and fruit.get("name", "").lower() not in name:
-            is_match = False
-        if form and fruit.get("form", "").lower() not in form:
-            is_match = False
-        if retailPrice and fruit.get("retailPrice", 0):
-            is_match = False
-        
-        if is_match:
-            filtered_fruits.append(fruit)
-            
-    return {"fruits": filtered_fruits}
-
-def table_skip(state:AgentExecutorState) -> Literal["skip","display_format"]:
-    if state["chart_type"] == "table":
-        return "skip"
-    else:
-        return "display_format"
 
-def create_graph() -> CompiledGraph:
+CHART_CONFIG_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert data analyst. The user input is in response to a 'magic filter' prompt.
+They expect their natural language description of the filters to be converted into a structured query, and the
+filtered data to be displayed on the chart which suits it best. Today is July 25 2024.
+
+In a single response:
+1. Determine the proper filters to apply, given the user input.
+2. Select the best type of chart to display the data: 'bar', 'line', or 'pie'.
+3. Select the best display format for that chart type. You should always use the display type 'key' when selecting the format.
+
+Data display types: {data_display_types_and_descriptions}""",
+        ),
+        ("human", "{input}"),
+    ]
+)
+
+
+REFINE_CHART_CONFIG_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert data analyst. The user input is in response to a 'magic filter' prompt.
+They expect their natural language description of the filters to be converted into a structured query, and the
+filtered data to be displayed on the chart which suits it best. Today is July 25 2024.
+
+In a single response:
+1. Determine the proper filters to apply, given the user input.
+2. Select the best type of chart to display the data: 'bar', 'line', or 'pie'.
+3. Select the best display format for that chart type. You should always use the display type 'key' when selecting the format.
+
+The user is refining the filters they applied last: {previous_filters}
+Return the complete set of filters to apply now. Keep the previous filters unless the user changes or removes them.
+
+Data display types: {data_display_types_and_descriptions}""",
+        ),
+        ("human", "{input}"),
+    ]
+)
+
+
+@cached_chain
+def chart_config_chain(
+    product_names: Tuple[str, ...],
+    display_keys: Tuple[str, ...],
+    refine: bool = False,
+) -> Runnable:
+    class ChartConfigSchema(filter_schema(list(product_names))):  # type: ignore[misc, valid-type]
+        """Filters to apply to the data, and the chart and display format to show the filtered data with."""
+
+        chart_type: Literal["bar", "line", "pie"] = Field(
+            ..., description="The type of chart to display the data."
+        )
+        display_key: str = Field(
+            ...,
+            description=f"The key of the format to display the data in. Must be one of {', '.join(display_keys)}, and match the chart type.",
+        )
+
+    model = get_chat_model(cache=llm_cache).with_structured_output(ChartConfigSchema)
+    return (REFINE_CHART_CONFIG_PROMPT if refine else CHART_CONFIG_PROMPT) | model
+
+
+def chart_config_chain_and_input(
+    state: AgentExecutorState, compact: bool = COMPACT_PROMPTS
+) -> Tuple[Runnable, dict]:
+    previous = state.get("selected_filters")
+    chain = chart_config_chain(
+        tuple(get_product_names(state)),
+        tuple(item["key"] for item in state["display_formats"]),
+        refine=previous is not None,
+    )
+    display_formats = state["display_formats"]
+    input = {
+        "input": state["input"]["content"],
+        "data_display_types_and_descriptions": (
+            "\n" + compact_display_formats(display_formats)
+            if compact
+            else format_data_display_types_and_descriptions(display_formats)
+        ),
+    }
+    if previous is not None:
+        # In a session, refine the filters of the turn before, as generate_filters does.
+        input["previous_filters"] = previous.json(exclude_none=True)
+    return chain, input
+
+
+def generate_chart_config(state: AgentExecutorState) -> AgentExecutorState:
+    chain, input = chart_config_chain_and_input(state)
+    return chart_config_output(state, chain.invoke(input=input))
+
+
+async def agenerate_chart_config(state: AgentExecutorState) -> AgentExecutorState:
+    chain, input = chart_config_chain_and_input(state)
+    return chart_config_output(state, await chain.ainvoke(input=input))
+
+
+def chart_config_output(
+    state: AgentExecutorState, result: BaseModel
+) -> AgentExecutorState:
+    filter_fields = set(Filter.__fields__)
+    return {
+        "selected_filters": Filter(
+            **{k: v for k, v in result.dict().items() if k in filter_fields}
+        ),
+        # Filters from an earlier turn of a session, if any.
+        "previous_filters": state.get("selected_filters"),
+        "chart_type": result.chart_type,  # type: ignore[attr-defined]
+        "display_format": result.display_key,  # type: ignore[attr-defined]
+    }
+
+
+def rows_page(page: dict) -> dict:
+    return page
+
+
+emit_rows_page = RunnableLambda(rows_page, name="filtered_rows")
+"""Streams a page of filtered rows: every call shows up as a `filtered_rows` event."""
+
+
+def select_rows(
+    table: Dataset, selected_filters: Any, rows: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """The positions of `table`'s rows matching `selected_filters`, out of `rows`.
+
+    Cached in `selected_rows`: callers must not modify the returned array.
+    """
+    key = (table.id, table.version, filter_key(selected_filters))
+    indices = selected_rows.get(key)
+    if indices is None:
+        indices = filter_indices(table, selected_filters, rows)
+        selected_rows.set(key, indices)
+    return indices
+
+
+def filter_data(
+    state: AgentExecutorState, config: RunnableConfig
+) -> AgentExecutorState:
+    table = get_table(state)
+    previous = state.get("previous_filters")
+    rows = None
+    # In a session, a narrower follow-up only needs to look at the last turn's rows,
+    # if they're still cached.
+    if (
+        table.version
+        and state.get("dataset_version") == table.version
+        and is_narrowing(previous, state["selected_filters"])
+    ):
+        rows = selected_rows.get((table.id, table.version, filter_key(previous)))
+    indices = select_rows(table, state["selected_filters"], rows)
+    filter_rows.observe(len(table) if rows is None else len(rows), stage="in")
+    filter_rows.observe(len(indices), stage="out")
+    # Send the first rows out as soon as they're known, so clients can show them while
+    # the chart type and display format are still being generated. `pages` tells them
+    # how many more they can fetch, by offset, from /charts/rows.
+    pages = max(1, -(-len(indices) // ROWS_PAGE_SIZE))
+    for page in range(min(pages, ROWS_STREAM_PAGES)):
+        start = page * ROWS_PAGE_SIZE
+        emit_rows_page.invoke(
+            {
+                "page": page,
+                "pages": pages,
+                "total_rows": len(indices),
+                "rows": table.to_fruits(indices[start : start + ROWS_PAGE_SIZE]),
+            },
+            config,
+        )
+    return {"dataset_version": table.version}
+
+
+def rows_page_at(
+    state: AgentExecutorState, selected_filters: Any, offset: int, limit: int
+) -> dict:
+    """The rows `selected_filters` selects from position `offset`, at most `limit`."""
+    table = get_table(state)
+    indices = select_rows(table, selected_filters)
+    return {
+        "offset": offset,
+        "total_rows": len(indices),
+        "rows": table.to_fruits(indices[offset : offset + limit]),
+    }
+
+
+def chart_props(
+    state: AgentExecutorState,
+    selected_filters: Any,
+    indices: Any,
+    display_format: Optional[str],
+) -> Optional[dict]:
+    """The chart props of the rows at `indices`, which `selected_filters` selected.
+
+    Server-side datasets' props come from the materialized views; rows sent by the
+    client are aggregated on each request.
+    """
+    table = get_table(state)
+    if state.get("dataset_id"):
+        return views.get(
+            table, selected_filters, display_format, np.asarray(indices, dtype=np.intp)
+        )
+    return aggregate(table, indices, display_format)
+
+
+def aggregate_data(state: AgentExecutorState) -> AgentExecutorState:
+    props = chart_props(
+        state,
+        state["selected_filters"],
+        select_rows(get_table(state), state["selected_filters"]),
+        state.get("display_format"),
+    )
+    # The client sends `fruits` with each input: don't echo them back, or keep them
+    # in the session's checkpoints.
+    return {"props": props, "fruits": None}
+
+
+def start_in_parallel(
+    state: AgentExecutorState,
+) -> List[Literal["generate_filters", "generate_chart_type"]]:
+    return ["generate_filters", "generate_chart_type"]
+
+
+def create_graph(
+    mode: GraphMode = DEFAULT_GRAPH_MODE,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+) -> CompiledGraph:
+    """Build the chart graph.
+
+    With a `checkpointer`, each `thread_id` is a session: follow-up inputs refine the
+    previous turn's filters, and reuse its rows and chart where they still apply.
+    """
     workflow = StateGraph(AgentExecutorState)
 
-    # Add nodes
-    workflow.add_node("generate_filters", generate_filters)
-    workflow.add_node("generate_chart_type", generate_chart_type)
-    workflow.add_node("generate_data_display_format", generate_data_display_format)
-    workflow.add_node("filter_data", filter_data)
+    if mode == "single_call":
+        workflow.add_node(
+            "generate_chart_config",
+            instrumented_node(
+                "generate_chart_config", generate_chart_config, agenerate_chart_config
+            ),
+        )
+        workflow.add_node("filter_data", instrumented_node("filter_data", filter_data))
+        workflow.add_node(
+            "aggregate_data", instrumented_node("aggregate_data", aggregate_data)
+        )
+        workflow.add_edge("generate_chart_config", "filter_data")
+        workflow.add_edge("filter_data", "aggregate_data")
+        workflow.set_entry_point("generate_chart_config")
+        workflow.set_finish_point("aggregate_data")
+        return workflow.compile(checkpointer=checkpointer)
+
+    # Add nodes (each records its wall time in the `graph_node_seconds` metric)
+    workflow.add_node(
+        "generate_filters",
+        instrumented_node("generate_filters", generate_filters, agenerate_filters),
+    )
+    workflow.add_node(
+        "generate_chart_type",
+        instrumented_node(
+            "generate_chart_type", generate_chart_type, agenerate_chart_type
+        ),
+    )
+    workflow.add_node(
+        "generate_data_display_format",
+        instrumented_node(
+            "generate_data_display_format",
+            generate_data_display_format,
+            agenerate_data_display_format,
+        ),
+    )
+    workflow.add_node("filter_data", instrumented_node("filter_data", filter_data))
+    workflow.add_node(
+        "aggregate_data", instrumented_node("aggregate_data", aggregate_data)
+    )
 
     # Add edges
-    workflow.add_edge("generate_filters", "generate_chart_type")
-    # workflow.add_conditional_edges("generate_chart_type",table_skip,{"skip":"filter_data","display_format":"generate_data_display_format"})
-    workflow.add_edge("generate_chart_type", "generate_data_display_format")
-    workflow.add_edge("generate_data_display_format", "filter_data")
+    if mode == "parallel":
+        # Filters and chart type both only need the user input, so start them together.
+        # Rows are filtered as soon as the filters exist, and the chart is built once
+        # the display format is known too.
+        workflow.set_conditional_entry_point(
+            start_in_parallel, ["generate_filters", "generate_chart_type"]
+        )
+        workflow.add_edge("generate_filters", "filter_data")
+        workflow.add_edge("generate_chart_type", "generate_data_display_format")
+        workflow.add_edge(
+            ["filter_data", "generate_data_display_format"], "aggregate_data"
+        )
+    elif mode == "sequential":
+        workflow.add_edge("generate_filters", "filter_data")
+        workflow.add_edge("filter_data", "generate_chart_type")
+        workflow.add_edge("generate_chart_type", "generate_data_display_format")
+        workflow.add_edge("generate_data_display_format", "aggregate_data")
+        workflow.set_entry_point("generate_filters")
+    else:
+        raise ValueError(f"Unknown graph mode: {mode}")
 
-    # Set entry and finish points
-    workflow.set_entry_point("generate_filters")
-    workflow.set_finish_point("filter_data")
+    # Set finish point
+    workflow.set_finish_point("aggregate_data")
 
-    graph = workflow.compile()
+    graph = workflow.compile(checkpointer=checkpointer)
     return graph
 
 
-graph = create_graph()
+def warm_up(dataset_ids: Iterable[str] = ()) -> None:
+    """Build the chart nodes' chat model client and chains before the first request.
+
+    Creating the client imports the OpenAI SDK, the slowest import of the server.
+    """
+    chart_type_chain()
+    for dataset_id in dataset_ids:
+        filters_chain(tuple(get_dataset(dataset_id).product_names()))
+
+
+_graph: Optional[CompiledGraph] = None
+
+
+def __getattr__(name: str) -> Any:
+    # `graph`, which langgraph.json serves, is compiled on first use rather than on
+    # import, so the server (which compiles its own) doesn't pay for it.
+    global _graph
+    if name == "graph":
+        if _graph is None:
+            _graph = create_graph()
+        return _graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
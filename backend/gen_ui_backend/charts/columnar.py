@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+
+def cache_path(cache_dir: Path, dataset_id: str, version: str) -> Path:
+    """Where the columns of a dataset version are cached: one directory per version."""
+    return cache_dir / f"{dataset_id}-{version}"
+
+
+def write_arrays(directory: Path, arrays: Dict[str, np.ndarray], meta: dict) -> None:
+    """Save `arrays` as one `.npy` file each, plus a manifest listing them and `meta`.
+
+    The files are written to a temporary directory which is then renamed into place,
+    so concurrent readers (e.g. other workers starting up) see all of it or none.
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{directory.name}-", dir=directory.parent))
+    try:
+        for name, values in arrays.items():
+            np.save(staging / f"{name}.npy", values, allow_pickle=False)
+        manifest = {
+            **meta,
+            "arrays": {
+                name: {"dtype": values.dtype.str, "shape": list(values.shape)}
+                for name, values in arrays.items()
+            },
+        }
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        staging.chmod(0o755)  # mkdtemp makes it private to this user
+        os.replace(staging, directory)
+    except OSError:
+        # Another process got there first: its copy is just as good.
+        if not (directory / MANIFEST).exists():
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def read_arrays(directory: Path) -> Optional[Tuple[dict, Dict[str, np.ndarray]]]:
+    """Memory-map the arrays saved by `write_arrays`, or None if there's no usable cache.
+
+    The arrays are read-only views of the files, so processes reading the same cache
+    share its pages instead of each holding a copy.
+    """
+    try:
+        manifest = json.loads((directory / MANIFEST).read_text())
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+            for name in manifest["arrays"]
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing, unreadable (e.g. `directory` isn't one) or truncated, as a whole or
+        # any of its files.
+        return None
+    for name, values in arrays.items():
+        expected = manifest["arrays"][name]
+        if (
+            values.dtype.str != expected["dtype"]
+            or list(values.shape) != expected["shape"]
+        ):
+            return None
+    return manifest, arrays
+
+
+def remove_stale(cache_dir: Path, dataset_id: str, version: str) -> None:
+    """Delete the cached columns of other versions of a dataset."""
+    current = cache_path(cache_dir, dataset_id, version)
+    for directory in cache_dir.glob(f"{dataset_id}-{'?' * len(version)}"):
+        if directory != current and (directory / MANIFEST).exists():
+            shutil.rmtree(directory, ignore_errors=True)
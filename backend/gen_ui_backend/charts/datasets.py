@@ -0,0 +1,369 @@
+import csv
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from gen_ui_backend.charts.columnar import (
+    cache_path,
+    read_arrays,
+    remove_stale,
+    write_arrays,
+)
+from gen_ui_backend.charts.indexes import DatasetIndexes, NameIndex, name_index
+
+DATASETS_DIR = Path(
+    os.environ.get("DATASETS_DIR", Path(__file__).resolve().parents[3] / "datasets")
+)
+
+DATASETS_CACHE_DIR_ENV = os.environ.get(
+    "DATASETS_CACHE_DIR", str(DATASETS_DIR / ".cache")
+)
+DATASETS_CACHE_DIR = Path(DATASETS_CACHE_DIR_ENV) if DATASETS_CACHE_DIR_ENV else None
+"""Where parsed CSV columns are cached as memory-mapped `.npy` files. Empty disables it."""
+
+DATASET_FILES: Dict[str, str] = {
+    "fruits": "Fruit-Prices-2022.csv",
+    "vegetables": "Vegetable-Prices-2022.csv",
+}
+
+# Column name and type for each CSV column, in file order.
+COLUMNS: List[Tuple[str, type]] = [
+    ("name", str),
+    ("form", str),
+    ("retailPrice", np.float64),
+    ("retailPriceUnit", str),
+    ("yield", np.float64),
+    ("cupEquivalentSize", np.float64),
+    ("cupEquivalentUnit", str),
+    ("cupEquivalentPrice", np.float64),
+]
+
+# The columns of a `Fruits` row, in the order the frontend has them.
+FRUIT_COLUMNS = ["name", "form", "retailPrice"]
+
+
+def _code_dtype(num_codes: int) -> type:
+    for dtype in (np.uint8, np.uint16):
+        if num_codes <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint32
+
+
+class EncodedColumn:
+    """A string column stored as its sorted distinct values and one code per row.
+
+    A few hundred distinct names and forms repeat across every row, so each row only
+    costs a one or two byte code instead of a fixed-width string.
+    """
+
+    __slots__ = ("vocab", "codes")
+
+    def __init__(self, vocab: np.ndarray, codes: np.ndarray) -> None:
+        self.vocab = vocab
+        # No copy if they're already the right type, e.g. memory-mapped from a cache.
+        self.codes = codes.astype(_code_dtype(len(vocab)), copy=False)
+
+    @classmethod
+    def encode(cls, values: Sequence[str]) -> "EncodedColumn":
+        vocab, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        return cls(vocab, codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vocab.nbytes + self.codes.nbytes
+
+
+Column = Union[np.ndarray, EncodedColumn]
+
+
+class Row:
+    """A view of one row of a `Dataset`, created when the row is serialized."""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: "Dataset", index: int) -> None:
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, column: str) -> Any:
+        values = self.table.columns[column]
+        if isinstance(values, EncodedColumn):
+            return values.vocab[values.codes[self.index]].item()
+        return values[self.index].item()
+
+    def to_fruit(self) -> dict:
+        """The row in the `Fruits` shape the frontend expects."""
+        return {column: self[column] for column in FRUIT_COLUMNS}
+
+
+class Dataset:
+    """A price table held as one typed array per column.
+
+    Numeric columns are plain arrays, and string columns are dictionary-encoded
+    (`EncodedColumn`) whether they're passed encoded or as string arrays. Column
+    names are camelCased to match the `Fruits` schema used by the frontend, and the
+    product column (`Fruit` / `Vegetable` in the CSVs) is always `name`.
+    """
+
+    def __init__(
+        self, dataset_id: str, version: str, columns: Dict[str, Column]
+    ) -> None:
+        self.id = dataset_id
+        self.version = version
+        self.columns: Dict[str, Column] = {
+            column: EncodedColumn.encode(values)
+            if isinstance(values, np.ndarray) and values.dtype.kind in "US"
+            else values
+            for column, values in columns.items()
+        }
+        self._product_names: Optional[List[str]] = None
+        self._encoded: Dict[Tuple[str, bool], Tuple[np.ndarray, np.ndarray]] = {}
+        self.indexes: Optional[DatasetIndexes] = None
+
+    @classmethod
+    def from_records(cls, dataset_id: str, records: Sequence[dict]) -> "Dataset":
+        """Build a table from `Fruits`-shaped dicts, e.g. rows sent by a client."""
+        columns = {
+            "name": np.array([r.get("name", "") for r in records], dtype=str),
+            "form": np.array([r.get("form", "") for r in records], dtype=str),
+            "retailPrice": np.array(
+                [r.get("retailPrice") or 0 for r in records], dtype=np.float64
+            ),
+            # Not part of the `Fruits` schema, so usually missing (NaN).
+            "cupEquivalentPrice": np.array(
+                [r.get("cupEquivalentPrice") for r in records], dtype=np.float64
+            ),
+        }
+        # Identifies the rows, so a session can tell if a client resent the same ones.
+        digest = hashlib.sha256()
+        for values in columns.values():
+            digest.update(values.tobytes())
+        return cls(dataset_id, digest.hexdigest()[:12], columns)
+
+    def __len__(self) -> int:
+        return len(self.columns["name"])
+
+    def product_names(self) -> List[str]:
+        """The sorted, lowercased set of product names in the dataset."""
+        if self._product_names is None:
+            self._product_names = self.encoded("name")[0].tolist()
+        return self._product_names
+
+    def encoded(
+        self, column: str, lowercase: bool = True
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Dictionary-encode a string column, lowercased unless `lowercase` is False.
+
+        Returns `(vocab, codes)` where `vocab[codes]` rebuilds the (lowercased) column.
+        """
+        key = (column, lowercase)
+        if key not in self._encoded:
+            stored = self.columns[column]
+            assert isinstance(stored, EncodedColumn)
+            if lowercase:
+                # Only the distinct values need lowercasing, then the codes remapping.
+                vocab, remap = np.unique(
+                    np.char.lower(stored.vocab), return_inverse=True
+                )
+                codes = remap.astype(stored.codes.dtype)[stored.codes]
+                self._encoded[key] = (vocab, codes)
+            else:
+                self._encoded[key] = (stored.vocab, stored.codes)
+        return self._encoded[key]
+
+    def numeric(self, column: str) -> np.ndarray:
+        values = self.columns[column]
+        assert isinstance(values, np.ndarray), f"{column} is not a numeric column"
+        return values
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.columns.values())
+
+    def name_index(self) -> NameIndex:
+        """The index resolving loosely spelled product names, built once per version."""
+        if self.indexes is not None:
+            return self.indexes.names
+        return name_index(tuple(self.product_names()))
+
+    def build_indexes(self) -> DatasetIndexes:
+        """Build the secondary indexes `filter_indices` plans its lookups with.
+
+        Worth it for tables which serve many requests; one-off tables are scanned.
+        """
+        self.indexes = DatasetIndexes(
+            {column: self.encoded(column) for column in ("name", "form")},
+            {
+                column: self.numeric(column)
+                for column in ("retailPrice", "cupEquivalentPrice")
+            },
+        )
+        return self.indexes
+
+    def rows(self, indices: Optional[Sequence[int]] = None) -> Iterator[Row]:
+        """Views of the rows at `indices` (or every row), created as they're iterated."""
+        for index in range(len(self)) if indices is None else indices:
+            yield Row(self, int(index))
+
+    def to_fruits(self, indices: Optional[Sequence[int]] = None) -> List[dict]:
+        """Materialize rows in the `Fruits` shape the frontend expects.
+
+        Same as `row.to_fruit()` for each of `rows(indices)`, but decodes a column at
+        a time, which is much faster for a page of rows.
+        """
+        values = []
+        for column in FRUIT_COLUMNS:
+            stored = self.columns[column]
+            if isinstance(stored, EncodedColumn):
+                codes = stored.codes if indices is None else stored.codes[indices]
+                values.append(stored.vocab[codes].tolist())
+            else:
+                values.append((stored if indices is None else stored[indices]).tolist())
+        return [dict(zip(FRUIT_COLUMNS, row)) for row in zip(*values)]
+
+
+def csv_version(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+
+def parse_csv(dataset_id: str, raw: bytes) -> Dataset:
+    reader = csv.reader(raw.decode("utf-8-sig").splitlines())
+    next(reader)  # header: <Product>,Form,RetailPrice,RetailPriceUnit,Yield,...
+    rows = [row for row in reader if row]
+    fields = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    columns: Dict[str, Column] = {
+        column: EncodedColumn.encode(values)
+        if dtype is str
+        else np.array(values, dtype=dtype)
+        for (column, dtype), values in zip(COLUMNS, fields)
+    }
+    return Dataset(dataset_id, csv_version(raw), columns)
+
+
+def load_csv(dataset_id: str, path: Path) -> Dataset:
+    return parse_csv(dataset_id, path.read_bytes())
+
+
+def save_columns(dataset: Dataset, cache_dir: Path) -> None:
+    """Cache a dataset's columns for `load_columns`, e.g. in other worker processes."""
+    arrays: Dict[str, np.ndarray] = {}
+    kinds: Dict[str, str] = {}
+    for column, values in dataset.columns.items():
+        if isinstance(values, EncodedColumn):
+            arrays[f"{column}.vocab"] = values.vocab
+            arrays[f"{column}.codes"] = values.codes
+            kinds[column] = "encoded"
+        else:
+            arrays[column] = values
+            kinds[column] = "numeric"
+    write_arrays(
+        cache_path(cache_dir, dataset.id, dataset.version),
+        arrays,
+        {"dataset_id": dataset.id, "version": dataset.version, "columns": kinds},
+    )
+
+
+def load_columns(dataset_id: str, version: str, cache_dir: Path) -> Optional[Dataset]:
+    """The dataset version cached by `save_columns`, memory-mapped, or None."""
+    cached = read_arrays(cache_path(cache_dir, dataset_id, version))
+    if cached is None:
+        return None
+    manifest, arrays = cached
+    columns: Dict[str, Column] = {
+        column: EncodedColumn(arrays[f"{column}.vocab"], arrays[f"{column}.codes"])
+        if kind == "encoded"
+        else arrays[column]
+        for column, kind in manifest["columns"].items()
+    }
+    return Dataset(dataset_id, version, columns)
+
+
+def load_dataset(
+    dataset_id: str, path: Path, cache_dir: Optional[Path] = DATASETS_CACHE_DIR
+) -> Dataset:
+    """Load a CSV dataset, from its column cache unless the CSV has changed since.
+
+    A missing, stale or corrupt cache is rebuilt from the CSV, so it's regenerated
+    whenever the CSV's hash changes.
+    """
+    raw = path.read_bytes()
+    if cache_dir is None:
+        return parse_csv(dataset_id, raw)
+    version = csv_version(raw)
+    dataset = load_columns(dataset_id, version, cache_dir)
+    if dataset is None:
+        dataset = parse_csv(dataset_id, raw)
+        try:
+            # A corrupt copy would otherwise stay in the way of the new one.
+            shutil.rmtree(
+                cache_path(cache_dir, dataset_id, version), ignore_errors=True
+            )
+            save_columns(dataset, cache_dir)
+            remove_stale(cache_dir, dataset_id, version)
+        except OSError as e:
+            print(f"Couldn't cache the columns of {dataset_id}: {e}")
+    return dataset
+
+
+class UnknownDatasetError(ValueError):
+    """A `dataset_id` which isn't one of the registry's datasets."""
+
+
+class DatasetRegistry:
+    """Loads the price tables once and reloads a table when its file changes."""
+
+    def __init__(
+        self,
+        directory: Path = DATASETS_DIR,
+        files: Dict[str, str] = DATASET_FILES,
+    ) -> None:
+        self.directory = directory
+        self.files = files
+        self._datasets: Dict[str, Tuple[Tuple[int, int], Dataset]] = {}
+        self._lock = threading.Lock()
+
+    def ids(self) -> List[str]:
+        return list(self.files)
+
+    def load_all(self) -> None:
+        for dataset_id in self.files:
+            self.get(dataset_id)
+
+    def get(self, dataset_id: str) -> Dataset:
+        if dataset_id not in self.files:
+            raise UnknownDatasetError(f"Unknown dataset: {dataset_id}")
+        path = self.directory / self.files[dataset_id]
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        cached = self._datasets.get(dataset_id)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with self._lock:
+            cached = self._datasets.get(dataset_id)
+            if cached is None or cached[0] != stamp:
+                dataset = load_dataset(dataset_id, path)
+                indexes = dataset.build_indexes()
+                print(
+                    f"Indexed {dataset_id} ({len(dataset)} rows) in "
+                    f"{indexes.build_seconds * 1000:.1f}ms, {indexes.nbytes} bytes"
+                )
+                cached = (stamp, dataset)
+                self._datasets[dataset_id] = cached
+            return cached[1]
+
+
+registry = DatasetRegistry()
+
+
+def get_dataset(dataset_id: str) -> Dataset:
+    return registry.get(dataset_id)
@@ -0,0 +1,179 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from gen_ui_backend.charts.datasets import Dataset
+from gen_ui_backend.charts.filters import filter_mask
+from gen_ui_backend.charts.indexes import singular, words
+from gen_ui_backend.charts.schema import Filter
+from gen_ui_backend.metrics import fast_path_results
+
+MIN_CONFIDENCE_ENV = os.environ.get("CHARTS_FAST_PATH_MIN_CONFIDENCE", "1.0")
+MIN_CONFIDENCE: Optional[float] = (
+    float(MIN_CONFIDENCE_ENV) if MIN_CONFIDENCE_ENV else None
+)
+"""Share of the input's words the parser must explain to skip the LLM. Empty disables it."""
+
+stats = {"hits": 0, "misses": 0, "empty": 0}
+"""How often `generate_filters` was answered by the fast path (`hits`), fell back to the
+LLM because the input wasn't understood (`misses`), or because the parsed filters
+matched no rows (`empty`). Also exported as `fast_path_filters_total` on /metrics."""
+
+# Words which carry no filter of their own, e.g. "show me all the frozen fruit".
+STOPWORDS = frozenset(
+    """a all also an and any anything are as at be by can cost costing costs display do
+    dollar dollars everything for from get give i in is it item items just list me
+    my now of on only or product products price prices priced please produce see
+    show that the them these those to want what which with fruit fruits vegetable
+    vegetables veggies""".split()
+)
+
+_NUMBER = r"\$?\s*(\d+(?:\.\d+)?|\.\d+)\s*(cents?|c\b)?(?:\s*(?:dollars?|bucks|usd))?"
+_LOWER = r"(?:\b(?:over|above|more than|greater than|at least|no less than|min(?:imum)?)\b|>=?)"
+_UPPER = r"(?:\b(?:under|below|less than|cheaper than|at most|no more than|up to|max(?:imum)?)\b|<=?)"
+
+PRICE_PATTERNS: List[Tuple[re.Pattern, Tuple[str, ...]]] = [
+    (
+        re.compile(rf"(?:between|from)\s+{_NUMBER}\s+(?:and|to|-)\s+{_NUMBER}"),
+        ("minRetailPrice", "maxRetailPrice"),
+    ),
+    (
+        re.compile(rf"{_NUMBER}\s*(?:-|to)\s*{_NUMBER}"),
+        ("minRetailPrice", "maxRetailPrice"),
+    ),
+    (re.compile(rf"{_LOWER}\s*{_NUMBER}"), ("minRetailPrice",)),
+    (re.compile(rf"{_UPPER}\s*{_NUMBER}"), ("maxRetailPrice",)),
+    (
+        re.compile(rf"\b(?:exactly|costing|costs?|priced at)\s*{_NUMBER}"),
+        ("retailPrice",),
+    ),
+]
+"""Price expressions and the `Filter` fields their numbers fill, most specific first."""
+
+
+def _price(match: Tuple[str, Optional[str]]) -> float:
+    amount, cents = match
+    value = float(amount)
+    return value / 100 if cents else value
+
+
+class FastPathParser:
+    """Turns simple magic filter inputs into a `Filter` without calling the LLM.
+
+    Understands product names from the dataset's vocabulary (plural or singular),
+    `form` values and price expressions such as "under $2" or "between 1 and 3
+    dollars". Anything else (negations, dates, unknown words) lowers the confidence
+    of the parse so the caller can fall back to the LLM.
+    """
+
+    def __init__(self, product_names: Sequence[str], forms: Sequence[str]) -> None:
+        self.forms = {form.lower() for form in forms}
+        # Phrase (as a tuple of words) -> product name, matched longest first.
+        self.phrases: Dict[Tuple[str, ...], str] = {}
+        for name in product_names:
+            tokens = tuple(words(name))
+            if not tokens:
+                continue
+            self.phrases.setdefault(tokens, name)
+            if not re.search(r"[,(]", name):
+                self.phrases.setdefault(tokens[:-1] + (singular(tokens[-1]),), name)
+        self.max_phrase = max((len(p) for p in self.phrases), default=0)
+
+    def parse(self, text: str) -> Tuple[Optional[Filter], float]:
+        """Parse `text` into a `Filter` and the share of its words that were understood.
+
+        Returns `(None, confidence)` when no filter was found, or when the input asks
+        for something a single `Filter` can't express (e.g. two forms).
+        """
+        text = text.lower()
+        values: Dict[str, float] = {}
+        for pattern, fields in PRICE_PATTERNS:
+            for match in pattern.finditer(text):
+                groups = match.groups()
+                prices = [_price(groups[i : i + 2]) for i in range(0, len(groups), 2)]
+                for field, price in zip(fields, prices):
+                    if field in values:
+                        return None, 0.0
+                    values[field] = price
+            text = pattern.sub(" ", text)
+
+        tokens = words(text)
+        names: List[str] = []
+        forms: List[str] = []
+        total = understood = len(values)
+        i = 0
+        while i < len(tokens):
+            # Product names are matched before stopwords are dropped, since some
+            # contain them ("fruit cocktail, packed in juice").
+            for size in range(min(self.max_phrase, len(tokens) - i), 0, -1):
+                name = self.phrases.get(tuple(tokens[i : i + size]))
+                if name is not None:
+                    names.append(name)
+                    total += 1
+                    understood += 1
+                    i += size
+                    break
+            else:
+                word = tokens[i]
+                i += 1
+                if word in STOPWORDS:
+                    continue
+                total += 1
+                form = word if word in self.forms else singular(word)
+                if form in self.forms:
+                    forms.append(form)
+                    understood += 1
+
+        confidence = understood / total if total else 0.0
+        if not understood or len(set(forms)) > 1:
+            return None, confidence
+        selected_filters = Filter(
+            name=list(dict.fromkeys(names)) or None,
+            form=forms[0] if forms else None,
+            **values,
+        )
+        return selected_filters, confidence
+
+
+@lru_cache(maxsize=32)
+def fast_path_parser(
+    product_names: Tuple[str, ...], forms: Tuple[str, ...]
+) -> FastPathParser:
+    """The parser for a vocabulary, built once per dataset rather than per request."""
+    return FastPathParser(product_names, forms)
+
+
+def _count(result: str) -> None:
+    stats[result] += 1
+    fast_path_results.inc(result=result)
+
+
+def fast_path_filters(
+    text: str, dataset: Dataset, previous: Optional[Filter] = None
+) -> Optional[Filter]:
+    """A `Filter` for `text` if the fast path is enabled and confident, else None.
+
+    With `previous` filters, `text` is read as a refinement of them ("and under $2"):
+    the fields it sets replace theirs and the rest are kept. Parses which match no
+    rows are rejected, as they usually mean the user wanted something the parser read
+    too literally ("apple juice").
+    """
+    if MIN_CONFIDENCE is None:
+        return None
+    parser = fast_path_parser(
+        tuple(dataset.product_names()), tuple(dataset.encoded("form")[0].tolist())
+    )
+    selected_filters, confidence = parser.parse(text)
+    if selected_filters is None or confidence < MIN_CONFIDENCE:
+        _count("misses")
+        return None
+    if previous is not None:
+        selected_filters = Filter(
+            **{**previous.dict(), **selected_filters.dict(exclude_none=True)}
+        )
+    if not filter_mask(dataset, selected_filters).any():
+        _count("empty")
+        return None
+    _count("hits")
+    return selected_filters
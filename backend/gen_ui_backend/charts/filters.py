@@ -0,0 +1,204 @@
+import os
+from functools import partial
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from gen_ui_backend.charts.datasets import Dataset
+
+# Prices are quoted to the cent in prompts, so treat anything within half a cent as equal.
+PRICE_TOLERANCE = 0.005
+
+NAME_MATCH_THRESHOLD = float(os.environ.get("CHARTS_NAME_MATCH_THRESHOLD", 0.5))
+"""Trigram similarity a misspelled product name needs to match a name in the data."""
+
+# Numeric columns which can be filtered by range: (column, min field, max field).
+RANGES: List[Tuple[str, str, str]] = [
+    ("retailPrice", "minRetailPrice", "maxRetailPrice"),
+    ("cupEquivalentPrice", "minCupEquivalentPrice", "maxCupEquivalentPrice"),
+]
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def match_encoded(
+    encoded: Tuple[np.ndarray, np.ndarray],
+    values: Iterable[str],
+    rows: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Boolean mask for a dictionary-encoded column matching any of `values`.
+
+    The mask covers `rows` if given, else every row.
+    """
+    vocab, codes = encoded
+    wanted = np.isin(vocab, [value.lower() for value in values])
+    return wanted[codes if rows is None else codes[rows]]
+
+
+def name_codes(dataset: Dataset, names: Iterable[str]) -> np.ndarray:
+    """Codes of the product names matching any of `names`, which may be loosely spelled.
+
+    An exact name only matches itself, as before; other terms match by word or by
+    trigram similarity (see `NameIndex`).
+    """
+    return dataset.name_index().codes(names, NAME_MATCH_THRESHOLD)
+
+
+def match_names(
+    dataset: Dataset, names: Iterable[str], rows: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Boolean mask for the `name` column matching any of `names`, like `match_encoded`."""
+    vocab, codes = dataset.encoded("name")
+    wanted = np.zeros(len(vocab), dtype=bool)
+    wanted[name_codes(dataset, names)] = True
+    return wanted[codes if rows is None else codes[rows]]
+
+
+def filter_mask(
+    dataset: Dataset, selected_filters: Any, rows: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Evaluate a `Filter` against the dataset's columns as a boolean mask.
+
+    Only `rows` are evaluated if given, and the mask is aligned with them.
+    """
+    mask = np.ones(len(dataset) if rows is None else len(rows), dtype=bool)
+    if selected_filters is None:
+        return mask
+
+    names = _as_list(getattr(selected_filters, "name", None))
+    forms = _as_list(getattr(selected_filters, "form", None))
+    retail_price: Optional[float] = getattr(selected_filters, "retailPrice", None)
+
+    if names:
+        mask &= match_names(dataset, names, rows)
+    if forms:
+        mask &= match_encoded(dataset.encoded("form"), forms, rows)
+
+    if retail_price is not None:
+        prices = dataset.numeric("retailPrice")
+        if rows is not None:
+            prices = prices[rows]
+        mask &= np.abs(prices - retail_price) <= PRICE_TOLERANCE
+    for column, min_field, max_field in RANGES:
+        low = getattr(selected_filters, min_field, None)
+        high = getattr(selected_filters, max_field, None)
+        if low is None and high is None:
+            continue
+        values = dataset.numeric(column)
+        if rows is not None:
+            values = values[rows]
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    return mask
+
+
+def candidate_rows(dataset: Dataset, selected_filters: Any) -> Optional[np.ndarray]:
+    """Look up the rows matching the most selective indexed condition of a `Filter`.
+
+    Every condition's match count is read off the dataset's indexes first, which is
+    cheap, and only the smallest one's rows are fetched. Returns None if the dataset
+    has no indexes or the filter has no conditions.
+    """
+    indexes = dataset.indexes
+    if indexes is None or selected_filters is None:
+        return None
+
+    lookups: List[Tuple[int, Callable[[], np.ndarray]]] = []
+    names = _as_list(getattr(selected_filters, "name", None))
+    forms = _as_list(getattr(selected_filters, "form", None))
+    codes_by_column = {}
+    if names:
+        codes_by_column["name"] = name_codes(dataset, names)
+    if forms:
+        vocab = dataset.encoded("form")[0]
+        codes_by_column["form"] = np.flatnonzero(
+            np.isin(vocab, [form.lower() for form in forms])
+        )
+    for column, codes in codes_by_column.items():
+        inverted = indexes.inverted[column]
+        lookups.append((inverted.count(codes), partial(inverted.rows, codes)))
+
+    ranges: List[Tuple[str, Optional[float], Optional[float]]] = [
+        (
+            column,
+            getattr(selected_filters, min_field, None),
+            getattr(selected_filters, max_field, None),
+        )
+        for column, min_field, max_field in RANGES
+    ]
+    retail_price: Optional[float] = getattr(selected_filters, "retailPrice", None)
+    if retail_price is not None:
+        ranges.append(
+            (
+                "retailPrice",
+                retail_price - PRICE_TOLERANCE,
+                retail_price + PRICE_TOLERANCE,
+            )
+        )
+    for column, low, high in ranges:
+        if low is not None or high is not None:
+            index = indexes.sorted[column]
+            start, end = index.bounds(low, high)
+            lookups.append((end - start, partial(index.rows, low, high)))
+
+    if not lookups:
+        return None
+    return min(lookups, key=lambda lookup: lookup[0])[1]()
+
+
+def filter_indices(
+    dataset: Dataset, selected_filters: Any, rows: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Row indices of the dataset matching `selected_filters`, out of `rows` if given.
+
+    Without `rows`, an indexed dataset starts from its most selective condition's
+    rows (see `candidate_rows`) and checks the rest of the filter on those alone.
+    """
+    if rows is None:
+        rows = candidate_rows(dataset, selected_filters)
+        if rows is None:
+            return np.flatnonzero(filter_mask(dataset, selected_filters))
+    return rows[filter_mask(dataset, selected_filters, rows)]
+
+
+def is_narrowing(previous: Any, selected_filters: Any) -> bool:
+    """Whether every row matching `selected_filters` also matches `previous`.
+
+    Only checks each filter field on its own, so it may miss some narrowings (e.g. a
+    `retailPrice` inside a previous price range), but never reports a false one.
+    """
+    if previous is None or selected_filters is None:
+        return False
+
+    def lowered(filters: Any, field: str) -> set:
+        return {value.lower() for value in _as_list(getattr(filters, field, None))}
+
+    for field in ("name", "form"):
+        before, after = lowered(previous, field), lowered(selected_filters, field)
+        if before and not (after and after <= before):
+            return False
+
+    before_price = getattr(previous, "retailPrice", None)
+    if (
+        before_price is not None
+        and getattr(selected_filters, "retailPrice", None) != before_price
+    ):
+        return False
+    for _, min_field, max_field in RANGES:
+        before_min = getattr(previous, min_field, None)
+        after_min = getattr(selected_filters, min_field, None)
+        if before_min is not None and (after_min is None or after_min < before_min):
+            return False
+        before_max = getattr(previous, max_field, None)
+        after_max = getattr(selected_filters, max_field, None)
+        if before_max is not None and (after_max is None or after_max > before_max):
+            return False
+    return True
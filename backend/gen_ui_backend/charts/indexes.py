@@ -0,0 +1,225 @@
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+TRIGRAM_MARGIN = 0.05
+"""How far below the best trigram similarity a typo's other matches may score."""
+
+
+def _row_ids(size: int) -> type:
+    return np.int32 if size < np.iinfo(np.int32).max else np.int64
+
+
+class InvertedIndex:
+    """The rows holding each code of a dictionary-encoded column.
+
+    Stored in CSR form: `rows_by_code[offsets[c]:offsets[c + 1]]` are the (ascending)
+    rows whose code is `c`.
+    """
+
+    def __init__(self, codes: np.ndarray, num_codes: int) -> None:
+        self.rows_by_code = np.argsort(codes, kind="stable").astype(
+            _row_ids(len(codes))
+        )
+        self.offsets = np.zeros(num_codes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=num_codes), out=self.offsets[1:])
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows_by_code.nbytes + self.offsets.nbytes
+
+    def count(self, codes: Iterable[int]) -> int:
+        codes = np.asarray(list(codes), dtype=np.int64)
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def rows(self, codes: Iterable[int]) -> np.ndarray:
+        """The ascending rows holding any of `codes`."""
+        parts = [
+            self.rows_by_code[self.offsets[code] : self.offsets[code + 1]]
+            for code in codes
+        ]
+        if not parts:
+            return np.empty(0, dtype=self.rows_by_code.dtype)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+
+class SortedIndex:
+    """A numeric column's rows sorted by value, for range lookups by binary search."""
+
+    def __init__(self, values: np.ndarray) -> None:
+        self.rows_by_value = np.argsort(values, kind="stable").astype(
+            _row_ids(len(values))
+        )
+        self.values = values[self.rows_by_value]
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows_by_value.nbytes + self.values.nbytes
+
+    def bounds(
+        self, low: Optional[float] = None, high: Optional[float] = None
+    ) -> Tuple[int, int]:
+        """The slice of sorted positions with `low <= value <= high`.
+
+        NaNs sort last, so they're outside every range.
+        """
+        start = 0 if low is None else np.searchsorted(self.values, low, "left")
+        end = np.searchsorted(self.values, np.inf if high is None else high, "right")
+        return int(start), int(max(start, end))
+
+    def rows(
+        self, low: Optional[float] = None, high: Optional[float] = None
+    ) -> np.ndarray:
+        """The ascending rows with `low <= value <= high`."""
+        start, end = self.bounds(low, high)
+        return np.sort(self.rows_by_value[start:end])
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def singular(word: str) -> str:
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def trigrams(text: str) -> Set[str]:
+    """The trigrams of each word of `text`, padded like pg_trgm ("  a", " ap", ...)."""
+    return {
+        padded[i : i + 3]
+        for word in words(text)
+        for padded in [f"  {word} "]
+        for i in range(len(padded) - 2)
+    }
+
+
+def _postings(keys_by_code: List[Set[str]]) -> Dict[str, np.ndarray]:
+    codes_by_key: Dict[str, List[int]] = {}
+    for code, keys in enumerate(keys_by_code):
+        for key in keys:
+            codes_by_key.setdefault(key, []).append(code)
+    return {key: np.array(codes, dtype=np.int32) for key, codes in codes_by_key.items()}
+
+
+class NameIndex:
+    """Resolves loosely spelled product names to the codes of a name vocabulary.
+
+    A term matches, best first:
+    - the name it spells exactly (case aside), which is then its only match;
+    - else every name containing all of its words, singular or plural ("apple" ->
+      "apples", "apples, applesauce", ...), ranked by the share of the name's
+      words it covers;
+    - else the name most similar to it by trigrams, if its similarity is at least the
+      threshold, which catches typos ("bluberries" -> "blueberries" but not
+      "blackberries"). Names within `TRIGRAM_MARGIN` of the best match too, as the
+      typo can't tell them apart.
+    """
+
+    def __init__(self, vocab: np.ndarray) -> None:
+        names: List[str] = vocab.tolist()
+        self.codes_by_name = {name: code for code, name in enumerate(names)}
+        tokens = [{singular(word) for word in words(name)} for name in names]
+        self.codes_by_token = _postings(tokens)
+        self.token_counts = np.array([len(t) for t in tokens], dtype=np.int32)
+        grams = [trigrams(name) for name in names]
+        self.codes_by_trigram = _postings(grams)
+        self.trigram_counts = np.array([len(g) for g in grams], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.token_counts)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            sum(codes.nbytes for codes in self.codes_by_token.values())
+            + sum(codes.nbytes for codes in self.codes_by_trigram.values())
+            + self.token_counts.nbytes
+            + self.trigram_counts.nbytes
+        )
+
+    def match(self, term: str, threshold: float) -> List[Tuple[int, float]]:
+        """`(code, score)` pairs of the names matching `term`, best first."""
+        term = term.lower().strip()
+        if term in self.codes_by_name:
+            return [(self.codes_by_name[term], 1.0)]
+        if not len(self):
+            return []
+
+        tokens = {singular(word) for word in words(term)}
+        if tokens and all(token in self.codes_by_token for token in tokens):
+            postings = sorted((self.codes_by_token[t] for t in tokens), key=len)
+            codes = postings[0]
+            for other in postings[1:]:
+                codes = np.intersect1d(codes, other, assume_unique=True)
+            if len(codes):
+                return self._ranked(codes, len(tokens) / self.token_counts[codes])
+
+        grams = [g for g in trigrams(term) if g in self.codes_by_trigram]
+        if not grams:
+            return []
+        shared = np.bincount(
+            np.concatenate([self.codes_by_trigram[g] for g in grams]),
+            minlength=len(self),
+        )
+        similarity = shared / (len(trigrams(term)) + self.trigram_counts - shared)
+        cutoff = max(threshold, similarity.max() - TRIGRAM_MARGIN)
+        codes = np.flatnonzero(similarity >= cutoff)
+        return self._ranked(codes, similarity[codes])
+
+    @staticmethod
+    def _ranked(codes: np.ndarray, scores: np.ndarray) -> List[Tuple[int, float]]:
+        order = np.argsort(-scores, kind="stable")
+        return list(zip(codes[order].tolist(), scores[order].tolist()))
+
+    def codes(self, terms: Iterable[str], threshold: float) -> np.ndarray:
+        """The sorted codes of the names matching any of `terms`."""
+        matches = [code for term in terms for code, _ in self.match(term, threshold)]
+        return np.unique(np.array(matches, dtype=np.int64))
+
+
+@lru_cache(maxsize=32)
+def name_index(vocab: Tuple[str, ...]) -> NameIndex:
+    """The `NameIndex` for a vocabulary, built once rather than per request."""
+    return NameIndex(np.array(vocab, dtype=str))
+
+
+class DatasetIndexes:
+    """Secondary indexes over a dataset's filterable columns.
+
+    - `name` / `form`: inverted indexes over the lowercased, dictionary-encoded
+      columns, plus a `NameIndex` over the product names.
+    - `retailPrice` / `cupEquivalentPrice`: sorted indexes for range queries.
+    """
+
+    def __init__(
+        self,
+        encoded: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        numeric: Dict[str, np.ndarray],
+    ) -> None:
+        start = time.perf_counter()
+        self.inverted = {
+            column: InvertedIndex(codes, len(vocab))
+            for column, (vocab, codes) in encoded.items()
+        }
+        self.names = NameIndex(encoded["name"][0])
+        self.sorted = {
+            column: SortedIndex(values) for column, values in numeric.items()
+        }
+        self.build_seconds = time.perf_counter() - start
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            sum(index.nbytes for index in self.inverted.values())
+            + self.names.nbytes
+            + sum(index.nbytes for index in self.sorted.values())
+        )
@@ -0,0 +1,80 @@
+import json
+import os
+from itertools import groupby
+from typing import Any, List, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.pydantic_v1 import BaseModel
+
+from gen_ui_backend.charts.schema import ChartType, DataDisplayTypeAndDescription
+
+COMPACT_PROMPTS = os.environ.get("CHARTS_COMPACT_PROMPTS", "true").lower() == "true"
+"""Whether the chart type and display format nodes send the compact prompts below."""
+
+# The prompts start with instructions which never change, then the display formats
+# (the same for every request from a client), and end with what varies per request,
+# so the longest possible prefix is shared between requests for provider-side prompt
+# caching. The human message holds the user's input and filters, as in the full
+# prompts, so the response cache's semantic tier compares the same text.
+
+COMPACT_CHART_TYPE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert data analyst. Choose the chart type ('bar', 'line' or 'pie') which best displays a store's filtered orders, given the user's 'magic filter' input and the filters generated from it.
+Each chart type can only show the data in its display formats, listed below as `key: title` by chart type. A table is always displayed too.""",
+        ),
+        ("system", "Display formats:\n{display_formats}"),
+        ("human", "Filters: {selected_filters}\nInput: {magic_filter_input}"),
+    ]
+)
+
+COMPACT_DISPLAY_FORMAT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert data analyst. Choose the display format which best shows a store's filtered orders on the given chart type, given the user's 'magic filter' input and the filters generated from it.
+Answer with the format's key. The formats are listed as `key: title`.""",
+        ),
+        ("system", "Chart type: {chart_type}\nDisplay formats:\n{display_formats}"),
+        ("human", "Filters: {selected_filters}\nInput: {magic_filter_input}"),
+    ]
+)
+
+
+def _get(item: Any, field: str) -> Any:
+    return getattr(item, field) if isinstance(item, BaseModel) else item[field]
+
+
+def compact_display_formats(
+    display_formats: List[DataDisplayTypeAndDescription],
+    chart_type: Optional[ChartType] = None,
+) -> str:
+    """List the display formats as `key: title` lines, without their descriptions.
+
+    With `chart_type`, only its formats are listed; otherwise they are grouped under
+    each chart type. Sorted, so clients sending the same formats in another order
+    still share a prompt prefix.
+    """
+    formats = sorted(
+        (_get(item, "chartType"), _get(item, "key"), _get(item, "title"))
+        for item in display_formats
+        if chart_type is None or _get(item, "chartType") == chart_type
+    )
+    if chart_type is not None:
+        return "\n".join(f"{key}: {title}" for _, key, title in formats)
+    return "\n".join(
+        f"{group}:\n" + "\n".join(f"- {key}: {title}" for _, key, title in items)
+        for group, items in groupby(formats, key=lambda item: item[0])
+    )
+
+
+def compact_filters(filters: Any) -> str:
+    """The filters as minified JSON without unset fields, or `none` before they exist."""
+    if filters is None:
+        return "none"
+    if isinstance(filters, BaseModel):
+        filters = filters.dict(exclude_none=True)
+    return json.dumps(
+        {k: v for k, v in filters.items() if v is not None}, separators=(",", ":")
+    )
@@ -24,6 +24,18 @@ class Filter(BaseModel):
     retailPrice: Optional[float] = Field(
         None, description="Filter orders by retail price"
     )
+    minRetailPrice: Optional[float] = Field(
+        None, description="Only include items with a retail price of at least this amount"
+    )
+    maxRetailPrice: Optional[float] = Field(
+        None, description="Only include items with a retail price of at most this amount"
+    )
+    minCupEquivalentPrice: Optional[float] = Field(
+        None, description="Only include items with a price per cup equivalent of at least this amount"
+    )
+    maxCupEquivalentPrice: Optional[float] = Field(
+        None, description="Only include items with a price per cup equivalent of at most this amount"
+    )
     
 
 
@@ -41,6 +53,18 @@ def filter_schema(product_names: List[str]) -> Type[BaseModel]:
         retailPrice: Optional[float] = Field(
             None, description="Filter orders by retail price"
         )
+        minRetailPrice: Optional[float] = Field(
+            None, description="Only include items with a retail price of at least this amount"
+        )
+        maxRetailPrice: Optional[float] = Field(
+            None, description="Only include items with a retail price of at most this amount"
+        )
+        minCupEquivalentPrice: Optional[float] = Field(
+            None, description="Only include items with a price per cup equivalent of at least this amount"
+        )
+        maxCupEquivalentPrice: Optional[float] = Field(
+            None, description="Only include items with a price per cup equivalent of at most this amount"
+        )
     
 
     return FilterSchema
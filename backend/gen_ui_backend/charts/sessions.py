@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sqlite3
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+SESSIONS = os.environ.get("CHARTS_SESSIONS", "")
+"""Where /charts keeps per-session state: empty (off), `memory`, or a SQLite file path."""
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """A `SqliteSaver` which async graphs can use too.
+
+    Like `MemorySaver`, the async methods run the sync ones in the default executor,
+    so no async SQLite driver is needed.
+    """
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.get_tuple, config
+        )
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)),
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+    ) -> RunnableConfig:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata
+        )
+
+
+def create_checkpointer(sessions: str = SESSIONS) -> Optional[BaseCheckpointSaver]:
+    """The checkpointer for the chart graph's session mode, or None if it's off."""
+    if not sessions:
+        return None
+    if sessions == "memory":
+        return MemorySaver()
+    return ThreadedSqliteSaver(sqlite3.connect(sessions, check_same_thread=False))
@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from gen_ui_backend.cache import LRUCache, connect_shared
+from gen_ui_backend.charts.aggregate import AGGREGATIONS, aggregate
+from gen_ui_backend.charts.datasets import Dataset
+from gen_ui_backend.charts.filters import filter_indices
+from gen_ui_backend.charts.schema import Filter
+
+VIEWS_SIZE = int(os.environ.get("CHARTS_VIEWS_SIZE", 1024))
+"""How many chart props the materialized views keep, least recently used first out."""
+
+VIEWS_FILTERS = os.environ.get("CHARTS_VIEWS_FILTERS", "")
+"""A JSON file with a list of popular filters to build views for at startup."""
+
+VIEWS_PATH = os.environ.get("CHARTS_VIEWS_PATH", "")
+"""A SQLite file through which worker processes share the views they build."""
+
+ViewKey = Tuple[str, str, str, str]
+"""(dataset id, dataset version, normalized filter, display format key)"""
+
+_MISSING = object()
+
+
+def filter_key(selected_filters: Any) -> str:
+    """A canonical form of a `Filter`, the same for names in any order or case."""
+    fields = selected_filters.dict() if selected_filters is not None else {}
+    normalized: Dict[str, Any] = {}
+    for field, value in fields.items():
+        if field == "name" and value:
+            normalized[field] = sorted({name.lower() for name in value})
+        elif field == "form" and value:
+            normalized[field] = value.lower()
+        elif field not in ("name", "form") and value is not None:
+            normalized[field] = value
+    return json.dumps(normalized, sort_keys=True)
+
+
+def popular_filters(
+    dataset: Dataset, path: str = VIEWS_FILTERS
+) -> List[Optional[Filter]]:
+    """Filters to build views for up front: none, each form, and those in `path`."""
+    filters: List[Optional[Filter]] = [None]
+    filters += [Filter(form=form) for form in dataset.encoded("form")[0].tolist()]
+    if path:
+        filters += [Filter(**fields) for fields in json.loads(Path(path).read_text())]
+    return filters
+
+
+class MaterializedViews:
+    """Chart props precomputed per (dataset version, normalized filter, display format).
+
+    Entries of a dataset's older versions are dropped as soon as a newer version is
+    seen. With `path`, views are also stored in that SQLite file, where the other
+    processes using it find them. `stats` counts hits (`shared_hits` of them from the
+    file), misses, eagerly built views and invalidated entries, and `missed_filters`
+    the filters behind misses, to find more popular filters.
+    """
+
+    def __init__(self, maxsize: int = VIEWS_SIZE, path: str = VIEWS_PATH) -> None:
+        self._props = LRUCache(maxsize=maxsize)
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "built": 0,
+            "invalidated": 0,
+        }
+        self.missed_filters: Counter = Counter()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = connect_shared(path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chart_views (key TEXT PRIMARY KEY, "
+                "dataset_id TEXT, version TEXT, props TEXT)"
+            )
+            self._db.commit()
+
+    def _check_version(self, dataset: Dataset) -> None:
+        with self._lock:
+            previous = self._versions.get(dataset.id)
+            if previous == dataset.version:
+                return
+            self._versions[dataset.id] = dataset.version
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "DELETE FROM chart_views WHERE dataset_id = ? AND version != ?",
+                    (dataset.id, dataset.version),
+                )
+                self._db.commit()
+        if previous is None:
+            return
+        for key in self._props.keys():
+            if key[0] == dataset.id and key[1] != dataset.version:
+                self._props.delete(key)
+                self.stats["invalidated"] += 1
+
+    def _load(self, key: ViewKey) -> Any:
+        if self._db is None:
+            return _MISSING
+        with self._lock:
+            row = self._db.execute(
+                "SELECT props FROM chart_views WHERE key = ?", (json.dumps(key),)
+            ).fetchone()
+        return _MISSING if row is None else json.loads(row[0])
+
+    def _store(self, key: ViewKey, props: Any) -> None:
+        self._props.set(key, props)
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chart_views VALUES (?, ?, ?, ?)",
+                (json.dumps(key), key[0], key[1], json.dumps(props)),
+            )
+            self._db.commit()
+
+    def key(self, dataset: Dataset, selected_filters: Any, display_key: str) -> ViewKey:
+        return (dataset.id, dataset.version, filter_key(selected_filters), display_key)
+
+    def get(
+        self,
+        dataset: Dataset,
+        selected_filters: Any,
+        display_key: Optional[str],
+        indices: Optional[np.ndarray] = None,
+    ) -> Optional[Dict]:
+        """The chart props for `display_key` over the rows `selected_filters` select.
+
+        Built and stored on a miss, from `indices` if the caller already has them.
+        Callers must not modify the returned props, which are shared.
+        """
+        if display_key is None or display_key not in AGGREGATIONS:
+            return None
+        self._check_version(dataset)
+        key = self.key(dataset, selected_filters, display_key)
+        props = self._props.get(key, _MISSING)
+        if props is not _MISSING:
+            self.stats["hits"] += 1
+            return props
+        props = self._load(key)
+        if props is not _MISSING:
+            self._props.set(key, props)
+            self.stats["hits"] += 1
+            self.stats["shared_hits"] += 1
+            return props
+        self.stats["misses"] += 1
+        if key[2] in self.missed_filters or len(self.missed_filters) < 1000:
+            self.missed_filters[key[2]] += 1
+        if indices is None:
+            indices = filter_indices(dataset, selected_filters)
+        props = aggregate(dataset, indices, display_key)
+        self._store(key, props)
+        return props
+
+    def build(self, dataset: Dataset, filters: Iterable[Optional[Filter]]) -> int:
+        """Eagerly build the views of every display format for each of `filters`.
+
+        Views another process already stored in the shared file are loaded instead.
+        """
+        self._check_version(dataset)
+        built = 0
+        for selected_filters in filters:
+            indices = None
+            for display_key in AGGREGATIONS:
+                key = self.key(dataset, selected_filters, display_key)
+                props = self._load(key)
+                if props is not _MISSING:
+                    self._props.set(key, props)
+                    continue
+                if indices is None:
+                    indices = filter_indices(dataset, selected_filters)
+                self._store(key, aggregate(dataset, indices, display_key))
+                built += 1
+        self.stats["built"] += built
+        return built
+
+    def report(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else None,
+            "size": len(self._props),
+            "top_missed_filters": self.missed_filters.most_common(10),
+        }
+
+
+views = MaterializedViews()
+"""Where the chart graph and batch pipeline get server-side datasets' props from."""
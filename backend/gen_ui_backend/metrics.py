@@ -0,0 +1,377 @@
+import inspect
+import json
+import math
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+"""Share of requests whose node and LLM spans are printed as a JSON trace line."""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """A Prometheus histogram with labels, rendered in the text exposition format."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.labelnames = tuple(labelnames)
+        # Label values -> a count per bucket (not cumulative), then the sum.
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series_by_key = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(series_by_key.items()):
+            labels = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = ",".join(labels + [f'le="{_format_value(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {int(cumulative)}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{suffix} {int(cumulative)}")
+        return lines
+
+
+class Counter:
+    """A Prometheus counter with labels, rendered in the text exposition format."""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            labels = ",".join(
+                f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)
+            )
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}{suffix} {_format_value(value)}")
+        return lines
+
+
+REGISTRY: List[Union[Histogram, Counter]] = []
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKENS = tuple(2**i for i in range(4, 15))
+ROWS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+node_seconds = Histogram(
+    "graph_node_seconds", "Wall time of each graph node.", SECONDS, ["node"]
+)
+llm_tokens = Histogram(
+    "llm_tokens", "Tokens per LLM call, by node and kind.", TOKENS, ["node", "kind"]
+)
+filter_rows = Histogram(
+    "filter_data_rows", "Rows into and out of filter_data.", ROWS, ["stage"]
+)
+llm_queue_seconds = Histogram(
+    "llm_queue_seconds",
+    "Time model requests wait for the outbound scheduler, by priority.",
+    SECONDS,
+    ["priority"],
+)
+llm_cache_lookups = Counter(
+    "llm_cache_lookups_total",
+    "Lookups in the chart nodes' LLM response cache, by result.",
+    ["result"],
+)
+fast_path_results = Counter(
+    "fast_path_filters_total",
+    "generate_filters inputs answered by the rule-based parser (hits) or left to the "
+    "LLM (misses, empty), by result.",
+    ["result"],
+)
+request_bytes = Histogram(
+    "http_request_bytes", "Size of request bodies, by route.", BYTES, ["route"]
+)
+response_bytes = Histogram(
+    "http_response_bytes", "Size of response bodies, by route.", BYTES, ["route"]
+)
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text format, for a /metrics route."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def _token_usage(response: LLMResult) -> Dict[str, int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                return {
+                    "prompt": usage["input_tokens"],
+                    "completion": usage["output_tokens"],
+                }
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if "prompt_tokens" not in usage:
+        return {}
+    return {
+        "prompt": usage["prompt_tokens"],
+        "completion": usage.get("completion_tokens", 0),
+    }
+
+
+def _is_cached(response: LLMResult) -> bool:
+    return any(
+        (generation.generation_info or {}).get("cached")
+        for generations in response.generations
+        for generation in generations
+    )
+
+
+class LLMMetricsCallbackHandler(BaseCallbackHandler):
+    """Records the prompt and completion tokens of every chat model call by node.
+
+    Attached to the shared chat models (see `get_chat_model`), so it sees every call
+    without per-request setup. Calls made outside a graph are labelled `none`.
+    Responses from the LLM response cache cost no tokens and aren't recorded; they're
+    counted by `llm_cache_lookups_total`.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._nodes: Dict[UUID, str] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._nodes[run_id] = (metadata or {}).get("langgraph_node", "none")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        node = self._nodes.pop(run_id, "none")
+        if _is_cached(response):
+            return
+        for kind, tokens in _token_usage(response).items():
+            llm_tokens.observe(tokens, node=node, kind=kind)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._nodes.pop(run_id, None)
+
+
+llm_metrics = LLMMetricsCallbackHandler()
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Prints the node and LLM spans of one graph run as a JSON line when it ends.
+
+    Created for each sampled request by `sampled_tracers`.
+    """
+
+    run_inline = True  # keep the spans in order under async runs
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.root: Optional[UUID] = None
+        self.open: Dict[UUID, Dict[str, Any]] = {}
+        self.spans: List[Dict[str, Any]] = []
+
+    def _open(self, run_id: UUID, name: str) -> None:
+        self.open[run_id] = {
+            "name": name,
+            "start": round(time.perf_counter() - self.started, 4),
+        }
+
+    def _close(self, run_id: UUID, **fields: Any) -> None:
+        span = self.open.pop(run_id, None)
+        if span is not None:
+            end = time.perf_counter() - self.started
+            self.spans.append(
+                {**span, "seconds": round(end - span["start"], 4), **fields}
+            )
+        if run_id == self.root:
+            print(json.dumps({"trace": str(self.root), "spans": self.spans}))
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            self.root = run_id
+            self._open(run_id, name or "graph")
+        elif name and name == (metadata or {}).get("langgraph_node"):
+            # LangGraph wraps each node's runnable in a run of the same name.
+            parent = self.open.get(parent_run_id) if parent_run_id else None
+            if parent is None or parent["name"] != name:
+                self._open(run_id, name)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._close(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._close(run_id, error=repr(error))
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._open(run_id, f"llm:{(metadata or {}).get('langgraph_node', 'none')}")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._close(run_id, tokens=_token_usage(response))
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._close(run_id, error=repr(error))
+
+
+def sampled_tracers(rate: float = TRACE_SAMPLE_RATE) -> List[BaseCallbackHandler]:
+    """A new `TraceCallbackHandler` for `rate` of the calls, else nothing."""
+    return [TraceCallbackHandler()] if rate and random.random() < rate else []
+
+
+def instrumented_node(
+    name: str,
+    func: Callable[..., Any],
+    afunc: Optional[Callable[..., Any]] = None,
+) -> RunnableLambda:
+    """Wrap a graph node's function (and async variant) to record its wall time.
+
+    The node keeps its name, so stream events still see it as `name`.
+    """
+    takes_config = "config" in inspect.signature(func).parameters
+
+    def invoke(state: Any, config: RunnableConfig) -> Any:
+        start = time.perf_counter()
+        try:
+            return func(state, config) if takes_config else func(state)
+        finally:
+            node_seconds.observe(time.perf_counter() - start, node=name)
+
+    async def ainvoke(state: Any, config: RunnableConfig) -> Any:
+        assert afunc is not None
+        start = time.perf_counter()
+        try:
+            return await (afunc(state, config) if takes_config else afunc(state))
+        finally:
+            node_seconds.observe(time.perf_counter() - start, node=name)
+
+    return RunnableLambda(
+        invoke,
+        ainvoke if afunc else None,  # type: ignore[arg-type]
+        name=name,
+    )
+
+
+class PayloadSizeMiddleware:
+    """ASGI middleware recording request and response body sizes by route.
+
+    Counts the bytes actually sent, so streamed responses are measured too.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sizes = {"request": 0, "response": 0}
+
+        async def counting_receive() -> Dict:
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Dict) -> None:
+            if message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            # The router sets the matched route on the scope; unmatched paths are
+            # grouped so random URLs can't add label values.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_bytes.observe(sizes["request"], route=route)
+            response_bytes.observe(sizes["response"], route=route)
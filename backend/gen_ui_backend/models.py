@@ -0,0 +1,72 @@
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, TypeVar
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+
+from gen_ui_backend.metrics import llm_metrics
+
+ChatModelFactory = Callable[..., BaseChatModel]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_chat_model_factory: Optional[ChatModelFactory] = None  # ChatOpenAI
+_chain_caches: List[Any] = []
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(
+    model: str = "gpt-4o-mini", temperature: float = 0, **kwargs: Any
+) -> BaseChatModel:
+    """Return the process-wide chat model for these settings.
+
+    Models are created once and shared across requests, so their HTTP connection pools
+    are reused instead of being rebuilt on every node invocation. Their token usage
+    is recorded in the `llm_tokens` metric, and their requests are scheduled by the
+    shared `OutboundScheduler` (see LLM_SCHEDULER).
+    """
+    factory = _chat_model_factory
+    if factory is None:
+        # Imported on first use, as the OpenAI SDK takes about half a second to load.
+        from langchain_openai import ChatOpenAI
+
+        from gen_ui_backend.scheduler import LLM_SCHEDULER, scheduler
+
+        factory = ChatOpenAI
+        if LLM_SCHEDULER:
+            # The scheduler retries rate limited and failed requests itself, without
+            # the SDK retrying each of its retries again.
+            kwargs = {
+                "http_client": httpx.Client(transport=scheduler.transport()),
+                "http_async_client": httpx.AsyncClient(
+                    transport=scheduler.async_transport()
+                ),
+                "max_retries": 0,
+                **kwargs,
+            }
+    return factory(
+        model=model, temperature=temperature, callbacks=[llm_metrics], **kwargs
+    )
+
+
+def cached_chain(builder: F) -> F:
+    """Memoize a function which builds a prompt | model chain.
+
+    Use this for chains whose prompt and schema only depend on the builder's (hashable)
+    arguments, so each distinct chain is built once per process.
+    """
+    cached = lru_cache(maxsize=128)(builder)
+    _chain_caches.append(cached)
+    return cached  # type: ignore[return-value]
+
+
+def set_chat_model_factory(factory: ChatModelFactory) -> None:
+    """Swap the class used to build chat models, e.g. for a fake model in benchmarks.
+
+    Clears every cached model, and every chain built with `cached_chain`.
+    """
+    global _chat_model_factory
+    _chat_model_factory = factory
+    get_chat_model.cache_clear()
+    for cache in _chain_caches:
+        cache.cache_clear()
@@ -0,0 +1,459 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from itertools import count
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from gen_ui_backend.metrics import llm_queue_seconds
+
+LLM_SCHEDULER = os.environ.get("LLM_SCHEDULER", "true").lower() == "true"
+"""Whether the chat models' requests go through the shared `OutboundScheduler`."""
+
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", 8))
+"""How many model requests may be in flight at first; the limit adapts from there."""
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 64))
+"""The most model requests the adaptive limit lets in flight at once."""
+
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 6))
+"""How many times a model request is retried before failing: when rate limited (429),
+on the other statuses the OpenAI SDK retries (408, 409, 5xx), or when it couldn't be
+sent or answered in time."""
+
+INTERACTIVE = 0
+BATCH = 1
+"""Request priorities: waiting interactive requests are let through before batch ones."""
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+Outcome = Tuple[int, List[Tuple[str, str]], bytes]
+"""A coalesced response: status code, headers and decoded body."""
+
+_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+"""Headers describing the body as sent, which no longer apply once it's decoded."""
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Give the model requests made in this context (and tasks it starts) `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "cancelled")
+
+    def __init__(self, wake: Callable[[], None]) -> None:
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class AdaptiveLimiter:
+    """A concurrency limit which grows additively and shrinks multiplicatively (AIMD).
+
+    Each request which completes adds `1 / limit` to the limit, so it grows by about
+    one per round of requests, up to `maximum`. A rate limited request halves it, at
+    most once per round: only requests sent since the last decrease can decrease it
+    again. Slots go to waiting requests by priority, then in arrival order. Usable from
+    threads and any event loop.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1) -> None:
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiting: List[Tuple[int, int, _Waiter]] = []
+        self._order = count()
+        self._last_decrease = 0.0
+
+    def _grant(self) -> None:
+        while self._waiting and self.in_flight < int(self.limit):
+            waiter = heapq.heappop(self._waiting)[2]
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+    def _try_acquire(self, level: int, waiter: _Waiter) -> bool:
+        with self._lock:
+            if not self._waiting and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            heapq.heappush(self._waiting, (level, next(self._order), waiter))
+            return False
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        with self._lock:
+            waiter.cancelled = True
+            if waiter.granted:
+                self.in_flight -= 1
+                self._grant()
+
+    def acquire(self, level: int) -> float:
+        """Wait for a slot (in a thread); returns when the request was sent."""
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        if not self._try_acquire(level, waiter):
+            try:
+                event.wait()
+            except BaseException:
+                self._cancel(waiter)
+                raise
+        return time.monotonic()
+
+    async def aacquire(self, level: int) -> float:
+        """Wait for a slot (in an event loop); returns when the request was sent."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = _Waiter(wake)
+        if not self._try_acquire(level, waiter):
+            try:
+                await future
+            except BaseException:
+                self._cancel(waiter)
+                raise
+        return time.monotonic()
+
+    def release(self, started: float, throttled: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._grant()
+
+
+class _Abandoned(Exception):
+    """The request whose outcome a coalesced request waited for was cancelled."""
+
+
+def _retryable(status: int) -> bool:
+    # The statuses the OpenAI SDK retries, which it no longer does for us.
+    return status in (408, 409, 429) or status >= 500
+
+
+def retry_delay(attempt: int, headers: httpx.Headers) -> float:
+    """Seconds to wait before a retry: as the server asks, else exponential."""
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, ValueError):
+            continue
+    return min(0.5 * 2**attempt, 20) * random.uniform(0.5, 1)
+
+
+def _coalescing_key(request: httpx.Request) -> Optional[str]:
+    # Streamed responses go to one reader, so only whole ones are shared.
+    if request.method != "POST":
+        return None
+    try:
+        if json.loads(request.content).get("stream"):
+            return None
+    except (ValueError, AttributeError):
+        return None
+    return hashlib.sha256(str(request.url).encode() + request.content).hexdigest()
+
+
+def _outcome(response: httpx.Response, content: bytes) -> Outcome:
+    headers = [
+        (name, value)
+        for name, value in response.headers.multi_items()
+        if name.lower() not in _BODY_HEADERS
+    ]
+    return response.status_code, headers, content
+
+
+def _response(request: httpx.Request, outcome: Outcome) -> httpx.Response:
+    status, headers, content = outcome
+    return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream: Any, release: Callable[[], None]) -> None:
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self.stream
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        finally:
+            self.release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any, release: Callable[[], None]) -> None:
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release()
+
+
+def _once(func: Callable[[], None]) -> Callable[[], None]:
+    called = False
+
+    def wrapper() -> None:
+        nonlocal called
+        if not called:
+            called = True
+            func()
+
+    return wrapper
+
+
+class OutboundScheduler:
+    """Schedules the chat models' HTTP requests through one `AdaptiveLimiter`.
+
+    Requests hold a slot until their response is read (or its stream closed). Rate
+    limited, failed (see `_retryable`) and unsent ones are retried after
+    `retry_delay`, up to `max_retries` times, and identical requests in flight at once
+    share one upstream call. If the request making that call is cancelled, one of
+    those waiting for it makes it instead. Plug it into a client with `transport()` or
+    `async_transport()`.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = LLM_CONCURRENCY,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+    ) -> None:
+        self.limiter = AdaptiveLimiter(concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "coalesced": 0, "throttled": 0, "errors": 0}
+
+    def _leader(self, key: Optional[str]) -> Tuple[bool, Optional[Future]]:
+        """Whether this request makes the call, and the future its outcome goes to."""
+        if key is None:
+            return True, None
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is not None:
+                self.stats["coalesced"] += 1
+                return False, shared
+            shared = self._in_flight[key] = Future()
+            return True, shared
+
+    def _finish(
+        self, key: Optional[str], shared: Optional[Future], **result: Any
+    ) -> None:
+        """Resolve `shared` with the result, unless it's already been resolved."""
+        if key is None or shared is None:
+            return
+        with self._lock:
+            if self._in_flight.get(key) is not shared:
+                return
+            del self._in_flight[key]
+        if "exception" in result:
+            shared.set_exception(result["exception"])
+        else:
+            shared.set_result(result["outcome"])
+
+    def _throttled(self, response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            self.stats["throttled"] += 1
+            return True
+        if _retryable(response.status_code):
+            self.stats["errors"] += 1
+        return False
+
+    def send(
+        self, request: httpx.Request, inner: httpx.BaseTransport
+    ) -> httpx.Response:
+        key = _coalescing_key(request)
+        leader, shared = self._leader(key)
+        if not leader:
+            assert shared is not None
+            try:
+                return _response(request, shared.result())
+            except _Abandoned:
+                return self.send(request, inner)
+        level = _priority.get()
+        try:
+            attempt = 0
+            while True:
+                queued = time.monotonic()
+                started = self.limiter.acquire(level)
+                llm_queue_seconds.observe(started - queued, priority=level)
+                self.stats["requests"] += 1
+                try:
+                    response = inner.handle_request(request)
+                except httpx.TransportError:
+                    # Not sent, or not answered in time (e.g. connection errors).
+                    self.limiter.release(started)
+                    self.stats["errors"] += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    time.sleep(retry_delay(attempt, httpx.Headers()))
+                    attempt += 1
+                    continue
+                except BaseException:
+                    self.limiter.release(started)
+                    raise
+                throttled = self._throttled(response)
+                if _retryable(response.status_code) and attempt < self.max_retries:
+                    response.close()
+                    self.limiter.release(started, throttled=throttled)
+                    time.sleep(retry_delay(attempt, response.headers))
+                    attempt += 1
+                    continue
+                release = _once(partial(self.limiter.release, started, throttled))
+                if key is None:
+                    response.stream = _ReleasingStream(response.stream, release)
+                    return response
+                try:
+                    content = response.read()
+                finally:
+                    response.close()
+                    release()
+                outcome = _outcome(response, content)
+                self._finish(key, shared, outcome=outcome)
+                return _response(request, outcome)
+        except Exception as err:
+            self._finish(key, shared, exception=err)
+            raise
+        except BaseException:
+            # Cancelled: leave the call to a request waiting for it, if there is one.
+            self._finish(key, shared, exception=_Abandoned())
+            raise
+
+    async def asend(
+        self, request: httpx.Request, inner: httpx.AsyncBaseTransport
+    ) -> httpx.Response:
+        key = _coalescing_key(request)
+        leader, shared = self._leader(key)
+        if not leader:
+            assert shared is not None
+            try:
+                return _response(request, await asyncio.wrap_future(shared))
+            except _Abandoned:
+                return await self.asend(request, inner)
+        level = _priority.get()
+        try:
+            attempt = 0
+            while True:
+                queued = time.monotonic()
+                started = await self.limiter.aacquire(level)
+                llm_queue_seconds.observe(started - queued, priority=level)
+                self.stats["requests"] += 1
+                try:
+                    response = await inner.handle_async_request(request)
+                except httpx.TransportError:
+                    self.limiter.release(started)
+                    self.stats["errors"] += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    await asyncio.sleep(retry_delay(attempt, httpx.Headers()))
+                    attempt += 1
+                    continue
+                except BaseException:
+                    self.limiter.release(started)
+                    raise
+                throttled = self._throttled(response)
+                if _retryable(response.status_code) and attempt < self.max_retries:
+                    await response.aclose()
+                    self.limiter.release(started, throttled=throttled)
+                    await asyncio.sleep(retry_delay(attempt, response.headers))
+                    attempt += 1
+                    continue
+                release = _once(partial(self.limiter.release, started, throttled))
+                if key is None:
+                    response.stream = _AsyncReleasingStream(response.stream, release)
+                    return response
+                try:
+                    content = await response.aread()
+                finally:
+                    await response.aclose()
+                    release()
+                outcome = _outcome(response, content)
+                self._finish(key, shared, outcome=outcome)
+                return _response(request, outcome)
+        except Exception as err:
+            self._finish(key, shared, exception=err)
+            raise
+        except BaseException:
+            # Cancelled: leave the call to a request waiting for it, if there is one.
+            self._finish(key, shared, exception=_Abandoned())
+            raise
+
+    def transport(self) -> httpx.BaseTransport:
+        return _Transport(self, httpx.HTTPTransport())
+
+    def async_transport(self) -> httpx.AsyncBaseTransport:
+        return _AsyncTransport(self, httpx.AsyncHTTPTransport())
+
+    def report(self) -> Dict:
+        return {
+            **self.stats,
+            "limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+        }
+
+
+class _Transport(httpx.BaseTransport):
+    def __init__(
+        self, scheduler: OutboundScheduler, inner: httpx.BaseTransport
+    ) -> None:
+        self.scheduler = scheduler
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.scheduler.send(request, self.inner)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class _AsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self, scheduler: OutboundScheduler, inner: httpx.AsyncBaseTransport
+    ) -> None:
+        self.scheduler = scheduler
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.scheduler.asend(request, self.inner)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+scheduler = OutboundScheduler()
+"""Shared by every chat model `get_chat_model` creates (see LLM_SCHEDULER)."""
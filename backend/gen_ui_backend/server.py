@@ -1,22 +1,104 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import traceback
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from langserve import add_routes
 
 # from gen_ui_backend.chain import create_graph
+from gen_ui_backend.charts.batch import astream_batch
 from gen_ui_backend.charts.chain import create_graph as create_graph_charts
-from gen_ui_backend.types import ChatInputType
+from gen_ui_backend.charts.chain import llm_cache, rows_page_at
+from gen_ui_backend.charts.chain import warm_up as warm_up_charts
+from gen_ui_backend.charts.datasets import UnknownDatasetError, get_dataset
+from gen_ui_backend.charts.datasets import registry as dataset_registry
+from gen_ui_backend.charts.sessions import create_checkpointer
+from gen_ui_backend.charts.views import popular_filters, views
+from gen_ui_backend.metrics import (
+    PayloadSizeMiddleware,
+    render_metrics,
+    sampled_tracers,
+)
+from gen_ui_backend.scheduler import scheduler
+from gen_ui_backend.types import (
+    ChartsBatchInputType,
+    ChartsRowsInputType,
+    ChatInputType,
+)
+from gen_ui_backend.workers import SERVER_WORKERS, run_workers
 
 # Load environment variables from .env file
 load_dotenv()
 
+SERVER_WARMUP = os.environ.get("SERVER_WARMUP", "startup")
+"""When to load the datasets, build their views and create the chat model client.
+
+- `startup`: before the server accepts requests.
+- `background`: in a thread once it does, so it starts answering health checks sooner.
+- `off`: on first use, by the requests which need them.
+
+GET /ready answers 503 until they are ready (at once with `off`).
+"""
+
+
+def warm_up() -> None:
+    """Load what the first /charts requests would otherwise wait for."""
+    # The price tables, so /charts requests can reference them by id.
+    dataset_registry.load_all()
+    # And the charts of unfiltered and popular queries (see CHARTS_VIEWS_FILTERS).
+    for dataset_id in dataset_registry.ids():
+        dataset = dataset_registry.get(dataset_id)
+        views.build(dataset, popular_filters(dataset))
+    warm_up_charts(dataset_registry.ids())
+
+
+def trace_sampled_requests(config: Dict[str, Any], request: Request) -> Dict[str, Any]:
+    """Trace a sample of graph runs (see TRACE_SAMPLE_RATE)."""
+    tracers = sampled_tracers()
+    if not tracers:
+        return config
+    return {**config, "callbacks": [*(config.get("callbacks") or []), *tracers]}
+
+
+def create_app(warmup: str = SERVER_WARMUP) -> FastAPI:
+    if warmup not in ("startup", "background", "off"):
+        raise ValueError(f"Unknown SERVER_WARMUP: {warmup}")
+    ready = threading.Event()
+
+    def warm_up_and_report() -> None:
+        try:
+            warm_up()
+        except Exception:
+            # Stay unready, so the orchestrator doesn't route traffic here.
+            traceback.print_exc()
+            return
+        ready.set()
+
+    if warmup == "startup":
+        warm_up_and_report()
+    elif warmup == "off":
+        ready.set()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        if warmup == "background":
+            asyncio.get_running_loop().run_in_executor(None, warm_up_and_report)
+        yield
 
-def start() -> None:
     app = FastAPI(
         title="Gen UI Backend",
         version="1.0",
         description="A simple api server using Langchain's Runnable interfaces",
+        lifespan=lifespan,
     )
 
     # Configure CORS
@@ -34,12 +116,102 @@ def start() -> None:
     )
 
     # graph = create_graph()
-    graph_charts = create_graph_charts()
+    # With CHARTS_SESSIONS set, clients pass a `thread_id` in the config's
+    # `configurable` to refine their previous query.
+    graph_charts = create_graph_charts(checkpointer=create_checkpointer())
 
     # runnable = graph.with_types(input_type=ChatInputType, output_type=dict)
     runnable_charts = graph_charts.with_types(input_type=dict, output_type=dict)
 
     # add_routes(app, runnable, path="/chat", playground_type="default")
-    add_routes(app, runnable_charts, path='/charts')
+    add_routes(
+        app,
+        runnable_charts,
+        path="/charts",
+        per_req_config_modifier=trace_sampled_requests,
+    )
+
+    # Many magic filters against one dataset, streamed back as NDJSON in completion
+    # order. (LangServe already serves /charts/batch, which runs the whole graph per
+    # input.)
+    @app.post("/batch/charts")
+    async def charts_batch(request: ChartsBatchInputType) -> StreamingResponse:
+        if request.dataset_id is not None:
+            # Fail before the response starts streaming.
+            get_dataset(request.dataset_id)
+        state = {
+            "dataset_id": request.dataset_id,
+            "fruits": [fruit.dict() for fruit in request.fruits or []],
+            "display_formats": [
+                display_format.dict() for display_format in request.display_formats
+            ],
+        }
+
+        async def lines() -> AsyncIterator[str]:
+            async for result in astream_batch(
+                state, request.inputs, request.max_concurrency
+            ):
+                yield json.dumps(result) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    # The filtered rows past those a /charts run streams (see CHARTS_ROWS_STREAM_PAGES).
+    @app.post("/charts/rows")
+    def charts_rows(request: ChartsRowsInputType) -> dict:
+        state = {
+            "dataset_id": request.dataset_id,
+            "fruits": [fruit.dict() for fruit in request.fruits or []],
+        }
+        return rows_page_at(
+            state, request.selected_filters, request.offset, request.limit
+        )
+
+    # A request naming a dataset the server doesn't have, rather than a server error.
+    @app.exception_handler(UnknownDatasetError)
+    async def unknown_dataset(
+        request: Request, exc: UnknownDatasetError
+    ) -> JSONResponse:
+        return JSONResponse({"detail": str(exc)}, 404)
+
+    # Request and response sizes per route, for the /metrics histograms.
+    app.add_middleware(PayloadSizeMiddleware)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics() -> str:
+        """Node latency, LLM token, filter row and payload size histograms.
+
+        With SERVER_WORKERS > 1 these are the answering worker's own: scrape each
+        worker, or sum them, rather than reading one as the server's totals.
+        """
+        return render_metrics()
+
+    @app.get("/views")
+    async def views_stats() -> dict:
+        """Hit rates of the chart props views, for tuning CHARTS_VIEWS_*."""
+        return views.report()
+
+    @app.get("/llm_cache")
+    async def llm_cache_stats() -> dict:
+        """Exact and semantic hits of the chart nodes' LLM response cache."""
+        return llm_cache.report()
+
+    @app.get("/scheduler")
+    async def scheduler_stats() -> dict:
+        """The outbound model request limit, and requests coalesced or rate limited."""
+        return scheduler.report()
+
+    @app.get("/ready")
+    async def readiness() -> JSONResponse:
+        """200 once warmed up (see SERVER_WARMUP), for readiness probes."""
+        return JSONResponse({"ready": ready.is_set()}, 200 if ready.is_set() else 503)
+
+    return app
+
+
+def start() -> None:
+    if SERVER_WORKERS > 1:
+        print(f"Starting server with {SERVER_WORKERS} workers...")
+        sys.exit(run_workers("gen_ui_backend.server:create_app", SERVER_WORKERS))
+    app = create_app()
     print("Starting server...")
     uvicorn.run(app, host="0.0.0.0", port=8000)
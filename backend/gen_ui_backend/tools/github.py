@@ -1,9 +1,30 @@
+import asyncio
 import os
-from typing import Dict, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Mapping, Optional, Tuple, Union
 
+import httpx
 import requests
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+
+from gen_ui_backend.cache import LRUCache
+from gen_ui_backend.tools.http_client import (
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
+    get_async_client,
+    get_session,
+)
+
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+
+REPO_ERROR = (
+    "There was an error fetching the repository. Please check the owner and repo names."
+)
+
+# (owner, repo) -> (validators, result). Entries are revalidated with a conditional
+# request on every lookup, and a 304 response doesn't count against the rate limit.
+repo_cache = LRUCache(maxsize=1024)
 
 
 class GithubRepoInput(BaseModel):
@@ -11,31 +32,108 @@ class GithubRepoInput(BaseModel):
     repo: str = Field(..., description="The name of the repository.")
 
 
-@tool("github-repo", args_schema=GithubRepoInput, return_direct=True)
-def github_repo(owner: str, repo: str) -> Union[Dict, str]:
-    """Get information about a GitHub repository."""
+def github_headers() -> Dict[str, str]:
     if not os.environ.get("GITHUB_TOKEN"):
         raise ValueError("Missing GITHUB_TOKEN secret.")
 
-    headers = {
+    return {
         "Accept": "application/vnd.github+json",
         "Authorization": f"Bearer {os.environ['GITHUB_TOKEN']}",
         "X-GitHub-Api-Version": "2022-11-28",
     }
 
-    url = f"https://api.github.com/repos/{owner}/{repo}"
+
+def repo_result(owner: str, repo: str, repo_data: dict) -> Dict:
+    return {
+        "owner": owner,
+        "repo": repo,
+        "description": repo_data.get("description", ""),
+        "stars": repo_data.get("stargazers_count", 0),
+        "language": repo_data.get("language", ""),
+    }
+
+
+def conditional_request(
+    owner: str, repo: str
+) -> Tuple[Tuple[str, str], str, Dict[str, str], Optional[Tuple[Dict, Dict]]]:
+    """Build the cache key, URL and headers for a (possibly conditional) repo request."""
+    key = (owner.lower(), repo.lower())
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}"
+    headers = github_headers()
+    cached = repo_cache.get(key)
+    if cached is not None:
+        validators, _ = cached
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last-modified" in validators:
+            headers["If-Modified-Since"] = validators["last-modified"]
+    return key, url, headers, cached
+
+
+def store_response(
+    key: Tuple[str, str],
+    owner: str,
+    repo: str,
+    headers: Mapping[str, str],
+    repo_data: dict,
+) -> Dict:
+    result = repo_result(owner, repo, repo_data)
+    # Both requests' and httpx's header mappings are case-insensitive.
+    validators = {
+        name: headers[name] for name in ("etag", "last-modified") if name in headers
+    }
+    if validators:
+        repo_cache.set(key, (validators, result))
+    return result
+
+
+def get_github_repo(owner: str, repo: str) -> Union[Dict, str]:
+    """Get information about a GitHub repository."""
+    key, url, headers, cached = conditional_request(owner, repo)
 
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session().get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
         response.raise_for_status()
-        repo_data = response.json()
-        return {
-            "owner": owner,
-            "repo": repo,
-            "description": repo_data.get("description", ""),
-            "stars": repo_data.get("stargazers_count", 0),
-            "language": repo_data.get("language", ""),
-        }
+        return store_response(key, owner, repo, response.headers, response.json())
     except requests.exceptions.RequestException as err:
         print(err)
-        return "There was an error fetching the repository. Please check the owner and repo names."
+        return REPO_ERROR
+
+
+async def aget_github_repo(owner: str, repo: str) -> Union[Dict, str]:
+    """Get information about a GitHub repository."""
+    key, url, headers, cached = conditional_request(owner, repo)
+
+    try:
+        response = await get_async_client().get(url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
+        response.raise_for_status()
+        return store_response(key, owner, repo, response.headers, response.json())
+    except httpx.HTTPError as err:
+        print(err)
+        return REPO_ERROR
+
+
+def get_github_repos(repos: List[Tuple[str, str]]) -> List[Union[Dict, str]]:
+    """Look up several (owner, repo) pairs concurrently, in order."""
+    with ThreadPoolExecutor(max_workers=min(len(repos), HTTP_POOL_SIZE) or 1) as pool:
+        return list(pool.map(lambda args: get_github_repo(*args), repos))
+
+
+async def aget_github_repos(repos: List[Tuple[str, str]]) -> List[Union[Dict, str]]:
+    """Look up several (owner, repo) pairs concurrently, in order."""
+    return list(
+        await asyncio.gather(*(aget_github_repo(owner, repo) for owner, repo in repos))
+    )
+
+
+github_repo = StructuredTool.from_function(
+    func=get_github_repo,
+    coroutine=aget_github_repo,
+    name="github-repo",
+    args_schema=GithubRepoInput,
+    return_direct=True,
+)
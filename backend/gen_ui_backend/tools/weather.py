@@ -1,9 +1,27 @@
 import os
 from typing import Optional
 
-import requests
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
+
+from gen_ui_backend.cache import LRUCache
+from gen_ui_backend.tools.http_client import (
+    HTTP_TIMEOUT,
+    SingleFlight,
+    get_async_client,
+    get_session,
+)
+
+GEOCODE_API_URL = os.environ.get("GEOCODE_API_URL", "https://geocode.xyz")
+WEATHER_GOV_API_URL = os.environ.get("WEATHER_GOV_API_URL", "https://api.weather.gov")
+
+# A city's coordinates never change and a gridpoint's forecast URL rarely does, so those
+# are kept for a long time. Forecasts are only reused for a few minutes.
+geocode_cache = LRUCache(maxsize=4096, ttl=30 * 24 * 60 * 60)
+points_cache = LRUCache(maxsize=4096, ttl=24 * 60 * 60)
+forecast_cache = LRUCache(maxsize=1024, ttl=10 * 60)
+
+_in_flight = SingleFlight()
 
 
 class WeatherInput(BaseModel):
@@ -16,36 +34,20 @@ class WeatherInput(BaseModel):
     )
 
 
-@tool("weather-data", args_schema=WeatherInput, return_direct=True)
-def weather_data(city: str, state: str, country: str = "usa") -> dict:
-    """Get the current temperature for a city."""
+def geocode_url(city: str, state: str, country: str) -> str:
     geocode_api_key = os.environ.get("GEOCODE_API_KEY")
     if not geocode_api_key:
         raise ValueError("Missing GEOCODE_API_KEY secret.")
+    return f"{GEOCODE_API_URL}/{city.lower()},{state.lower()},{country.lower()}?json=1&auth={geocode_api_key}"
+
 
-    geocode_url = f"https://geocode.xyz/{city.lower()},{state.lower()},{country.lower()}?json=1&auth={geocode_api_key}"
-    geocode_response = requests.get(geocode_url)
-    if not geocode_response.ok:
-        print("No geocode data found.")
-        raise ValueError("Failed to get geocode data.")
-    geocode_data = geocode_response.json()
+def points_url(geocode_data: dict) -> str:
     latt = geocode_data["latt"]
     longt = geocode_data["longt"]
+    return f"{WEATHER_GOV_API_URL}/points/{latt},{longt}"
+
 
-    weather_gov_url = f"https://api.weather.gov/points/{latt},{longt}"
-    weather_gov_response = requests.get(weather_gov_url)
-    if not weather_gov_response.ok:
-        print("No weather data found.")
-        raise ValueError("Failed to get weather data.")
-    weather_gov_data = weather_gov_response.json()
-    properties = weather_gov_data["properties"]
-
-    forecast_url = properties["forecast"]
-    forecast_response = requests.get(forecast_url)
-    if not forecast_response.ok:
-        print("No forecast data found.")
-        raise ValueError("Failed to get forecast data.")
-    forecast_data = forecast_response.json()
+def weather_result(city: str, state: str, country: str, forecast_data: dict) -> dict:
     periods = forecast_data["properties"]["periods"]
     today_forecast = periods[0]
 
@@ -55,3 +57,71 @@ def weather_data(city: str, state: str, country: str = "usa") -> dict:
         "country": country,
         "temperature": today_forecast["temperature"],
     }
+
+
+def fetch_json(url: str, cache: LRUCache, kind: str) -> dict:
+    """GET `url` through `cache`, sharing the request with concurrent identical lookups."""
+    data = cache.get(url)
+    if data is not None:
+        return data
+
+    def fetch() -> dict:
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
+        if not response.ok:
+            print(f"No {kind} data found.")
+            raise ValueError(f"Failed to get {kind} data.")
+        data = response.json()
+        cache.set(url, data)
+        return data
+
+    return _in_flight.do(url, fetch)
+
+
+async def afetch_json(url: str, cache: LRUCache, kind: str) -> dict:
+    data = cache.get(url)
+    if data is not None:
+        return data
+
+    async def fetch() -> dict:
+        response = await get_async_client().get(url)
+        if not response.is_success:
+            print(f"No {kind} data found.")
+            raise ValueError(f"Failed to get {kind} data.")
+        data = response.json()
+        cache.set(url, data)
+        return data
+
+    return await _in_flight.ado(url, fetch)
+
+
+def get_weather_data(city: str, state: str, country: str = "usa") -> dict:
+    """Get the current temperature for a city."""
+    geocode_data = fetch_json(
+        geocode_url(city, state, country), geocode_cache, "geocode"
+    )
+    weather_gov_data = fetch_json(points_url(geocode_data), points_cache, "weather")
+    forecast_url = weather_gov_data["properties"]["forecast"]
+    forecast_data = fetch_json(forecast_url, forecast_cache, "forecast")
+    return weather_result(city, state, country, forecast_data)
+
+
+async def aget_weather_data(city: str, state: str, country: str = "usa") -> dict:
+    """Get the current temperature for a city."""
+    geocode_data = await afetch_json(
+        geocode_url(city, state, country), geocode_cache, "geocode"
+    )
+    weather_gov_data = await afetch_json(
+        points_url(geocode_data), points_cache, "weather"
+    )
+    forecast_url = weather_gov_data["properties"]["forecast"]
+    forecast_data = await afetch_json(forecast_url, forecast_cache, "forecast")
+    return weather_result(city, state, country, forecast_data)
+
+
+weather_data = StructuredTool.from_function(
+    func=get_weather_data,
+    coroutine=aget_weather_data,
+    name="weather-data",
+    args_schema=WeatherInput,
+    return_direct=True,
+)
@@ -1,8 +1,56 @@
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.pydantic_v1 import BaseModel, Field, root_validator
+
+from gen_ui_backend.charts.chain import ROWS_PAGE_SIZE
+from gen_ui_backend.charts.schema import DataDisplayTypeAndDescription, Filter, Fruits
 
 
 class ChatInputType(BaseModel):
     input: List[Union[HumanMessage, AIMessage, SystemMessage]]
+
+
+class ChartsBatchInputType(BaseModel):
+    inputs: List[str] = Field(..., description="The magic filter inputs to chart.")
+    dataset_id: Optional[str] = Field(
+        None, description="The server-side dataset to filter."
+    )
+    fruits: Optional[List[Fruits]] = Field(
+        None, description="The rows to filter, if no `dataset_id` is given."
+    )
+    display_formats: List[DataDisplayTypeAndDescription]
+    max_concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        description="How many calls each LLM stage may have in flight, up to the "
+        "server's CHARTS_BATCH_MAX_CONCURRENCY.",
+    )
+
+    @root_validator(skip_on_failure=True)
+    def check_data(cls, values: Dict) -> Dict:
+        if values.get("dataset_id") is None and values.get("fruits") is None:
+            raise ValueError("Either dataset_id or fruits is required.")
+        return values
+
+
+class ChartsRowsInputType(BaseModel):
+    dataset_id: Optional[str] = Field(
+        None, description="The server-side dataset to filter."
+    )
+    fruits: Optional[List[Fruits]] = Field(
+        None, description="The rows to filter, if no `dataset_id` is given."
+    )
+    selected_filters: Optional[Filter] = Field(
+        None, description="The filters a /charts run selected."
+    )
+    offset: int = Field(0, ge=0, description="The position of the first row to return.")
+    limit: int = Field(
+        ROWS_PAGE_SIZE, ge=1, le=10 * ROWS_PAGE_SIZE, description="How many rows."
+    )
+
+    @root_validator(skip_on_failure=True)
+    def check_data(cls, values: Dict) -> Dict:
+        if values.get("dataset_id") is None and values.get("fruits") is None:
+            raise ValueError("Either dataset_id or fruits is required.")
+        return values
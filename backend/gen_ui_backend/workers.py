@@ -0,0 +1,259 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from multiprocessing.connection import wait
+from multiprocessing.context import SpawnProcess
+from multiprocessing.synchronize import Event
+from pathlib import Path
+from socket import socket
+from typing import Any, List, Optional, Tuple
+
+import uvicorn
+
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 1))
+"""How many server processes accept requests on the port; 1 serves from this process."""
+
+SERVER_PRELOAD = os.environ.get("SERVER_PRELOAD", "true").lower() == "true"
+"""Whether the supervisor loads the datasets before starting workers, so each worker
+maps the column cache built once instead of parsing the CSVs itself."""
+
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", 30))
+"""Seconds a stopping worker may spend finishing its requests before it is killed."""
+
+SERVER_RESTART_BACKOFF = float(os.environ.get("SERVER_RESTART_BACKOFF", 1))
+"""Seconds before a crashed worker is replaced, doubled for each further crash in a
+row, up to `MAX_RESTART_BACKOFF`."""
+
+SERVER_MAX_RESTARTS = int(os.environ.get("SERVER_MAX_RESTARTS", 5))
+"""Crashes in a row after which a worker is not replaced: the server stops, and exits
+with status 1."""
+
+SERVER_CACHE_DIR = os.environ.get("SERVER_CACHE_DIR", "")
+"""Where the workers' shared LLM response cache and chart views are kept, unless set
+by LLM_CACHE_PATH and CHARTS_VIEWS_PATH. Defaults to a temporary directory removed
+when the server stops."""
+
+MAX_RESTART_BACKOFF = 30.0
+"""The longest a crashed worker waits to be replaced, in seconds."""
+
+# A worker which ran this long before exiting was healthy: its crashes in a row reset.
+STABLE_SECONDS = 60.0
+
+Worker = Tuple[SpawnProcess, Event]
+
+# Workers are spawned rather than forked, so each starts without the supervisor's
+# threads and imports the app afresh, as uvicorn's own workers do.
+spawn = multiprocessing.get_context("spawn")
+
+
+def _serve(config: uvicorn.Config, ready: Event, sockets: List[socket]) -> None:
+    """Run a worker's server, setting `ready` once it accepts requests."""
+    config.configure_logging()
+    server = uvicorn.Server(config)
+
+    async def serve() -> None:
+        task = asyncio.create_task(server.serve(sockets=sockets))
+        # With SERVER_WARMUP=startup, the app factory warms up before this is set.
+        while not server.started and not task.done():
+            await asyncio.sleep(0.05)
+        ready.set()
+        await task
+
+    config.setup_event_loop()
+    asyncio.run(serve())
+
+
+def share_caches(cache_dir: Path) -> None:
+    """Point the workers' LLM response cache and chart views at files in `cache_dir`.
+
+    Workers inherit the environment, and read it when they import the server.
+    """
+    os.environ.setdefault("LLM_CACHE_PATH", str(cache_dir / "llm_cache.sqlite"))
+    os.environ.setdefault("CHARTS_VIEWS_PATH", str(cache_dir / "views.sqlite"))
+
+
+def preload() -> None:
+    """Build what every worker would otherwise build for itself at startup.
+
+    Call it after `share_caches`, so the views land in the workers' shared file.
+    """
+    from gen_ui_backend.charts.datasets import registry
+    from gen_ui_backend.charts.views import MaterializedViews, popular_filters
+
+    # Writes the memory-mapped column cache (see DATASETS_CACHE_DIR) the workers share.
+    registry.load_all()
+    views = MaterializedViews(path=os.environ["CHARTS_VIEWS_PATH"])
+    for dataset_id in registry.ids():
+        dataset = registry.get(dataset_id)
+        views.build(dataset, popular_filters(dataset))
+
+
+class WorkerPool:
+    """Runs the app in `workers` processes which share one listening socket.
+
+    Workers which exit unexpectedly are replaced, after `restart_backoff` seconds
+    doubling with each crash in a row; after `max_restarts` of them, `run` stops the
+    pool and returns 1. SIGHUP replaces every worker one at a time, each once its
+    successor is ready, so code and data are reloaded without refusing requests; SIGINT
+    and SIGTERM stop them all. Stopping workers finish their requests in flight first,
+    for up to `graceful_timeout` seconds.
+
+    Each worker keeps its own metrics, so GET /metrics reports those of whichever
+    worker answers it.
+    """
+
+    def __init__(
+        self,
+        app: str,
+        workers: int,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        graceful_timeout: int = SERVER_GRACEFUL_TIMEOUT,
+        restart_backoff: float = SERVER_RESTART_BACKOFF,
+        max_restarts: int = SERVER_MAX_RESTARTS,
+        **kwargs: Any,
+    ) -> None:
+        self.config = uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            timeout_graceful_shutdown=graceful_timeout,
+            **kwargs,
+        )
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restarts = max_restarts
+        self.processes: List[Worker] = []
+        # Per worker slot: when its process started, its crashes in a row, and when
+        # a crashed one is due to be replaced.
+        self._started: List[float] = []
+        self._crashes: List[int] = []
+        self._restart_at: List[Optional[float]] = []
+        self._reload = threading.Event()
+        self._exit = threading.Event()
+
+    def _spawn(self, sockets: List[socket]) -> Worker:
+        ready = spawn.Event()
+        process = spawn.Process(target=_serve, args=(self.config, ready, sockets))
+        process.start()
+        return process, ready
+
+    def _wait_ready(self, worker: Worker) -> bool:
+        process, ready = worker
+        while not ready.wait(0.1):
+            if not process.is_alive() or self._exit.is_set():
+                return False
+        return True
+
+    def _stop(self, process: SpawnProcess) -> None:
+        process.terminate()
+        process.join(self.graceful_timeout + 5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _replace_all(self, sockets: List[socket]) -> None:
+        for i, (old, _) in enumerate(list(self.processes)):
+            new = self._spawn(sockets)
+            if not self._wait_ready(new):
+                print("Reload stopped: a new worker failed to start.")
+                self._stop(new[0])
+                return
+            self.processes[i] = new
+            self._started[i] = time.monotonic()
+            self._restart_at[i] = None
+            self._stop(old)
+        print(f"Reloaded {len(self.processes)} workers.")
+
+    def run(self) -> int:
+        """Serve until stopped: returns 0, or 1 if a worker kept crashing."""
+        signal.signal(signal.SIGHUP, lambda *args: self._reload.set())
+        signal.signal(signal.SIGINT, lambda *args: self._exit.set())
+        signal.signal(signal.SIGTERM, lambda *args: self._exit.set())
+
+        sockets = [self.config.bind_socket()]
+        self.processes = [self._spawn(sockets) for _ in range(self.workers)]
+        self._started = [time.monotonic()] * self.workers
+        self._crashes = [0] * self.workers
+        self._restart_at = [None] * self.workers
+        if all(self._wait_ready(worker) for worker in self.processes):
+            print(f"{self.workers} workers ready on port {self.config.port}.")
+        try:
+            while not self._exit.is_set():
+                if self._reload.is_set():
+                    self._reload.clear()
+                    self._replace_all(sockets)
+                if not self._restart_crashed(sockets):
+                    return 1
+                # Wake up as soon as a worker exits or a replacement is due.
+                due = [at for at in self._restart_at if at is not None]
+                timeout = max(min([0.5] + [at - time.monotonic() for at in due]), 0)
+                alive = [p.sentinel for p, _ in self.processes if p.is_alive()]
+                if alive:
+                    wait(alive, timeout)
+                else:
+                    self._exit.wait(timeout)
+            return 0
+        finally:
+            for process, _ in self.processes:
+                process.terminate()
+            for process, _ in self.processes:
+                self._stop(process)
+            for sock in sockets:
+                sock.close()
+
+    def _restart_crashed(self, sockets: List[socket]) -> bool:
+        """Schedule replacements for exited workers, and start those which are due.
+
+        Returns False once a worker has crashed more than `max_restarts` times in a row.
+        """
+        now = time.monotonic()
+        for i, (process, _) in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            if self._restart_at[i] is None:
+                print(f"Worker {process.pid} exited ({process.exitcode}).")
+                if now - self._started[i] >= STABLE_SECONDS:
+                    self._crashes[i] = 0
+                self._crashes[i] += 1
+                if self._crashes[i] > self.max_restarts:
+                    print(f"A worker crashed {self._crashes[i]} times in a row.")
+                    return False
+                backoff = self.restart_backoff * 2 ** (self._crashes[i] - 1)
+                self._restart_at[i] = now + min(backoff, MAX_RESTART_BACKOFF)
+            if now >= self._restart_at[i]:  # type: ignore[operator]
+                self.processes[i] = self._spawn(sockets)
+                self._started[i] = now
+                self._restart_at[i] = None
+        return True
+
+
+def run_workers(
+    app: str,
+    workers: int = SERVER_WORKERS,
+    preload_app: bool = SERVER_PRELOAD,
+    cache_dir: Optional[str] = SERVER_CACHE_DIR or None,
+    **kwargs: Any,
+) -> int:
+    """Serve the `module:factory` app factory `app` from a `WorkerPool`.
+
+    Returns the pool's exit status.
+    """
+    directory = Path(cache_dir or tempfile.mkdtemp(prefix="gen-ui-cache-"))
+    directory.mkdir(parents=True, exist_ok=True)
+    share_caches(directory)
+    try:
+        if preload_app:
+            start = time.perf_counter()
+            preload()
+            print(f"Preloaded in {time.perf_counter() - start:.2f}s.")
+        return WorkerPool(app, workers, factory=True, **kwargs).run()
+    finally:
+        if cache_dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
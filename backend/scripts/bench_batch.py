@@ -0,0 +1,71 @@
+"""Compare running saved magic filters one graph run each with the batch pipeline.
+
+Uses a fake model, so only scheduling and the per-input work are measured.
+
+Usage: python scripts/bench_batch.py [inputs] [max_concurrency]
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# Let the max_concurrency argument, not the server's cap, set the batch's concurrency.
+os.environ.setdefault("CHARTS_BATCH_MAX_CONCURRENCY", "1024")
+
+from fakes import FakeStructuredChatModel  # noqa: E402
+
+from gen_ui_backend.charts.batch import astream_batch  # noqa: E402
+from gen_ui_backend.charts.chain import create_graph  # noqa: E402
+from gen_ui_backend.models import set_chat_model_factory  # noqa: E402
+
+DISPLAY_FORMATS = [
+    {
+        "key": "fruit_pie",
+        "title": "Fruit Pie",
+        "chartType": "pie",
+        "description": "Number of forms for each fruit.",
+    }
+]
+
+
+def saved_queries(count: int) -> list:
+    # Dashboards repeat themselves: a quarter of the inputs are duplicates, and some
+    # are simple enough for the rule-based parser.
+    simple = ["frozen", "apples and pears", "under 2 dollars", "fresh fruit"]
+    queries = [f"saved query #{i}" for i in range(count - count // 4 - len(simple))]
+    return queries + simple + queries[: count // 4]
+
+
+async def per_request(inputs: list, max_concurrency: int) -> None:
+    graph = create_graph()
+    state = {"dataset_id": "fruits", "display_formats": DISPLAY_FORMATS}
+    await graph.abatch(
+        [{**state, "input": {"content": text}} for text in inputs],
+        {"max_concurrency": max_concurrency},
+    )
+
+
+async def batched(inputs: list, max_concurrency: int) -> None:
+    state = {"dataset_id": "fruits", "display_formats": DISPLAY_FORMATS}
+    async for _ in astream_batch(state, inputs, max_concurrency):
+        pass
+
+
+def main(count: int, max_concurrency: int) -> None:
+    inputs = saved_queries(count)
+    for label, run in (("graph per input", per_request), ("batch", batched)):
+        model = FakeStructuredChatModel(latency=0.1)
+        set_chat_model_factory(lambda **kwargs: model)
+        start = time.perf_counter()
+        asyncio.run(run(inputs, max_concurrency))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<16} {len(inputs) / elapsed:8.1f} inputs/s "
+            f"{model.calls:5d} model calls"
+        )
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200, 16][len(args) :]))
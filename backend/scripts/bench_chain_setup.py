@@ -0,0 +1,74 @@
+"""Measure the per-request cost of building a chart node's chain.
+
+Compares building a new ChatOpenAI client, prompt, schema class and structured output
+wrapper on every request (the old node behaviour) with looking up the prebuilt chain
+and formatting its prompt. No model calls are made.
+
+Usage: python scripts/bench_chain_setup.py [iterations]
+"""
+import os
+import sys
+import time
+from typing import Callable
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from langchain_core.pydantic_v1 import BaseModel, Field  # noqa: E402
+from langchain_openai import ChatOpenAI  # noqa: E402
+
+from gen_ui_backend.charts.chain import (  # noqa: E402
+    DISPLAY_FORMAT_PROMPT,
+    display_format_chain,
+)
+
+DISPLAY_KEYS = ("pie_fruit_form_distribution", "fruit_pie", "retail_price_pie")
+PROMPT_INPUT = {
+    "chart_type": "pie",
+    "magic_filter_input": "show me canned fruits under $2",
+    "selected_filters": "form='canned' maxRetailPrice=2.0",
+    "data_display_types_and_descriptions": list(DISPLAY_KEYS),
+}
+
+
+def per_request_build() -> None:
+    prompt = ChatPromptTemplate.from_messages(DISPLAY_FORMAT_PROMPT.messages)
+
+    class DataDisplayFormatSchema(BaseModel):
+        """Choose the best format to display the data based on the filters and chart type."""
+
+        display_key: str = Field(
+            ...,
+            description=f"The key of the format to display the data in. Must be one of {', '.join(DISPLAY_KEYS)}",
+        )
+
+    model = ChatOpenAI(model="gpt-4o-mini", temperature=0).with_structured_output(
+        DataDisplayFormatSchema
+    )
+    chain = prompt | model
+    chain.first.invoke(PROMPT_INPUT)
+
+
+def prebuilt_lookup() -> None:
+    chain = display_format_chain(DISPLAY_KEYS, False)
+    chain.first.invoke(PROMPT_INPUT)
+
+
+def per_call(fn: Callable[[], None], iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main(iterations: int) -> None:
+    build = per_call(per_request_build, iterations)
+    lookup = per_call(prebuilt_lookup, iterations)
+    print(f"per-request build: {build * 1e6:10.1f}us")
+    print(f"prebuilt lookup:   {lookup * 1e6:10.1f}us")
+    print(f"overhead removed:  {(build - lookup) * 1e6:10.1f}us per node call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,118 @@
+"""Measure dataset load time and per-worker memory with and without the column cache.
+
+Writes synthetic price CSVs to a temporary DATASETS_DIR, then starts several worker
+processes at once which each load every dataset and touch all of its columns, as
+the filters and aggregations do. Reports each worker's load time, RSS and PSS
+(proportional set size: shared pages are split between the processes mapping them).
+
+Usage: python scripts/bench_cold_start.py [rows] [workers]
+"""
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from gen_ui_backend.charts.datasets import DATASET_FILES
+
+WORKER = """
+import time
+import numpy as np
+from gen_ui_backend.charts.datasets import DATASET_FILES, DATASETS_DIR, load_dataset
+
+start = time.perf_counter()
+datasets = [load_dataset(i, DATASETS_DIR / f) for i, f in DATASET_FILES.items()]
+elapsed = time.perf_counter() - start
+for dataset in datasets:
+    for values in dataset.columns.values():
+        np.asarray(getattr(values, "codes", values)).sum()
+
+memory = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("Rss", "Pss"):
+            memory[key] = int(value.split()[0]) / 1024
+print(f"{elapsed} {memory['Rss']} {memory['Pss']}", flush=True)
+input()  # stay alive until every worker has measured, so they overlap
+"""
+
+FORMS = ["Fresh", "Canned", "Frozen", "Dried", "Juice"]
+
+
+def write_csvs(directory: Path, rows: int) -> None:
+    rng = random.Random(0)
+    for file_name in DATASET_FILES.values():
+        with open(directory / file_name, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "Product",
+                    "Form",
+                    "RetailPrice",
+                    "RetailPriceUnit",
+                    "Yield",
+                    "CupEquivalentSize",
+                    "CupEquivalentUnit",
+                    "CupEquivalentPrice",
+                ]
+            )
+            for _ in range(rows):
+                writer.writerow(
+                    [
+                        f"Product {rng.randrange(500)}",
+                        rng.choice(FORMS),
+                        round(rng.uniform(0.3, 12), 4),
+                        "per pound",
+                        round(rng.uniform(0.5, 1), 2),
+                        round(rng.uniform(0.1, 0.6), 4),
+                        "pounds",
+                        round(rng.uniform(0.2, 5), 4),
+                    ]
+                )
+
+
+def run_workers(env: Dict[str, str], workers: int) -> List[List[float]]:
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER],
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(workers)
+    ]
+    results = [[float(v) for v in p.stdout.readline().split()] for p in processes]
+    for process in processes:
+        process.communicate("\n")
+    return results
+
+
+def main(rows: int, workers: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        datasets_dir = Path(directory)
+        write_csvs(datasets_dir, rows)
+        env = {**os.environ, "DATASETS_DIR": str(datasets_dir)}
+        cache_env = {**env, "DATASETS_CACHE_DIR": str(datasets_dir / ".cache")}
+        run_workers(cache_env, 1)  # build the cache
+
+        print(
+            f"{workers} workers on {os.cpu_count()} CPUs, 2 datasets of {rows} rows each"
+        )
+        print(f"{'':<14} {'load':>9} {'RSS':>10} {'PSS':>10}")
+        for label, worker_env in (
+            ("parse CSVs", {**env, "DATASETS_CACHE_DIR": ""}),
+            ("column cache", cache_env),
+        ):
+            results = run_workers(worker_env, workers)
+            load, rss, pss = (sum(r[i] for r in results) / workers for i in range(3))
+            print(f"{label:<14} {load * 1000:>7.0f}ms {rss:>7.1f}MiB {pss:>7.1f}MiB")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [1_000_000, 4][len(args) :]))
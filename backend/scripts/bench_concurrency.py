@@ -0,0 +1,57 @@
+"""Run the charts graph concurrently on one event loop with a fake model.
+
+With async nodes, throughput should grow with the number of concurrent requests
+instead of being capped by the default thread pool.
+
+Usage: python scripts/bench_concurrency.py [concurrency ...]
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from fakes import FakeStructuredChatModel  # noqa: E402
+
+from gen_ui_backend.charts.chain import create_graph  # noqa: E402
+from gen_ui_backend.models import set_chat_model_factory  # noqa: E402
+
+DISPLAY_FORMATS = [
+    {
+        "key": "fruit_pie",
+        "title": "Fruit Pie",
+        "chartType": "pie",
+        "description": "Number of forms for each fruit.",
+    }
+]
+
+
+async def run(concurrency: int, requests_per_client: int = 3) -> float:
+    graph = create_graph()
+
+    async def client(i: int) -> None:
+        for j in range(requests_per_client):
+            await graph.ainvoke(
+                {
+                    "input": {"content": f"fresh fruit #{i}-{j}"},
+                    "dataset_id": "fruits",
+                    "display_formats": DISPLAY_FORMATS,
+                }
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return concurrency * requests_per_client / (time.perf_counter() - start)
+
+
+def main(levels: List[int]) -> None:
+    set_chat_model_factory(lambda **kwargs: FakeStructuredChatModel(latency=0.1))
+    print(f"{'clients':>8} {'requests/s':>12}")
+    for concurrency in levels:
+        print(f"{concurrency:>8} {asyncio.run(run(concurrency)):>12.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 4, 16, 64, 256])
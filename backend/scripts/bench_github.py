@@ -0,0 +1,49 @@
+"""Show the github-repo tool's conditional requests against a local fake GitHub API.
+
+Usage: python scripts/bench_github.py
+"""
+import asyncio
+import os
+import time
+from typing import Callable
+
+from fakes import github_stub
+
+stub = github_stub(latency=0.05)
+os.environ["GITHUB_API_URL"] = stub.url
+os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+
+from gen_ui_backend.tools.github import (  # noqa: E402
+    aget_github_repos,
+    get_github_repo,
+    get_github_repos,
+)
+
+REPOS = [
+    ("langchain-ai", "langchain"),
+    ("langchain-ai", "langgraph"),
+    ("langchain-ai", "langserve"),
+    ("OctoConsulting", "olabs-tech-titans-02"),
+]
+
+
+def timed(label: str, fn: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:8.1f}ms  hits={dict(stub.hits)}")
+
+
+def main() -> None:
+    timed("single repo, cold", lambda: get_github_repo(*REPOS[0]))
+    timed("single repo, revalidated (304)", lambda: get_github_repo(*REPOS[0]))
+    timed(f"{len(REPOS)} repos, batch (sync)", lambda: get_github_repos(REPOS))
+    timed(
+        f"{len(REPOS)} repos, batch (async)",
+        lambda: asyncio.run(aget_github_repos(REPOS)),
+    )
+    stub.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare full-column scans with index lookups in `filter_indices`.
+
+Builds synthetic tables with a few hundred products, and reports how long the
+indexes take to build, their size, and per-query timings with and without them.
+
+Usage: python scripts/bench_indexes.py [rows ...]
+"""
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from gen_ui_backend.charts.datasets import Dataset
+from gen_ui_backend.charts.filters import filter_indices
+from gen_ui_backend.charts.schema import Filter
+
+FORMS = ["Canned", "Dried", "Fresh", "Frozen", "Juice"]
+QUERIES = {
+    "one product": Filter(name=["product 7"]),
+    "product + form": Filter(name=["product 7", "product 8"], form="fresh"),
+    "exact price": Filter(retailPrice=4.2),
+    "price range": Filter(minRetailPrice=2.5, maxRetailPrice=2.6),
+    "cup price range": Filter(minCupEquivalentPrice=0.9, maxCupEquivalentPrice=1),
+    "common form": Filter(form="fresh"),
+}
+
+
+def synthetic(size: int, products: int = 300) -> Dataset:
+    rng = np.random.default_rng(0)
+    names = np.array([f"Product {i}" for i in range(products)])
+    columns = {
+        "name": names[rng.integers(0, products, size)],
+        "form": np.array(FORMS)[rng.integers(0, len(FORMS), size)],
+        "retailPrice": np.round(rng.uniform(0.5, 10, size), 2),
+        "cupEquivalentPrice": np.round(rng.uniform(0.2, 5, size), 2),
+    }
+    return Dataset("bench", str(size), columns)
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes: List[int]) -> None:
+    for size in sizes:
+        table = synthetic(size)
+        for column in ("name", "form"):
+            table.encoded(column)  # encoding happens once per dataset load
+        scan_times = {
+            label: best_of(lambda: filter_indices(table, query))
+            for label, query in QUERIES.items()
+        }
+        scanned = {
+            label: filter_indices(table, query) for label, query in QUERIES.items()
+        }
+
+        indexes = table.build_indexes()
+        print(
+            f"{size} rows: indexes built in {indexes.build_seconds * 1000:.1f}ms, "
+            f"{indexes.nbytes / 2**20:.1f}MiB"
+        )
+        print(
+            f"  {'query':<16} {'rows':>9} {'scan':>11} {'indexed':>11} {'speedup':>8}"
+        )
+        for label, query in QUERIES.items():
+            assert np.array_equal(filter_indices(table, query), scanned[label])
+            indexed_time = best_of(lambda: filter_indices(table, query))
+            print(
+                f"  {label:<16} {len(scanned[label]):>9}"
+                f" {scan_times[label] * 1000:>9.3f}ms {indexed_time * 1000:>9.3f}ms"
+                f" {scan_times[label] / indexed_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000, 10_000_000])
@@ -0,0 +1,63 @@
+"""Time building a `NameIndex` and matching loosely spelled names as vocabularies grow.
+
+Usage: python scripts/bench_name_index.py [names ...]
+"""
+import random
+import string
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from gen_ui_backend.charts.filters import NAME_MATCH_THRESHOLD
+from gen_ui_backend.charts.indexes import NameIndex
+
+QUALIFIERS = ["frozen concentrate", "packed in juice", "ready-to-drink", "dried"]
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    names = set()
+    while len(names) < size:
+        word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+        names.add(f"{word}s")
+        names.add(f"{word}s, {rng.choice(QUALIFIERS)}")
+    return sorted(names)[:size]
+
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1 :]
+
+
+def main(sizes: List[int]) -> None:
+    rng = random.Random(0)
+    print(
+        f"{'names':>9} {'build':>10} {'size':>10} {'exact':>9} {'word':>9} {'typo':>9}"
+    )
+    for size in sizes:
+        vocab = vocabulary(size, rng)
+        start = time.perf_counter()
+        index = NameIndex(np.array(vocab, dtype=str))
+        build = time.perf_counter() - start
+
+        sample = rng.sample([name for name in vocab if "," not in name], 100)
+        terms = {
+            "exact": sample,
+            "word": [name[:-1] for name in sample],  # singular, matches every form
+            "typo": [typo(name.split(",")[0], rng) for name in sample],
+        }
+        timings = {}
+        for kind, queries in terms.items():
+            start = time.perf_counter()
+            for term in queries:
+                assert index.match(term, NAME_MATCH_THRESHOLD) or kind == "typo"
+            timings[kind] = (time.perf_counter() - start) / len(queries)
+        print(
+            f"{size:>9} {build * 1000:>8.0f}ms {index.nbytes / 2**20:>7.1f}MiB"
+            + "".join(f" {timings[kind] * 1000:>7.3f}ms" for kind in terms)
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
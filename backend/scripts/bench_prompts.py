@@ -0,0 +1,154 @@
+"""Count the prompt tokens each chart node sends, with the full and compact prompts.
+
+Renders each LLM node's prompt (see CHARTS_COMPACT_PROMPTS) for a few inputs with the
+frontend's display formats, and reports the mean prompt tokens per call and the
+tokens the inputs' prompts share as a prefix, which provider-side prompt caching can
+reuse. Tokens are counted with tiktoken's o200k_base encoding (gpt-4o-mini's) when it
+is available, else estimated at 4 characters per token; the structured output
+schemas, sent alongside, are the same in both modes and not counted. In production
+the `llm_tokens` histogram on /metrics reports the tokens actually billed per node.
+
+Usage: python scripts/bench_prompts.py
+"""
+import os
+import re
+from statistics import mean
+from typing import Callable, List, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.messages import BaseMessage  # noqa: E402
+
+from gen_ui_backend.charts.chain import (  # noqa: E402
+    AgentExecutorState,
+    chart_config_chain_and_input,
+    chart_type_chain,
+    chart_type_input,
+    display_format_chain_and_input,
+)
+from gen_ui_backend.charts.schema import Filter  # noqa: E402
+
+DISPLAY_FORMATS = [
+    {
+        "key": "bar_average_retail_price_by_fruit",
+        "title": "Average Retail Price by Fruit",
+        "chartType": "bar",
+        "description": "X-axis: Fruit (name)\n\nY-axis: Average Retail Price (averagePrice)\n\nThis chart would show the average retail price for each fruit.",
+    },
+    {
+        "key": "bar_average_retail_price_by_form",
+        "title": "Average Retail Price by Form",
+        "chartType": "bar",
+        "description": "X-axis: Form (type)\n\nY-axis:Average Retail Price (averagePrice)\n\nThis chart would show the average retail price for each form.",
+    },
+    {
+        "key": "pie_fruit_form_distribution",
+        "title": "Fruit Form Distribution",
+        "chartType": "pie",
+        "description": "Display each Form  as a slice of the pie, with the size of each slice representing the number of Fruits in that form.\nThis provides a quick overview of the different froms.",
+    },
+    {
+        "key": "fruit_pie",
+        "title": "Fruit Pie",
+        "chartType": "pie",
+        "description": "Show each unique Fruit as a slice, with the size representing the number of forms for that Fruit.\nThis helps identify the fruits that can be found in different forms.",
+    },
+    {
+        "key": "retail_price_pie",
+        "title": "Retail Price Distrution",
+        "chartType": "pie",
+        "description": "Shows increaments of Retail Price as a slice, with the size representing the number of fruit for that price groups.\nThis helps identify the number fruits that can be found in different price ranges.",
+    },
+]
+"""The display formats the frontend sends (frontend/app/filters.tsx)."""
+
+SAMPLES = [
+    ("canned fruits under $2", Filter(form="canned", maxRetailPrice=2.0), "pie"),
+    ("average price of apples and pears", Filter(name=["apples", "pears"]), "bar"),
+    ("which forms are cheapest", Filter(), "bar"),
+    ("fresh berries by price", Filter(form="fresh", name=["blueberries"]), "pie"),
+]
+"""Inputs, with the filters and chart type generated for them."""
+
+Render = Callable[[AgentExecutorState, bool], List[BaseMessage]]
+
+
+def token_counter() -> Tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return "tiktoken o200k_base", lambda text: len(encoding.encode(text))
+    except Exception:  # not installed, or the encoding can't be downloaded
+        return "estimated, 4 characters per token", lambda text: -(-len(text) // 4)
+
+
+def chart_type(state: AgentExecutorState, compact: bool) -> List[BaseMessage]:
+    # In the default parallel mode the chart type is chosen before the filters exist.
+    state = {**state, "selected_filters": None}
+    prompt = chart_type_chain(compact).first  # type: ignore[attr-defined]
+    return prompt.invoke(chart_type_input(state, compact)).to_messages()
+
+
+def display_format(state: AgentExecutorState, compact: bool) -> List[BaseMessage]:
+    chain, input = display_format_chain_and_input(state, compact)
+    return chain.first.invoke(input).to_messages()  # type: ignore[attr-defined]
+
+
+def chart_config(state: AgentExecutorState, compact: bool) -> List[BaseMessage]:
+    # The single call generates the filters: earlier ones would only be a session's.
+    state = {**state, "selected_filters": None}
+    chain, input = chart_config_chain_and_input(state, compact)
+    return chain.first.invoke(input).to_messages()  # type: ignore[attr-defined]
+
+
+NODES: List[Tuple[str, Render]] = [
+    ("generate_chart_type", chart_type),
+    ("generate_data_display_format", display_format),
+    ("generate_chart_config", chart_config),
+]
+
+
+def serialize(messages: List[BaseMessage]) -> str:
+    # Roughly as the chat API sees them: each message's role, then its content.
+    return "".join(f"<|{m.type}|>{m.content}<|end|>" for m in messages)
+
+
+def shared_prefix(texts: List[str]) -> str:
+    prefix = os.path.commonprefix(texts)
+    # Only whole words count: a token split by the prefix's end isn't shared.
+    return re.sub(r"\S*$", "", prefix)
+
+
+def main() -> None:
+    counter, count_tokens = token_counter()
+    states: List[AgentExecutorState] = [
+        {
+            "input": {"content": text},  # type: ignore[typeddict-item]
+            "dataset_id": "fruits",
+            "display_formats": DISPLAY_FORMATS,  # type: ignore[typeddict-item]
+            "selected_filters": filters,  # type: ignore[typeddict-item]
+            "chart_type": kind,  # type: ignore[typeddict-item]
+        }
+        for text, filters, kind in SAMPLES
+    ]
+    print(f"Prompt tokens per call ({counter}), mean of {len(states)} inputs")
+    print(
+        f"{'node':<29} {'full':>6} {'compact':>8} {'saved':>7} "
+        f"{'shared prefix':>14} {'compact':>8}"
+    )
+    for name, render in NODES:
+        tokens, prefixes = [], []
+        for compact in (False, True):
+            texts = [serialize(render(state, compact)) for state in states]
+            tokens.append(mean(count_tokens(text) for text in texts))
+            prefixes.append(count_tokens(shared_prefix(texts)))
+        full, compacted = tokens
+        print(
+            f"{name:<29} {full:>6.0f} {compacted:>8.0f} "
+            f"{(1 - compacted / full) * 100:>6.1f}% {prefixes[0]:>14} {prefixes[1]:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Burst the charts graph and batch pipeline at a fake OpenAI API which rate limits.
+
+A local stub serves `/v1/chat/completions` after a fixed latency and answers 429 to
+requests beyond its capacity in flight, like a provider's rate limit. Interactive
+requests (the graph, a few distinct inputs sent many times at once) and a batch of
+distinct inputs start together, once with ChatOpenAI's own retries and once through
+the outbound scheduler (LLM_SCHEDULER). Reports interactive latency, the batch's
+duration, failed requests, and the requests and 429s the API saw.
+
+Usage: python scripts/bench_scheduler.py [interactive] [batch] [capacity]
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fakes import openai_stub
+
+WORKER = """
+import asyncio, json, sys, time
+from gen_ui_backend.charts.batch import astream_batch
+from gen_ui_backend.charts.chain import create_graph
+from gen_ui_backend.scheduler import scheduler
+from loadtest import DISPLAY_FORMATS
+
+interactive, batch = int(sys.argv[1]), int(sys.argv[2])
+TEXTS = ["canned fruit", "cheapest berries", "fruit by form", "juice prices"]
+
+
+async def main():
+    graph = create_graph()
+    latencies, errors = [], 0
+
+    async def ask(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await graph.ainvoke({
+                "input": {"content": TEXTS[i % len(TEXTS)]},
+                "dataset_id": "fruits",
+                "display_formats": DISPLAY_FORMATS,
+            })
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    async def run_batch():
+        nonlocal errors
+        start = time.perf_counter()
+        state = {"dataset_id": "fruits", "display_formats": DISPLAY_FORMATS}
+        inputs = [f"fruits for recipe number {i}" for i in range(batch)]
+        async for result in astream_batch(state, inputs, max_concurrency=batch):
+            errors += "error" in result
+        return time.perf_counter() - start
+
+    batch_seconds, *_ = await asyncio.gather(
+        run_batch(), *(ask(i) for i in range(interactive))
+    )
+    latencies = sorted(latencies) or [0.0]
+    print(json.dumps({
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "batch": batch_seconds,
+        "errors": errors,
+        "scheduler": scheduler.report(),
+    }))
+
+
+asyncio.run(main())
+"""
+
+
+def main(interactive: int, batch: int, capacity: int) -> None:
+    stub = openai_stub(latency=0.2, capacity=capacity)
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "LLM_CACHE_SIMILARITY": "",
+        "CHARTS_FAST_PATH_MIN_CONFIDENCE": "",
+        "PYTHONPATH": os.pathsep.join(
+            [str(Path(__file__).parent), os.environ.get("PYTHONPATH", "")]
+        ),
+    }
+    print(
+        f"{interactive} interactive requests and a batch of {batch}, "
+        f"API capacity {capacity}"
+    )
+    print(
+        f"{'':<10} {'p50':>8} {'p95':>8} {'batch':>8} {'failed':>7} "
+        f"{'API requests':>13} {'429s':>6} {'coalesced':>10}"
+    )
+    for label, scheduled in (("SDK retry", "false"), ("scheduler", "true")):
+        stub.hits.clear()
+        output = subprocess.run(
+            [sys.executable, "-c", WORKER, str(interactive), str(batch)],
+            env={**env, "LLM_SCHEDULER": scheduled},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(
+            f"{label:<10} {result['p50']:>7.2f}s {result['p95']:>7.2f}s "
+            f"{result['batch']:>7.2f}s {result['errors']:>7} "
+            f"{stub.hits['/v1/chat/completions']:>13} {stub.hits['429']:>6} "
+            f"{result['scheduler']['coalesced'] if scheduled == 'true' else '':>10}"
+        )
+    stub.close()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [40, 40, 8][len(args) :]))
@@ -0,0 +1,70 @@
+"""Measure how long a server process takes to import, start serving and become ready.
+
+Each SERVER_WARMUP mode is started in fresh processes (so nothing is already imported)
+which import the server, create the app, poll GET /ready until it answers 200 and then
+run the warm-up a first /charts request would otherwise pay for. Reports the median
+of each step's time since the process started.
+
+Usage: python scripts/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+WORKER = """
+import time
+start = time.perf_counter()
+import json, sys
+from gen_ui_backend.server import create_app, warm_up
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+with TestClient(app) as client:
+    serving = time.perf_counter()
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.005)
+    ready = time.perf_counter()
+    warm_up()  # a no-op once warm, else what the first requests would wait for
+    warm = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "serving": serving - start,
+    "ready": ready - start,
+    "warm": warm - start,
+}))
+"""
+
+MODES = ["startup", "background", "off"]
+
+
+def run(mode: str) -> Dict[str, float]:
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-x")}
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER, mode],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(runs: int) -> None:
+    print(
+        f"{'SERVER_WARMUP':<14} {'import':>8} {'serving':>8} {'ready':>8} {'warm':>8}"
+    )
+    for mode in MODES:
+        results: List[Dict[str, float]] = [run(mode) for _ in range(runs)]
+        medians = [
+            statistics.median(r[step] for r in results) * 1000
+            for step in ("import", "serving", "ready", "warm")
+        ]
+        print(f"{mode:<14} " + " ".join(f"{m:>6.0f}ms" for m in medians))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
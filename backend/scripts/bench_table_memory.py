@@ -0,0 +1,96 @@
+"""Compare the memory used by price rows as `Fruits` models, dicts and a `Dataset`.
+
+Also checks that rows round-trip through a `Dataset` to the same JSON the frontend
+gets from the `Fruits` models.
+
+Usage: python scripts/bench_table_memory.py [rows ...]
+"""
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from gen_ui_backend.charts.datasets import Dataset, get_dataset
+from gen_ui_backend.charts.schema import Fruits
+
+
+def synthetic_records(size: int) -> List[dict]:
+    rng = random.Random(0)
+    products = [
+        (row["name"], row["form"])
+        for dataset_id in ("fruits", "vegetables")
+        for row in get_dataset(dataset_id).to_fruits()
+    ]
+    records = []
+    for _ in range(size):
+        name, form = rng.choice(products)
+        records.append(
+            {
+                "name": name,
+                "form": form,
+                "retailPrice": round(rng.uniform(0.3, 12), 4),
+                "retailPriceUnit": rng.choice(["per pound", "per pint"]),
+            }
+        )
+    return records
+
+
+def table(records: List[dict]) -> Dataset:
+    columns = {
+        column: np.array([r.get(column, "") for r in records], dtype=dtype)
+        for column, dtype in (
+            ("name", str),
+            ("form", str),
+            ("retailPrice", np.float64),
+            ("retailPriceUnit", str),
+        )
+    }
+    return Dataset("bench", "", columns)
+
+
+def measure(build: Callable[[], object]) -> Tuple[int, int]:
+    """Bytes still allocated by what `build` returns, and the objects the GC tracks."""
+    gc.collect()
+    objects = len(gc.get_objects())
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracked = len(gc.get_objects()) - objects
+    del result
+    return size, tracked
+
+
+def check_round_trip(records: List[dict]) -> None:
+    expected = json.dumps([Fruits(**r).dict() for r in records])
+    assert json.dumps(Dataset.from_records("check", records).to_fruits()) == expected
+    rows = table(records)
+    assert json.dumps(rows.to_fruits()) == expected
+    assert json.dumps([row.to_fruit() for row in rows.rows()]) == expected
+
+
+def main(sizes: List[int]) -> None:
+    for dataset_id in ("fruits", "vegetables"):
+        check_round_trip(get_dataset(dataset_id).to_fruits())
+
+    print(f"{'rows':>9} {'form':<14} {'bytes/row':>10} {'GC objects':>11}")
+    for size in sizes:
+        records = synthetic_records(size)
+        check_round_trip(records[:1000])
+        forms = {
+            "Fruits models": lambda: [Fruits(**r) for r in records],
+            "dicts": lambda: [dict(r) for r in records],
+            "Dataset": lambda: table(records),
+        }
+        for label, build in forms.items():
+            size_bytes, tracked = measure(build)
+            print(f"{size:>9} {label:<14} {size_bytes / size:>10.1f} {tracked:>11}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,50 @@
+"""Show the weather tool's caches and request dedup against a local stub API.
+
+Usage: python scripts/bench_weather.py
+"""
+import asyncio
+import os
+import time
+from typing import Callable
+
+from fakes import weather_stub
+
+stub = weather_stub(latency=0.05)
+os.environ["GEOCODE_API_URL"] = f"{stub.url}/geocode"
+os.environ["WEATHER_GOV_API_URL"] = stub.url
+os.environ.setdefault("GEOCODE_API_KEY", "benchmark")
+
+from gen_ui_backend.tools.weather import (  # noqa: E402
+    aget_weather_data,
+    forecast_cache,
+    get_weather_data,
+)
+
+
+def timed(label: str, fn: Callable[[], object]) -> None:
+    before = sum(stub.hits.values())
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    requests = sum(stub.hits.values()) - before
+    print(f"{label:<40} {elapsed * 1000:8.1f}ms {requests:4d} upstream requests")
+
+
+def concurrent_lookups(count: int) -> None:
+    async def run() -> None:
+        await asyncio.gather(*(aget_weather_data("Denver", "CO") for _ in range(count)))
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    timed("cold lookup", lambda: get_weather_data("Austin", "TX"))
+    timed("repeat lookup", lambda: get_weather_data("Austin", "TX"))
+    forecast_cache.clear()
+    timed("repeat lookup, forecast expired", lambda: get_weather_data("Austin", "TX"))
+    timed("50 concurrent lookups, new city", lambda: concurrent_lookups(50))
+    stub.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare the rule-based filter parser with expected filters on a corpus of inputs.
+
+Each line of fast_path_corpus.jsonl holds an input, its dataset and the filters we
+expect for it, written by hand rather than recorded from the model. Pass --llm to
+compare with the live model's filters instead (needs OPENAI_API_KEY). Two filters
+agree when they select the same rows.
+
+Usage: python scripts/compare_fast_path.py [--llm] [corpus.jsonl]
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Any, List
+
+from gen_ui_backend.charts.chain import filters_chain
+from gen_ui_backend.charts.datasets import Dataset, get_dataset
+from gen_ui_backend.charts.fast_path import fast_path_filters, stats
+from gen_ui_backend.charts.filters import filter_indices
+from gen_ui_backend.charts.schema import Filter
+
+CORPUS = Path(__file__).with_name("fast_path_corpus.jsonl")
+
+
+def rows(dataset: Dataset, selected_filters: Any) -> List[int]:
+    return filter_indices(dataset, selected_filters).tolist()
+
+
+def main(args: List[str]) -> None:
+    live = "--llm" in args
+    paths = [arg for arg in args if not arg.startswith("--")]
+    corpus = Path(paths[0]) if paths else CORPUS
+    entries = [json.loads(line) for line in corpus.read_text().splitlines() if line]
+
+    # Without --llm, the reference filters are the corpus's hand-written ones.
+    reference = "the LLM" if live else "expected"
+    agreed = 0
+    print(f"{'input':<45} {'fast path':<10} {'same rows':<9}")
+    for entry in entries:
+        dataset = get_dataset(entry["dataset_id"])
+        fast = fast_path_filters(entry["input"], dataset)
+        if live:
+            chain = filters_chain(tuple(dataset.product_names()))
+            llm = chain.invoke(input=entry["input"])
+        else:
+            llm = Filter(**entry["llm"])
+        same = fast is not None and rows(dataset, fast) == rows(dataset, llm)
+        agreed += same
+        used = "yes" if fast is not None else "no"
+        print(f"{entry['input']:<45} {used:<10} {'yes' if same else '':<9}")
+
+    hits = stats["hits"]
+    print()
+    print(
+        f"answered by the fast path: {hits}/{len(entries)} ({hits / len(entries):.0%})"
+    )
+    print(f"{'same rows as ' + reference + ':':<27}{agreed}/{hits}")
+    print(
+        f"fell back to the LLM:      {stats['misses']} unparsed, {stats['empty']} empty"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
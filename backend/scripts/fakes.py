@@ -0,0 +1,346 @@
+"""Offline stand-ins for the chat models and HTTP APIs used by the graphs, for benchmarks."""
+import asyncio
+import gzip
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+DEFAULT_OUTPUTS: Dict[str, Any] = {
+    "form": "fresh",
+    "chart_type": "pie",
+    "display_key": "fruit_pie",
+}
+
+
+class FakeStructuredChatModel:
+    """Mimics `ChatOpenAI(...).with_structured_output(schema)` with a fixed latency.
+
+    Each call sleeps for `latency` seconds (asynchronously under `ainvoke`) and then
+    returns `schema` populated from `outputs`, leaving any other fields unset.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        outputs: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self.latency = latency
+        self.outputs = DEFAULT_OUTPUTS if outputs is None else outputs
+        self.calls = 0
+
+    def _result(self, schema: Type[BaseModel]) -> BaseModel:
+        self.calls += 1
+        return schema(
+            **{k: v for k, v in self.outputs.items() if k in schema.__fields__}
+        )
+
+    def with_structured_output(self, schema: Type[BaseModel]) -> Runnable:
+        def invoke(_: Any) -> BaseModel:
+            time.sleep(self.latency)
+            return self._result(schema)
+
+        async def ainvoke(_: Any) -> BaseModel:
+            await asyncio.sleep(self.latency)
+            return self._result(schema)
+
+        return RunnableLambda(invoke, ainvoke)
+
+
+TOOL_CALLS: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "weather": ("weather-data", {"city": "Austin", "state": "TX"}),
+    "repo": ("github-repo", {"owner": "langchain-ai", "repo": "langgraph"}),
+}
+"""The tool call the chat graph's model makes for inputs containing each keyword."""
+
+
+def pick_tool_call(
+    tools: List[dict], text: str, outputs: Dict[str, Any] = DEFAULT_OUTPUTS
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """The (name, arguments) of the canned call to one of the OpenAI-format `tools`.
+
+    With one tool (as bound by `with_structured_output`) it's called with the fields
+    of `outputs` it takes; with several, the one `TOOL_CALLS` picks for `text`, if any.
+    """
+    functions = {tool["function"]["name"]: tool["function"] for tool in tools}
+    if len(functions) == 1:
+        name, function = next(iter(functions.items()))
+        fields = function["parameters"].get("properties", {})
+        return name, {k: v for k, v in outputs.items() if k in fields}
+    for keyword, (name, args) in TOOL_CALLS.items():
+        if keyword in text.lower() and name in functions:
+            return name, args
+    return None
+
+
+class FakeChatModel(BaseChatModel):
+    """A chat model answering with canned tool calls after a fixed latency.
+
+    Unlike `FakeStructuredChatModel` it goes through `BaseChatModel`, so the response
+    cache, callbacks and token metrics see its calls as they would `ChatOpenAI`'s.
+    Given tools, it makes the call `pick_tool_call` picks for the last message, if
+    any, else it replies with text. Token counts are estimated at four characters
+    per token.
+    """
+
+    latency: float = 0.2
+    outputs: Dict[str, Any] = DEFAULT_OUTPUTS
+    model: str = "fake"
+    temperature: float = 0
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "temperature": self.temperature}
+
+    def bind_tools(
+        self, tools: Sequence[Any], **kwargs: Any
+    ) -> Runnable[Any, BaseMessage]:
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _result(
+        self, messages: List[BaseMessage], tools: Optional[List[dict]]
+    ) -> ChatResult:
+        text = str(messages[-1].content)
+        tool_call = pick_tool_call(tools, text, self.outputs) if tools else None
+        content = "" if tool_call else "Sorry, I can't help with that."
+        output = json.dumps(tool_call[1]) if tool_call else content
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        completion_tokens = len(output) // 4 + 1
+        message = AIMessage(
+            content=content,
+            tool_calls=(
+                [{"name": tool_call[0], "args": tool_call[1], "id": "call_fake"}]
+                if tool_call
+                else []
+            ),
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        tools: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages, tools)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        tools: Optional[List[dict]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages, tools)
+
+
+Route = Callable[..., Tuple[int, Dict[str, str], Any]]
+"""Handles a request: (path, request headers[, JSON body of a POST]) -> (status,
+response headers, JSON body)."""
+
+
+class StubServer:
+    """A local HTTP server serving JSON from `routes`, keyed by path prefix.
+
+    `hits` counts requests per route so callers can check what reached the network.
+    With `compress`, bodies are gzipped for clients which accept it.
+    """
+
+    def __init__(
+        self, routes: Dict[str, Route], latency: float = 0.0, compress: bool = False
+    ) -> None:
+        self.routes = routes
+        self.latency = latency
+        self.compress = compress
+        self.hits: Counter = Counter()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep connections alive, like the real APIs
+
+            def do_GET(self) -> None:
+                self.reply()
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                self.reply(json.loads(self.rfile.read(length) or b"null"))
+
+            def reply(self, *request_body: Any) -> None:
+                prefix = next((p for p in stub.routes if self.path.startswith(p)), None)
+                if prefix is None:
+                    self.send_error(404)
+                    return
+                stub.hits[prefix] += 1
+                time.sleep(stub.latency)
+                status, headers, body = stub.routes[prefix](
+                    self.path, dict(self.headers), *request_body
+                )
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if stub.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(payload)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+def weather_stub(latency: float = 0.05) -> StubServer:
+    """Serves the geocode.xyz, api.weather.gov points and forecast endpoints."""
+    server: StubServer
+
+    def geocode(path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        return 200, {}, {"latt": "30.27", "longt": "-97.74"}
+
+    def points(path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        return 200, {}, {"properties": {"forecast": f"{server.url}/forecast/EWX/1,2"}}
+
+    def forecast(path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        return 200, {}, {"properties": {"periods": [{"temperature": 91}]}}
+
+    server = StubServer(
+        {"/geocode/": geocode, "/points/": points, "/forecast/": forecast}, latency
+    )
+    return server
+
+
+def github_stub(latency: float = 0.05) -> StubServer:
+    """Serves `GET /repos/{owner}/{repo}`, honouring `If-None-Match` with a 304."""
+
+    def repo(path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        owner, name = path.split("/")[2:4]
+        etag = f'"{owner}-{name}-v1"'
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, None
+        return (
+            200,
+            {"ETag": etag, "Last-Modified": "Thu, 25 Jul 2024 00:00:00 GMT"},
+            {
+                "description": f"The {name} repository",
+                "stargazers_count": 42,
+                "language": "Python",
+            },
+        )
+
+    return StubServer({"/repos/": repo}, latency)
+
+
+def openai_stub(
+    latency: float = 0.2, capacity: int = 8, outputs: Optional[Dict[str, Any]] = None
+) -> StubServer:
+    """Serves OpenAI's `POST /v1/chat/completions`, answering with canned tool calls.
+
+    Like a provider's rate limit, requests beyond `capacity` in flight at once get a
+    429 straight away; the others are answered after `latency` seconds. Replies are
+    gzipped, as OpenAI's are. `hits` counts the 429s under "429". Streamed
+    completions aren't supported.
+    """
+    lock = threading.Lock()
+    in_flight = 0
+    server: StubServer
+
+    def completions(
+        path: str, headers: Dict[str, str], body: Dict[str, Any]
+    ) -> Tuple[int, Dict[str, str], Any]:
+        nonlocal in_flight
+        with lock:
+            if in_flight >= capacity:
+                server.hits["429"] += 1
+                error = {"message": "Rate limit reached", "type": "requests"}
+                return 429, {}, {"error": error}
+            in_flight += 1
+        try:
+            time.sleep(latency)
+        finally:
+            with lock:
+                in_flight -= 1
+        text = str(body["messages"][-1].get("content"))
+        tool_call = pick_tool_call(
+            body.get("tools", []), text, outputs or DEFAULT_OUTPUTS
+        )
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        if tool_call:
+            message["tool_calls"] = [
+                {
+                    "id": "call_fake",
+                    "type": "function",
+                    "function": {
+                        "name": tool_call[0],
+                        "arguments": json.dumps(tool_call[1]),
+                    },
+                }
+            ]
+        else:
+            message["content"] = "Sorry, I can't help with that."
+        prompt_tokens = len(json.dumps(body["messages"])) // 4
+        return (
+            200,
+            {},
+            {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if tool_call else "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": 10,
+                    "total_tokens": prompt_tokens + 10,
+                },
+            },
+        )
+
+    server = StubServer({"/v1/chat/completions": completions}, compress=True)
+    return server
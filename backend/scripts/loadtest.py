@@ -0,0 +1,314 @@
+"""Load-test the /charts and chat graphs offline, in process and over HTTP.
+
+ChatOpenAI is swapped for `FakeChatModel`, which answers with canned structured
+outputs and tool calls after a fixed latency, and the weather and GitHub APIs for
+local stubs. Each scenario runs at increasing concurrency (clients each sending
+`--requests` requests one after another) and reports p50/p95/p99 latency, throughput
+and the process's peak RSS so far. The HTTP server runs in this process too, on a
+background thread, so client and server share its CPUs, unless `--workers` starts
+it in that many worker processes (whose memory isn't counted).
+
+`--output` writes the results as JSON, and `--compare` diffs two such files, e.g.
+from before and after a change.
+
+Usage: python scripts/loadtest.py [--latency S] [--levels 1,4,16] [--requests N]
+                                  [--scenarios charts,chat,http] [--workers N]
+                                  [--output FILE]
+       python scripts/loadtest.py --compare BEFORE.json AFTER.json
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from itertools import count
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fakes import FakeChatModel, github_stub, weather_stub
+
+weather = weather_stub(latency=0.05)
+github = github_stub(latency=0.05)
+os.environ["GEOCODE_API_URL"] = f"{weather.url}/geocode"
+os.environ["WEATHER_GOV_API_URL"] = weather.url
+os.environ["GITHUB_API_URL"] = github.url
+os.environ.setdefault("GEOCODE_API_KEY", "benchmark")
+os.environ.setdefault("GITHUB_TOKEN", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from gen_ui_backend.chain import create_graph as create_chat_graph  # noqa: E402
+from gen_ui_backend.charts.chain import create_graph  # noqa: E402
+from gen_ui_backend.models import set_chat_model_factory  # noqa: E402
+from gen_ui_backend.server import create_app  # noqa: E402
+
+DISPLAY_FORMATS = [
+    {
+        "key": "fruit_pie",
+        "title": "Fruit Pie",
+        "chartType": "pie",
+        "description": "Number of forms for each fruit.",
+    }
+]
+
+CHAT_INPUTS = [
+    "What's the weather like in Austin #{n}?",
+    "Tell me about the langgraph repo #{n}",
+    "Write me a poem #{n}",
+]
+"""Chat inputs in turn: a weather tool call, a GitHub tool call and a text reply."""
+
+Request = Callable[[int], Awaitable[None]]
+"""Sends the n-th request of the run and waits for its response."""
+
+SEQUENCE = count()
+"""Numbers the requests of every scenario and level, so no two inputs are the same."""
+
+
+def charts_input(n: int) -> Dict[str, Any]:
+    # The numbers make every input different, so the LLM response cache never hits.
+    return {
+        "input": {"content": f"fresh fruit under ${n}"},
+        "dataset_id": "fruits",
+        "display_formats": DISPLAY_FORMATS,
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+async def run_level(send: Request, concurrency: int, requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        for _ in range(requests):
+            n = next(SEQUENCE)
+            start = time.perf_counter()
+            try:
+                await send(n)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        **{f"p{q}_ms": percentile(latencies, q / 100) * 1000 for q in (50, 95, 99)},
+        "peak_rss_mib": peak_rss_mib(),
+    }
+
+
+def in_process_charts() -> Request:
+    graph = create_graph()
+
+    async def send(n: int) -> None:
+        await graph.ainvoke(charts_input(n))
+
+    return send
+
+
+def in_process_chat() -> Request:
+    graph = create_chat_graph()
+
+    async def send(n: int) -> None:
+        text = CHAT_INPUTS[n % len(CHAT_INPUTS)].format(n=n)
+        await graph.ainvoke({"input": [HumanMessage(content=text)]})
+
+    return send
+
+
+def serve() -> str:
+    """Start the API server on a free local port and return its URL."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(
+        uvicorn.Config(create_app(), log_level="warning", limit_concurrency=4096)
+    )
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    host, port = sock.getsockname()
+    return f"http://{host}:{port}"
+
+
+def fake_app() -> Any:
+    """The server app with the fake model, for the workers of `serve_workers`."""
+    latency = float(os.environ["LOADTEST_LATENCY"])
+    set_chat_model_factory(lambda **kwargs: FakeChatModel(latency=latency, **kwargs))
+    return create_app()
+
+
+def serve_workers(workers: int, latency: float) -> str:
+    """Start the API server in `workers` processes and return its URL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    code = (
+        "from gen_ui_backend.workers import run_workers; "
+        f"run_workers('loadtest:fake_app', {workers}, host='127.0.0.1', port={port}, "
+        "log_level='warning', limit_concurrency=4096)"
+    )
+    path = os.pathsep.join(
+        [str(Path(__file__).parent), os.environ.get("PYTHONPATH", "")]
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", code],
+        env={**os.environ, "LOADTEST_LATENCY": str(latency), "PYTHONPATH": path},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stdout is not None
+    for line in process.stdout:
+        if "workers ready" in line:
+            break
+    else:
+        raise RuntimeError("The workers failed to start.")
+    # Keep reading, so the workers never block on a full pipe.
+    threading.Thread(target=process.stdout.read, daemon=True).start()
+    atexit.register(process.terminate)
+    return f"http://127.0.0.1:{port}"
+
+
+def over_http(url: str) -> Callable[[], Request]:
+    def scenario() -> Request:
+        client = httpx.AsyncClient(
+            base_url=url, timeout=60, limits=httpx.Limits(max_connections=None)
+        )
+
+        async def send(n: int) -> None:
+            response = await client.post(
+                "/charts/invoke", json={"input": charts_input(n)}
+            )
+            response.raise_for_status()
+
+        return send
+
+    return scenario
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    set_chat_model_factory(
+        lambda **kwargs: FakeChatModel(latency=args.latency, **kwargs)
+    )
+    scenarios: Dict[str, Callable[[], Request]] = {
+        "charts": in_process_charts,
+        "chat": in_process_chat,
+    }
+    if "http" in args.scenarios:
+        url = serve_workers(args.workers, args.latency) if args.workers else serve()
+        scenarios["http"] = over_http(url)
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    print(
+        f"{'scenario':<8} {'clients':>7} {'req/s':>8} {'p50':>8} {'p95':>8} "
+        f"{'p99':>8} {'errors':>6} {'peak RSS':>10}"
+    )
+    for name in args.scenarios:
+        results[name] = []
+        for concurrency in args.levels:
+            # A fresh graph (and HTTP client) for each level, on its own event loop.
+            async def level() -> Dict[str, Any]:
+                return await run_level(scenarios[name](), concurrency, args.requests)
+
+            result = asyncio.run(level())
+            results[name].append(result)
+            print(
+                f"{name:<8} {concurrency:>7} {result['throughput']:>8.1f} "
+                f"{result['p50_ms']:>6.0f}ms {result['p95_ms']:>6.0f}ms "
+                f"{result['p99_ms']:>6.0f}ms {result['errors']:>6} "
+                f"{result['peak_rss_mib']:>7.1f}MiB"
+            )
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "fake_latency": args.latency,
+        "workers": args.workers,
+        "requests_per_client": args.requests,
+        "results": results,
+    }
+
+
+def compare(before_path: str, after_path: str) -> None:
+    before, after = (json.loads(Path(p).read_text()) for p in (before_path, after_path))
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(
+        f"{'scenario':<8} {'clients':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    )
+    for name, levels in after["results"].items():
+        previous = {r["concurrency"]: r for r in before["results"].get(name, [])}
+        for result in levels:
+            old = previous.get(result["concurrency"])
+            if old is None:
+                continue
+            changes = [
+                f"{(result[key] / old[key] - 1) * 100:>+7.1f}%"
+                for key in ("throughput", "p50_ms", "p95_ms", "p99_ms")
+            ]
+            print(f"{name:<8} {result['concurrency']:>7} {' '.join(changes)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument(
+        "--levels", type=lambda s: [int(v) for v in s.split(",")], default=[1, 4, 16]
+    )
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument(
+        "--scenarios", type=lambda s: s.split(","), default=["charts", "chat", "http"]
+    )
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = run(args)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    weather.close()
+    github.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Dict, Iterator, List, Type
+
+import pytest
+from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from gen_ui_backend.charts import batch
+from gen_ui_backend.models import set_chat_model_factory
+
+DISPLAY_FORMATS = [
+    {
+        "key": "fruit_pie",
+        "title": "Fruit Pie",
+        "chartType": "pie",
+        "description": "Each fruit as a slice.",
+    }
+]
+
+STATE: Dict[str, Any] = {"dataset_id": "fruits", "display_formats": DISPLAY_FORMATS}
+
+
+class FakeModel:
+    """Answers every structured output call with the same fields."""
+
+    outputs = {"form": "fresh", "chart_type": "pie", "display_key": "fruit_pie"}
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def with_structured_output(self, schema: Type[BaseModel]) -> Runnable:
+        def invoke(_: Any) -> BaseModel:
+            self.calls += 1
+            fields = schema.__fields__
+            return schema(**{k: v for k, v in self.outputs.items() if k in fields})
+
+        return RunnableLambda(invoke)
+
+
+@pytest.fixture
+def model(monkeypatch: pytest.MonkeyPatch) -> Iterator[FakeModel]:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    fake = FakeModel()
+    set_chat_model_factory(lambda **kwargs: fake)  # type: ignore[arg-type, return-value]
+    yield fake
+    set_chat_model_factory(None)  # type: ignore[arg-type]
+
+
+async def collect(inputs: List[str]) -> List[Dict]:
+    async def run() -> List[Dict]:
+        return [result async for result in batch.astream_batch(STATE, inputs)]  # type: ignore[arg-type]
+
+    # A stream which never ends fails here rather than hanging the suite.
+    return await asyncio.wait_for(run(), timeout=10)
+
+
+async def test_identical_inputs_run_once(model: FakeModel) -> None:
+    results = await collect(["tasty things", " tasty things ", "something nice"])
+    assert sorted((r["input"], r["positions"]) for r in results) == [
+        ("something nice", [2]),
+        ("tasty things", [0, 1]),
+    ]
+    for result in results:
+        assert result["selected_filters"]["form"] == "fresh"
+        assert result["chart_type"] == "pie"
+        assert result["display_format"] == "fruit_pie"
+        assert result["props"] is not None
+    # Filters, chart type and display format for each distinct input.
+    assert model.calls == 6
+
+
+async def test_fast_path_inputs_skip_the_filters_call(model: FakeModel) -> None:
+    [result] = await collect(["frozen"])
+    assert result["selected_filters"]["form"] == "frozen"
+    assert model.calls == 2
+
+
+async def test_a_failing_stage_answers_its_inputs_with_errors(
+    model: FakeModel, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def broken(*args: Any, **kwargs: Any) -> Any:
+        raise RuntimeError("display formats unavailable")
+
+    monkeypatch.setattr(batch, "display_format_chain_and_input", broken)
+    results = await collect(["tasty things", "something nice"])
+    assert sorted(r["input"] for r in results) == ["something nice", "tasty things"]
+    assert all(r["error"] == "display formats unavailable" for r in results)
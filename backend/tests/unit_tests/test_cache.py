@@ -0,0 +1,145 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration
+
+from gen_ui_backend.cache import (
+    HashingEmbeddings,
+    LLMResponseCache,
+    content_words,
+    mark_cached,
+)
+
+LLM_STRING = "fake-model"
+
+
+def prompt(text: str) -> str:
+    return dumps(
+        [SystemMessage(content="Generate filters."), HumanMessage(content=text)]
+    )
+
+
+def answer(text: str) -> List[ChatGeneration]:
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+@pytest.fixture
+def cache() -> LLMResponseCache:
+    return LLMResponseCache(similarity_threshold=0.5)
+
+
+def test_semantic_tier_is_off_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("LLM_CACHE_SIMILARITY", raising=False)
+    cache = LLMResponseCache.from_env()
+    assert cache.similarity_threshold is None
+    cache.update(prompt("show me the canned fruit"), LLM_STRING, answer("canned"))
+    assert cache.lookup(prompt("canned fruit please"), LLM_STRING) is None
+    assert cache.report()["semantic"] is False
+
+
+@pytest.mark.parametrize(
+    "cached, asked",
+    [
+        (
+            "which fruits are sold canned and compare them by their retail price",
+            "which fruits are sold frozen and compare them by their retail price",
+        ),
+        (
+            "which fruit is cheapest per cup equivalent when bought dried",
+            "which fruit is cheapest per cup equivalent when bought fresh",
+        ),
+        ("fruits that are canned", "fruits that are not canned"),
+    ],
+)
+def test_near_misses_are_not_semantic_hits(cached: str, asked: str) -> None:
+    # Close to the old 0.9 threshold on the words alone...
+    embeddings = HashingEmbeddings()
+    similarity = embeddings.embed(cached) @ embeddings.embed(asked)
+    assert similarity > 0.85
+    # ...but they ask for different filters.
+    cache = LLMResponseCache(similarity_threshold=0.5)
+    cache.update(prompt(cached), LLM_STRING, answer("cached"))
+    assert cache.lookup(prompt(asked), LLM_STRING) is None
+    assert cache.stats == {"exact_hits": 0, "semantic_hits": 0, "misses": 1}
+
+
+def test_inputs_differing_in_stop_words_are_semantic_hits(
+    cache: LLMResponseCache,
+) -> None:
+    cache.update(prompt("show me all the canned fruit"), LLM_STRING, answer("canned"))
+    assert cache.lookup(prompt("canned fruit please"), LLM_STRING) == mark_cached(
+        answer("canned")
+    )
+    assert cache.stats["semantic_hits"] == 1
+
+
+def test_numbers_are_never_fuzzy_matched(cache: LLMResponseCache) -> None:
+    cache.update(prompt("canned fruit under $2"), LLM_STRING, answer("2"))
+    assert cache.lookup(prompt("show me canned fruit under $3"), LLM_STRING) is None
+
+
+def test_report_counts_hits_and_misses(cache: LLMResponseCache) -> None:
+    cache.update(prompt("frozen fruit"), LLM_STRING, answer("frozen"))
+    cache.lookup(prompt("frozen fruit"), LLM_STRING)
+    cache.lookup(prompt("the frozen fruit"), LLM_STRING)
+    cache.lookup(prompt("dried fruit"), LLM_STRING)
+    report = cache.report()
+    assert report["exact_hits"] == 1
+    assert report["semantic_hits"] == 1
+    assert report["misses"] == 1
+    assert report["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_shared_file_is_read_by_other_instances(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    writer = LLMResponseCache(path=path, similarity_threshold=0.5)
+    reader = LLMResponseCache(path=path, similarity_threshold=0.5)
+    writer.update(prompt("canned fruit"), LLM_STRING, answer("canned"))
+    assert reader.lookup(prompt("canned fruit"), LLM_STRING) == mark_cached(
+        answer("canned")
+    )
+    assert reader.lookup(prompt("show me canned fruit"), LLM_STRING) == mark_cached(
+        answer("canned")
+    )
+
+
+def test_model_is_called_for_a_near_miss(cache: LLMResponseCache) -> None:
+    model = FakeListChatModel(responses=["form=canned", "form=frozen"], cache=cache)
+    assert model.invoke("fruits sold canned").content == "form=canned"
+    assert model.invoke("fruits sold frozen").content == "form=frozen"
+    assert model.invoke("the fruits sold canned").content == "form=canned"
+
+
+def test_content_words_keep_negations() -> None:
+    assert content_words("Show me the fruits that are NOT canned") == [
+        "fruits",
+        "not",
+        "canned",
+    ]
+
+
+def test_writes_prune_the_shared_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    cache = LLMResponseCache(path=path, ttl=60, max_rows=2)
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.update(prompt("canned fruit"), LLM_STRING, answer("canned"))
+    now += 61
+    # The first row has expired...
+    cache.update(prompt("frozen fruit"), LLM_STRING, answer("frozen"))
+    rows = sqlite3.connect(path).execute("SELECT text FROM llm_cache").fetchall()
+    assert rows == [("frozen fruit",)]
+    # ...and the oldest rows beyond `max_rows` go too.
+    for text in ["dried fruit", "fresh fruit"]:
+        now += 1
+        cache.update(prompt(text), LLM_STRING, answer(text))
+    rows = sqlite3.connect(path).execute("SELECT text FROM llm_cache").fetchall()
+    assert sorted(rows) == [("dried fruit",), ("fresh fruit",)]
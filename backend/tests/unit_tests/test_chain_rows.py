@@ -0,0 +1,99 @@
+from typing import Any, List, Optional
+
+import numpy as np
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from gen_ui_backend.charts import chain
+from gen_ui_backend.charts.datasets import Dataset
+from gen_ui_backend.charts.schema import Filter
+
+FRUITS = [
+    {"name": f"Fruit {i}", "form": "Fresh" if i % 2 else "Canned", "retailPrice": i}
+    for i in range(25)
+]
+
+
+@pytest.fixture
+def pages(monkeypatch: pytest.MonkeyPatch) -> List[dict]:
+    emitted: List[dict] = []
+
+    def record(page: dict) -> dict:
+        emitted.append(page)
+        return page
+
+    monkeypatch.setattr(chain, "ROWS_PAGE_SIZE", 5)
+    monkeypatch.setattr(chain, "emit_rows_page", RunnableLambda(record))
+    return emitted
+
+
+def test_filter_data_streams_only_the_first_pages(
+    pages: List[dict], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    state = {"fruits": FRUITS, "selected_filters": Filter(form="fresh")}
+    chain.filter_data(state, {})  # type: ignore[arg-type]
+    assert [(page["page"], page["pages"], page["total_rows"]) for page in pages] == [
+        (0, 3, 12)
+    ]
+    assert pages[0]["rows"] == FRUITS[1:10:2]
+
+    pages.clear()
+    monkeypatch.setattr(chain, "ROWS_STREAM_PAGES", 2)
+    chain.filter_data(state, {})  # type: ignore[arg-type]
+    assert [page["page"] for page in pages] == [0, 1]
+
+
+def test_rows_page_at_serves_the_rest_by_offset() -> None:
+    state = {"fruits": FRUITS}
+    page = chain.rows_page_at(state, Filter(form="fresh"), 10, 5)  # type: ignore[arg-type]
+    assert page == {"offset": 10, "total_rows": 12, "rows": FRUITS[21:25:2]}
+    assert chain.rows_page_at(state, None, 30, 5)["rows"] == []  # type: ignore[arg-type]
+
+
+def test_rows_stay_out_of_the_state(pages: List[dict]) -> None:
+    chain.selected_rows.clear()
+    state = {
+        "fruits": FRUITS,
+        "selected_filters": Filter(form="fresh"),
+        "display_format": "bar_average_retail_price_by_form",
+    }
+    update = chain.filter_data(state, {})  # type: ignore[arg-type]
+    assert update == {"dataset_version": chain.get_table(state).version}  # type: ignore[arg-type]
+    update = chain.aggregate_data({**state, **update})  # type: ignore[arg-type]
+    assert update["fruits"] is None
+    assert update["props"] is not None
+    assert len(chain.selected_rows) == 1
+
+
+def test_narrower_follow_ups_start_from_the_cached_rows(
+    pages: List[dict], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    chain.selected_rows.clear()
+    state = {"fruits": FRUITS, "selected_filters": Filter(form="fresh")}
+    state.update(chain.filter_data(state, {}))  # type: ignore[arg-type]
+    calls: List[Optional[int]] = []
+
+    def filter_indices(
+        table: Dataset, selected_filters: Any, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        calls.append(None if rows is None else len(rows))
+        return original(table, selected_filters, rows)
+
+    original = chain.filter_indices
+    monkeypatch.setattr(chain, "filter_indices", filter_indices)
+    follow_up = {
+        **state,
+        "previous_filters": Filter(form="fresh"),
+        "selected_filters": Filter(form="fresh", name=["fruit 1", "fruit 2"]),
+    }
+    chain.filter_data(follow_up, {})  # type: ignore[arg-type]
+    assert calls == [12]
+    assert pages[-1]["rows"] == [FRUITS[1]]
+
+
+def test_a_requests_table_is_built_once() -> None:
+    state = {"fruits": list(FRUITS)}
+    table = chain.get_table(state)  # type: ignore[arg-type]
+    assert chain.get_table(state) is table  # type: ignore[arg-type]
+    # Equal rows sent by another request get their own table.
+    assert chain.get_table({"fruits": list(FRUITS)}) is not table  # type: ignore[arg-type]
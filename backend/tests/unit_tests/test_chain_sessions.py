@@ -0,0 +1,107 @@
+from typing import Type
+
+import pytest
+from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from gen_ui_backend.charts import chain
+from gen_ui_backend.charts.schema import Filter
+from gen_ui_backend.models import set_chat_model_factory
+
+DISPLAY_FORMATS = [
+    {
+        "key": "fruit_pie",
+        "title": "Fruit Pie",
+        "chartType": "pie",
+        "description": "Each fruit as a slice.",
+    }
+]
+
+FRUITS = [{"name": "Apples", "form": "Fresh", "retailPrice": 1.0}]
+
+
+class ChartConfig(BaseModel):
+    name: list
+    form: str
+    chart_type: str
+    display_key: str
+
+
+def render(state: dict) -> str:
+    runnable, input = chain.chart_config_chain_and_input(state)  # type: ignore[arg-type]
+    prompt = runnable.first.invoke(input)  # type: ignore[attr-defined]
+    return prompt.to_string()
+
+
+def test_single_call_refines_the_previous_filters(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # The chain's chat model is only built, never called.
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    state = {
+        "input": {"content": "only apples"},
+        "fruits": FRUITS,
+        "display_formats": DISPLAY_FORMATS,
+    }
+    assert "refining" not in render(state)
+    previous = Filter(form="fresh")
+    assert 'applied last: {"form": "fresh"}' in render(
+        {**state, "selected_filters": previous}
+    )
+
+    result = ChartConfig(
+        name=["apples"], form="fresh", chart_type="pie", display_key="fruit_pie"
+    )
+    output = chain.chart_config_output(
+        {**state, "selected_filters": previous},  # type: ignore[arg-type]
+        result,
+    )
+    assert output["previous_filters"] == previous
+    assert output["selected_filters"] == Filter(name=["apples"], form="fresh")
+    assert output["display_format"] == "fruit_pie"
+
+
+class FakeModel:
+    """Answers the chart config call with `ChartConfig`'s fields."""
+
+    def with_structured_output(self, schema: Type[BaseModel]) -> Runnable:
+        config = {
+            "name": ["apples"],
+            "form": "fresh",
+            "chart_type": "pie",
+            "display_key": "fruit_pie",
+        }
+        fields = schema.__fields__
+        return RunnableLambda(
+            lambda _: schema(**{k: v for k, v in config.items() if k in fields})
+        )
+
+
+async def test_single_call_graph_emits_the_chart_config(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    set_chat_model_factory(lambda **kwargs: FakeModel())  # type: ignore[arg-type, return-value]
+    try:
+        graph = chain.create_graph("single_call")
+        outputs = {}
+        async for event in graph.astream_events(
+            {
+                "input": {"content": "fresh apples"},
+                "fruits": FRUITS,
+                "display_formats": DISPLAY_FORMATS,
+            },
+            version="v2",
+        ):
+            if event["event"] == "on_chain_end":
+                outputs[event["name"]] = event["data"]["output"]
+    finally:
+        set_chat_model_factory(None)  # type: ignore[arg-type]
+
+    # frontend/app/agent.tsx reads these fields off the node's end event.
+    config = outputs["generate_chart_config"]
+    assert config["chart_type"] == "pie"
+    assert config["display_format"] == "fruit_pie"
+    assert config["selected_filters"] == Filter(name=["apples"], form="fresh")
+    assert outputs["filtered_rows"]["total_rows"] == 1
+    assert outputs["aggregate_data"]["props"] is not None
@@ -0,0 +1,70 @@
+import threading
+import time
+from typing import Any, Dict
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from gen_ui_backend import chain
+
+TOOL_CALLS = [
+    {"id": "call_slow", "type": "slow", "args": {"value": 1}},
+    {"id": "call_fast", "type": "fast", "args": {"value": 2}},
+]
+
+
+@pytest.fixture
+def threads(monkeypatch: pytest.MonkeyPatch) -> Dict[str, str]:
+    """Fake tools, which record the thread each call ran on."""
+    used: Dict[str, str] = {}
+
+    def tool(name: str, seconds: float) -> RunnableLambda:
+        def run(args: dict) -> dict:
+            used[name] = threading.current_thread().name
+            time.sleep(seconds)
+            return {"tool": name, **args}
+
+        async def arun(args: dict) -> dict:
+            return run(args)
+
+        return RunnableLambda(run, arun)
+
+    monkeypatch.setattr(
+        chain, "TOOLS_MAP", {"slow": tool("slow", 0.3), "fast": tool("fast", 0.1)}
+    )
+    monkeypatch.setattr(chain, "TOOL_TIMEOUTS", {"slow": 5, "fast": 5})
+    return used
+
+
+EXPECTED: Dict[str, Any] = {
+    "call_slow": {"tool": "slow", "value": 1},
+    "call_fast": {"tool": "fast", "value": 2},
+}
+
+
+def test_tool_calls_run_concurrently_on_the_shared_executor(
+    threads: Dict[str, str],
+) -> None:
+    start = time.monotonic()
+    result = chain.invoke_tools({"tool_calls": TOOL_CALLS}, {})
+    assert time.monotonic() - start < 0.4
+    # Keyed by call id, in the calls' order rather than the order they finished in.
+    assert list(result["tool_result"].items()) == list(EXPECTED.items())
+    # Run by the shared executor's threads, not a pool made for this call.
+    assert all(name.startswith("tool_") for name in threads.values())
+
+
+async def test_async_tool_calls_keep_their_order(threads: Dict[str, str]) -> None:
+    result = await chain.ainvoke_tools({"tool_calls": TOOL_CALLS}, {})
+    assert list(result["tool_result"].items()) == list(EXPECTED.items())
+
+
+def test_a_timed_out_call_reports_an_error(
+    threads: Dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(chain, "TOOL_TIMEOUTS", {"slow": 0.1, "fast": 5})
+    result = chain.invoke_tools({"tool_calls": TOOL_CALLS}, {})
+    assert result["tool_result"] == {
+        "call_slow": {"error": "slow timed out after 0.1s."},
+        "call_fast": EXPECTED["call_fast"],
+    }
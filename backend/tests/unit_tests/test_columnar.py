@@ -0,0 +1,136 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from gen_ui_backend.charts.columnar import (
+    MANIFEST,
+    cache_path,
+    read_arrays,
+    remove_stale,
+    write_arrays,
+)
+from gen_ui_backend.charts.datasets import csv_version, load_dataset
+
+CSV = """Fruit,Form,RetailPrice,RetailPriceUnit,Yield,CupEquivalentSize,CupEquivalentUnit,CupEquivalentPrice
+Apples,Fresh,1.8541,per pound,0.9,0.2425,pounds,0.4996
+"Apples, applesauce",Canned,1.1705,per pound,1,0.5401,pounds,0.6323
+Pears,Fresh,1.5,per pound,0.9,0.36,pounds,0.6
+"""
+
+
+def test_arrays_round_trip(tmp_path: Path) -> None:
+    arrays = {
+        "codes": np.array([0, 2, 1], dtype=np.uint8),
+        "vocab": np.array(["a", "bb", "ccc"]),
+        "prices": np.array([1.5, np.nan, 2.25]),
+    }
+    write_arrays(tmp_path / "table", arrays, {"version": "v1"})
+    cached = read_arrays(tmp_path / "table")
+    assert cached is not None
+    manifest, loaded = cached
+    assert manifest["version"] == "v1"
+    for name, values in arrays.items():
+        np.testing.assert_array_equal(loaded[name], values)
+        assert loaded[name].dtype == values.dtype
+        # Memory-mapped, so processes share the pages, and read-only.
+        assert isinstance(loaded[name], np.memmap)
+        assert not loaded[name].flags.writeable
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".")]
+
+
+def test_missing_or_corrupt_cache_reads_as_none(tmp_path: Path) -> None:
+    assert read_arrays(tmp_path / "missing") is None
+    (tmp_path / "truncated").mkdir()
+    (tmp_path / "truncated" / MANIFEST).write_text('{"arrays": {')
+    assert read_arrays(tmp_path / "truncated") is None
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        lambda path: path.unlink(),
+        lambda path: path.write_bytes(path.read_bytes()[:-8]),
+        lambda path: path.write_bytes(b"not an array"),
+    ],
+    ids=["missing", "truncated", "garbage"],
+)
+def test_missing_or_corrupt_arrays_read_as_none(tmp_path: Path, damage) -> None:
+    write_arrays(tmp_path / "table", {"prices": np.arange(8.0)}, {})
+    damage(tmp_path / "table" / "prices.npy")
+    assert read_arrays(tmp_path / "table") is None
+
+
+def test_corrupt_cache_is_rebuilt_from_the_csv(tmp_path: Path) -> None:
+    path = tmp_path / "fruits.csv"
+    path.write_text(CSV)
+    cache_dir = tmp_path / "cache"
+    parsed = load_dataset("fruits", path, cache_dir)
+    directory = cache_path(cache_dir, "fruits", parsed.version)
+    (directory / "retailPrice.npy").write_bytes(b"not an array")
+
+    dataset = load_dataset("fruits", path, cache_dir)
+    assert dataset.to_fruits() == parsed.to_fruits()
+    # The rebuilt cache replaced the corrupt one.
+    assert read_arrays(directory) is not None
+    assert isinstance(
+        load_dataset("fruits", path, cache_dir).numeric("retailPrice"), np.memmap
+    )
+
+
+def test_dataset_is_loaded_from_the_cache(tmp_path: Path) -> None:
+    path = tmp_path / "fruits.csv"
+    path.write_text(CSV)
+    cache_dir = tmp_path / "cache"
+    parsed = load_dataset("fruits", path, cache_dir)
+    cached = load_dataset("fruits", path, cache_dir)
+    assert (cache_path(cache_dir, "fruits", parsed.version) / MANIFEST).exists()
+    assert cached.version == parsed.version
+    assert isinstance(cached.numeric("retailPrice"), np.memmap)
+    assert cached.to_fruits() == parsed.to_fruits()
+    assert cached.product_names() == parsed.product_names()
+
+
+def test_changed_csv_replaces_the_stale_cache(tmp_path: Path) -> None:
+    path = tmp_path / "fruits.csv"
+    path.write_text(CSV)
+    cache_dir = tmp_path / "cache"
+    old = load_dataset("fruits", path, cache_dir)
+    load_dataset("vegetables", path, cache_dir)
+    # A directory another process is still writing has no manifest yet.
+    staging = cache_dir / f"fruits-{'0' * len(old.version)}"
+    staging.mkdir()
+
+    path.write_text(CSV + "Plums,Dried,5.0,per pound,1,0.2,pounds,1.0\n")
+    new = load_dataset("fruits", path, cache_dir)
+    assert new.version != old.version
+    assert len(new) == len(old) + 1
+    assert sorted(p.name for p in cache_dir.iterdir()) == sorted(
+        [
+            f"fruits-{new.version}",
+            f"vegetables-{old.version}",
+            staging.name,
+        ]
+    )
+
+
+def test_remove_stale_keeps_the_current_version(tmp_path: Path) -> None:
+    raw = CSV.encode()
+    version = csv_version(raw)
+    for name in ("fruits", "fruits-extra"):
+        write_arrays(cache_path(tmp_path, name, version), {}, {})
+    remove_stale(tmp_path, "fruits", version)
+    assert (cache_path(tmp_path, "fruits", version) / MANIFEST).exists()
+    assert (cache_path(tmp_path, "fruits-extra", version) / MANIFEST).exists()
+
+
+def test_unwritable_cache_falls_back_to_the_csv(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    path = tmp_path / "fruits.csv"
+    path.write_text(CSV)
+    blocker = tmp_path / "cache"
+    blocker.write_text("not a directory")
+    dataset = load_dataset("fruits", path, blocker)
+    assert len(dataset) == 3
+    assert "Couldn't cache the columns of fruits" in capsys.readouterr().out
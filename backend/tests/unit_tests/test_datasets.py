@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from gen_ui_backend.charts.datasets import (
+    DATASET_FILES,
+    DATASETS_DIR,
+    Dataset,
+    EncodedColumn,
+    load_csv,
+)
+
+RECORDS = [
+    {"name": "Apples", "form": "Fresh", "retailPrice": 1.85},
+    {"name": "Apples, applesauce", "form": "Canned", "retailPrice": 1.17},
+    {"name": "Pears", "form": "Fresh", "retailPrice": 1.5},
+    {"name": "Apples", "form": "Juice", "retailPrice": 0.7},
+]
+
+
+def test_records_round_trip() -> None:
+    dataset = Dataset.from_records("request", RECORDS)
+    assert dataset.to_fruits() == RECORDS
+    assert [row.to_fruit() for row in dataset.rows()] == RECORDS
+    assert dataset.to_fruits([3, 0]) == [RECORDS[3], RECORDS[0]]
+
+
+def test_string_columns_are_dictionary_encoded() -> None:
+    dataset = Dataset.from_records("request", RECORDS)
+    names = dataset.columns["name"]
+    assert isinstance(names, EncodedColumn)
+    assert names.vocab.tolist() == ["Apples", "Apples, applesauce", "Pears"]
+    assert names.codes.dtype == np.uint8
+    assert dataset.product_names() == ["apples", "apples, applesauce", "pears"]
+
+
+def test_codes_widen_with_the_vocabulary() -> None:
+    values = [f"product {i}" for i in range(300)]
+    column = EncodedColumn.encode(values)
+    assert column.codes.dtype == np.uint16
+    assert column.vocab[column.codes].tolist() == values
+
+
+def test_lowercased_encoding_merges_case_variants() -> None:
+    dataset = Dataset.from_records(
+        "request",
+        [{**RECORDS[0], "form": form} for form in ("Fresh", "FRESH", "Dried")],
+    )
+    vocab, codes = dataset.encoded("form")
+    assert vocab.tolist() == ["dried", "fresh"]
+    assert vocab[codes].tolist() == ["fresh", "fresh", "dried"]
+
+
+def test_version_identifies_the_rows() -> None:
+    first = Dataset.from_records("request", RECORDS)
+    assert Dataset.from_records("request", list(RECORDS)).version == first.version
+    assert Dataset.from_records("request", RECORDS[:-1]).version != first.version
+
+
+@pytest.mark.parametrize("dataset_id", sorted(DATASET_FILES))
+def test_csv_datasets_round_trip(dataset_id: str) -> None:
+    dataset = load_csv(dataset_id, DATASETS_DIR / DATASET_FILES[dataset_id])
+    fruits = dataset.to_fruits()
+    assert len(fruits) == len(dataset) > 0
+    assert fruits == [row.to_fruit() for row in dataset.rows()]
+    assert all(isinstance(fruit["retailPrice"], float) for fruit in fruits)
@@ -0,0 +1,29 @@
+from gen_ui_backend.charts.datasets import Dataset
+from gen_ui_backend.charts.fast_path import fast_path_filters
+from gen_ui_backend.charts.schema import Filter
+from gen_ui_backend.metrics import fast_path_results, render_metrics
+
+DATASET = Dataset.from_records(
+    "request",
+    [
+        {"name": "Apples", "form": "Fresh", "retailPrice": 1.85},
+        {"name": "Pears", "form": "Canned", "retailPrice": 1.5},
+    ],
+)
+
+
+def results() -> dict:
+    return {key[0]: value for key, value in fast_path_results._values.items()}
+
+
+def test_results_are_exported_as_metrics() -> None:
+    before = results()
+    assert fast_path_filters("canned", DATASET) == Filter(form="canned")
+    assert fast_path_filters("whatever is in season", DATASET) is None
+    assert fast_path_filters("pears under $1", DATASET) is None
+    after = results()
+    for result in ("hits", "misses", "empty"):
+        assert after[result] == before.get(result, 0) + 1
+    assert f'fast_path_filters_total{{result="hits"}} {after["hits"]:g}' in (
+        render_metrics()
+    )
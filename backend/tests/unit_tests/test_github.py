@@ -0,0 +1,60 @@
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from gen_ui_backend.tools import github
+
+ETAG = '"langgraph-v1"'
+
+
+class Api:
+    """A fake GitHub repo endpoint whose ETag changes when `version` does."""
+
+    def __init__(self) -> None:
+        self.version = 1
+        self.requests: List[Dict[str, str]] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(dict(request.headers))
+        etag = f'"langgraph-v{self.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        body = {"description": f"v{self.version}", "stargazers_count": self.version}
+        return httpx.Response(200, headers={"ETag": etag}, json=body)
+
+
+@pytest.fixture
+def api(monkeypatch: pytest.MonkeyPatch) -> Api:
+    api = Api()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    monkeypatch.setenv("GITHUB_TOKEN", "test")
+    monkeypatch.setattr(github, "get_async_client", lambda: client)
+    github.repo_cache.clear()
+    return api
+
+
+async def test_revalidates_with_etag(api: Api) -> None:
+    first = await github.aget_github_repo("langchain-ai", "langgraph")
+    assert "If-None-Match" not in api.requests[0]
+    second = await github.aget_github_repo("langchain-ai", "LangGraph")
+    assert api.requests[1]["if-none-match"] == ETAG
+    assert second == {**first, "repo": "langgraph"}
+
+
+async def test_changed_repo_replaces_cached_entry(api: Api) -> None:
+    await github.aget_github_repo("langchain-ai", "langgraph")
+    api.version = 2
+    result = await github.aget_github_repo("langchain-ai", "langgraph")
+    assert result["stars"] == 2
+    await github.aget_github_repo("langchain-ai", "langgraph")
+    assert api.requests[2]["if-none-match"] == '"langgraph-v2"'
+
+
+async def test_errors_are_not_cached(api: Api, monkeypatch: pytest.MonkeyPatch) -> None:
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(404))
+    )
+    monkeypatch.setattr(github, "get_async_client", lambda: client)
+    assert await github.aget_github_repo("nobody", "nothing") == github.REPO_ERROR
+    assert len(github.repo_cache) == 0
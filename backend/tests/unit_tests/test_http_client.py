@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+import requests
+
+from gen_ui_backend.tools import weather
+from gen_ui_backend.tools.http_client import SingleFlight
+
+
+def test_single_flight_shares_one_call_between_threads() -> None:
+    flight = SingleFlight()
+    calls = 0
+    started = threading.Event()
+
+    def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        started.set()
+        time.sleep(0.05)
+        return "result"
+
+    results: List[str] = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert calls == 1
+    assert results == ["result"] * 4
+    # Once it's done, the next call for the key does the work again.
+    assert flight.do("k", fetch) == "result"
+    assert calls == 2
+
+
+def test_single_flight_shares_the_error() -> None:
+    flight = SingleFlight()
+
+    def fail() -> None:
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+async def test_single_flight_async_survives_a_cancelled_caller() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    first = asyncio.create_task(flight.ado("k", fetch))
+    second = asyncio.create_task(flight.ado("k", fetch))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "result"
+    assert first.cancelled()
+    assert calls == 1
+
+
+class FakeSession:
+    """Answers `get` like `requests.Session`, from a URL -> JSON mapping."""
+
+    def __init__(self, pages: Dict[str, Any]) -> None:
+        self.pages = pages
+        self.requests: List[str] = []
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        self.requests.append(url)
+        response = requests.Response()
+        page = next((v for k, v in self.pages.items() if url.startswith(k)), None)
+        response.status_code = 200 if page is not None else 404
+        response._content = httpx.Response(200, json=page).content
+        return response
+
+
+PAGES = {
+    "https://geo.test/": {"latt": "30.27", "longt": "-97.74"},
+    "https://weather.test/points/": {
+        "properties": {"forecast": "https://weather.test/forecast/1"}
+    },
+    "https://weather.test/forecast/": {
+        "properties": {"periods": [{"temperature": 91}]}
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def weather_apis(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GEOCODE_API_KEY", "test")
+    monkeypatch.setattr(weather, "GEOCODE_API_URL", "https://geo.test")
+    monkeypatch.setattr(weather, "WEATHER_GOV_API_URL", "https://weather.test")
+    for cache in (weather.geocode_cache, weather.points_cache, weather.forecast_cache):
+        cache.clear()
+
+
+def test_weather_lookups_are_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    session = FakeSession(PAGES)
+    monkeypatch.setattr(weather, "get_session", lambda: session)
+    assert weather.get_weather_data("Austin", "TX")["temperature"] == 91
+    assert len(session.requests) == 3
+    weather.forecast_cache.clear()
+    assert weather.get_weather_data("Austin", "TX")["temperature"] == 91
+    # The city's coordinates and forecast URL were kept; only the forecast is fetched.
+    assert len(session.requests) == 4
+    assert session.requests[-1] == "https://weather.test/forecast/1"
+
+
+def test_failed_weather_lookups_are_not_cached(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    session = FakeSession({})
+    monkeypatch.setattr(weather, "get_session", lambda: session)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            weather.get_weather_data("Austin", "TX")
+    assert len(session.requests) == 2
+
+
+async def test_concurrent_weather_lookups_share_requests(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    urls: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        urls.append(str(request.url))
+        await asyncio.sleep(0.01)
+        page = next(v for k, v in PAGES.items() if str(request.url).startswith(k))
+        return httpx.Response(200, json=page)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(weather, "get_async_client", lambda: client)
+    results = await asyncio.gather(
+        *(weather.aget_weather_data("Austin", "TX") for _ in range(5))
+    )
+    assert [r["temperature"] for r in results] == [91] * 5
+    assert len(urls) == 3
+    await client.aclose()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from gen_ui_backend.charts.indexes import NameIndex, trigrams
+
+NAMES = [
+    "apples",
+    "apples, applesauce",
+    "apple juice",
+    "blackberries",
+    "blueberries",
+    "pears",
+]
+
+
+@pytest.fixture
+def index() -> NameIndex:
+    return NameIndex(np.array(NAMES))
+
+
+def names(index: NameIndex, term: str, threshold: float = 0.5) -> list:
+    return [NAMES[code] for code, _ in index.match(term, threshold)]
+
+
+def test_exact_name_only_matches_itself(index: NameIndex) -> None:
+    assert index.match("Apples", 0.5) == [(0, 1.0)]
+    assert names(index, " pears ") == ["pears"]
+
+
+def test_words_match_every_name_containing_them(index: NameIndex) -> None:
+    # Singular or plural, ranked by the share of each name's words they cover.
+    assert names(index, "apple") == ["apples", "apples, applesauce", "apple juice"]
+    assert names(index, "juice apples") == ["apple juice"]
+
+
+def test_typos_match_the_most_similar_name_only(index: NameIndex) -> None:
+    assert names(index, "bluberries") == ["blueberries"]
+    assert names(index, "blackbery") == ["blackberries"]
+    [(code, score)] = index.match("bluberries", 0.5)
+    assert 0.5 <= score < 1
+
+
+def test_threshold_rejects_dissimilar_terms(index: NameIndex) -> None:
+    assert names(index, "kiwi") == []
+    assert names(index, "bluberries", threshold=0.9) == []
+
+
+def test_codes_are_sorted_and_unique(index: NameIndex) -> None:
+    codes = index.codes(["pears", "bluberries", "pear"], 0.5)
+    assert codes.tolist() == [4, 5]
+    assert index.codes([], 0.5).tolist() == []
+
+
+def test_trigrams_are_padded_per_word() -> None:
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+    assert trigrams("a b") == {"  a", " a ", "  b", " b "}
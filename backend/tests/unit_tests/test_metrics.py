@@ -0,0 +1,30 @@
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from gen_ui_backend.cache import mark_cached
+from gen_ui_backend.metrics import LLMMetricsCallbackHandler, llm_tokens
+
+USAGE = {"input_tokens": 120, "output_tokens": 8, "total_tokens": 128}
+
+
+def prompt_tokens(node: str) -> float:
+    series = llm_tokens._series.get((node, "prompt"))
+    return series[-1] if series else 0
+
+
+def test_cached_responses_record_no_tokens() -> None:
+    handler = LLMMetricsCallbackHandler()
+    generations = [ChatGeneration(message=AIMessage(content="", usage_metadata=USAGE))]
+    for cached, tokens in ((False, 120), (True, 0)):
+        run_id = uuid4()
+        handler.on_chat_model_start(
+            {}, [], run_id=run_id, metadata={"langgraph_node": "test_node"}
+        )
+        before = prompt_tokens("test_node")
+        response = LLMResult(
+            generations=[mark_cached(generations) if cached else generations]
+        )
+        handler.on_llm_end(response, run_id=run_id)
+        assert prompt_tokens("test_node") - before == tokens
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+from langchain_core.runnables import Runnable
+
+from gen_ui_backend.charts import chain
+from gen_ui_backend.charts.prompts import compact_display_formats, compact_filters
+from gen_ui_backend.charts.schema import Filter
+
+DISPLAY_FORMATS = [
+    {
+        "key": key,
+        "title": key.replace("_", " ").title(),
+        "chartType": chart_type,
+        "description": f"Shows the {key} chart.",
+    }
+    for chart_type, key in [
+        ("bar", "bar_average_retail_price_by_fruit"),
+        ("bar", "bar_average_retail_price_by_form"),
+        ("pie", "pie_fruit_form_distribution"),
+        ("pie", "fruit_pie"),
+        ("pie", "retail_price_pie"),
+        ("line", "line_retail_price_by_fruit"),
+    ]
+]
+
+STATE = {
+    "input": {"content": "fresh fruit under $2"},
+    "fruits": [{"name": "Apples", "form": "Fresh", "retailPrice": 1.0}],
+    "display_formats": DISPLAY_FORMATS,
+    "selected_filters": Filter(form="fresh", maxRetailPrice=2),
+    "chart_type": "pie",
+}
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The chains' chat model is only built, never called.
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+def render(runnable: Runnable, input: dict) -> str:
+    return runnable.first.invoke(input).to_string()  # type: ignore[attr-defined]
+
+
+def test_compact_chart_type_prompt_lists_every_format() -> None:
+    prompt = render(chain.chart_type_chain(True), chain.chart_type_input(STATE, True))  # type: ignore[arg-type]
+    for item in DISPLAY_FORMATS:
+        assert f"{item['key']}: {item['title']}" in prompt
+        assert item["description"] not in prompt
+    assert '{"form":"fresh","maxRetailPrice":2.0}' in prompt
+
+
+@pytest.mark.parametrize("chart_type", ["bar", "pie", "line"])
+def test_compact_display_format_prompt_lists_the_chart_types_formats(
+    chart_type: str,
+) -> None:
+    runnable, input = chain.display_format_chain_and_input(
+        {**STATE, "chart_type": chart_type},  # type: ignore[arg-type]
+        compact=True,
+    )
+    prompt = render(runnable, input)
+    for item in DISPLAY_FORMATS:
+        assert (item["key"] in prompt) is (item["chartType"] == chart_type)
+
+
+def test_compact_chart_config_prompt_lists_every_format() -> None:
+    runnable, input = chain.chart_config_chain_and_input(
+        {**STATE, "selected_filters": None},  # type: ignore[arg-type]
+        compact=True,
+    )
+    prompt = render(runnable, input)
+    for item in DISPLAY_FORMATS:
+        assert f"{item['key']}: {item['title']}" in prompt
+
+
+def test_format_order_does_not_change_the_listing() -> None:
+    shuffled = random.Random(0).sample(DISPLAY_FORMATS, len(DISPLAY_FORMATS))
+    listing = compact_display_formats(DISPLAY_FORMATS)  # type: ignore[arg-type]
+    assert compact_display_formats(shuffled) == listing  # type: ignore[arg-type]
+    assert listing.splitlines()[0] == "bar:"
+    assert compact_display_formats(shuffled, "pie").splitlines() == [  # type: ignore[arg-type]
+        "fruit_pie: Fruit Pie",
+        "pie_fruit_form_distribution: Pie Fruit Form Distribution",
+        "retail_price_pie: Retail Price Pie",
+    ]
+
+
+def test_compact_filters_drop_unset_fields() -> None:
+    assert compact_filters(None) == "none"
+    assert compact_filters(Filter(form="fresh")) == '{"form":"fresh"}'
@@ -0,0 +1,257 @@
+import asyncio
+import gzip
+import json
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from gen_ui_backend import scheduler as scheduler_module
+from gen_ui_backend.scheduler import (
+    BATCH,
+    INTERACTIVE,
+    AdaptiveLimiter,
+    OutboundScheduler,
+    priority,
+)
+
+URL = "https://api.openai.com/v1/chat/completions"
+
+
+def completion_request(content: str = "hi", stream: bool = False) -> httpx.Request:
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]}
+    if stream:
+        body["stream"] = True
+    return httpx.Request("POST", URL, json=body)
+
+
+def gzipped(status: int, body: Dict[str, Any], **headers: str) -> httpx.Response:
+    return httpx.Response(
+        status,
+        headers={"Content-Encoding": "gzip", **headers},
+        content=gzip.compress(json.dumps(body).encode()),
+    )
+
+
+async def test_limiter_grants_interactive_before_batch() -> None:
+    limiter = AdaptiveLimiter(initial=1, maximum=1)
+    started = await limiter.aacquire(INTERACTIVE)
+    order: List[str] = []
+
+    async def wait(name: str, level: int) -> None:
+        await limiter.aacquire(level)
+        order.append(name)
+        limiter.release(0.0)
+
+    waiters = [
+        asyncio.create_task(wait("batch", BATCH)),
+        asyncio.create_task(wait("interactive", INTERACTIVE)),
+    ]
+    await asyncio.sleep(0.01)
+    assert order == []
+    limiter.release(started)
+    await asyncio.gather(*waiters)
+    assert order == ["interactive", "batch"]
+
+
+def test_limiter_halves_once_per_round_and_grows_on_success() -> None:
+    limiter = AdaptiveLimiter(initial=8, maximum=64)
+    first, second = limiter.acquire(INTERACTIVE), limiter.acquire(INTERACTIVE)
+    limiter.release(first, throttled=True)
+    # Sent before the decrease, so it doesn't decrease the limit again.
+    limiter.release(second, throttled=True)
+    assert limiter.limit == 4
+    limiter.release(limiter.acquire(INTERACTIVE))
+    assert limiter.limit == 4.25
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_gives_up_its_slot() -> None:
+    async def main() -> None:
+        limiter = AdaptiveLimiter(initial=1, maximum=1)
+        started = await limiter.aacquire(INTERACTIVE)
+        waiter = asyncio.create_task(limiter.aacquire(INTERACTIVE))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release(started)
+        assert limiter.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_retries_rate_limited_requests() -> None:
+    replies = [
+        httpx.Response(429, headers={"retry-after-ms": "1"}),
+        httpx.Response(429, headers={"retry-after-ms": "1"}),
+        httpx.Response(200, json={"id": "ok"}),
+    ]
+    scheduler = OutboundScheduler(concurrency=4)
+    inner = httpx.MockTransport(lambda request: replies.pop(0))
+    response = scheduler.send(completion_request(), inner)
+    assert response.status_code == 200
+    assert response.json() == {"id": "ok"}
+    assert scheduler.stats == {
+        "requests": 3,
+        "coalesced": 0,
+        "throttled": 2,
+        "errors": 0,
+    }
+    assert scheduler.limiter.in_flight == 0
+
+
+def test_gives_up_after_max_retries() -> None:
+    scheduler = OutboundScheduler(concurrency=4, max_retries=2)
+    inner = httpx.MockTransport(
+        lambda request: httpx.Response(429, headers={"retry-after-ms": "1"})
+    )
+    response = scheduler.send(completion_request(), inner)
+    assert response.status_code == 429
+    assert scheduler.stats["requests"] == 3
+    assert scheduler.stats["throttled"] == 3
+
+
+def test_retries_server_errors_and_unsent_requests(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(scheduler_module, "retry_delay", lambda *args: 0)
+    replies: List[Any] = [
+        httpx.ConnectError("refused"),
+        httpx.ReadTimeout("timed out"),
+        httpx.Response(503),
+        httpx.Response(200, json={"id": "ok"}),
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    scheduler = OutboundScheduler(concurrency=4)
+    response = scheduler.send(completion_request(), httpx.MockTransport(handler))
+    assert response.json() == {"id": "ok"}
+    assert scheduler.stats["errors"] == 3
+    assert scheduler.stats["throttled"] == 0
+    # Only rate limiting lowers the limit.
+    assert scheduler.limiter.limit > 4
+    assert scheduler.limiter.in_flight == 0
+
+
+def test_client_errors_are_not_retried() -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(400, json={"error": "bad request"})
+
+    scheduler = OutboundScheduler()
+    response = scheduler.send(completion_request(), httpx.MockTransport(handler))
+    assert response.status_code == 400
+    assert calls == 1
+
+
+def test_decodes_compressed_replies_once() -> None:
+    scheduler = OutboundScheduler()
+    inner = httpx.MockTransport(lambda request: gzipped(200, {"id": "gzipped"}))
+    with httpx.Client(transport=inner) as client:
+        # What the scheduler wraps: a plain client decodes it fine.
+        assert client.send(completion_request()).json() == {"id": "gzipped"}
+    response = scheduler.send(completion_request(), inner)
+    assert response.json() == {"id": "gzipped"}
+    assert "content-encoding" not in response.headers
+
+
+async def test_coalesces_identical_requests_in_flight() -> None:
+    calls = 0
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return gzipped(200, {"id": "shared"})
+
+    scheduler = OutboundScheduler()
+    inner = httpx.MockTransport(handler)
+    requests = [
+        asyncio.create_task(scheduler.asend(completion_request(), inner))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+    responses = await asyncio.gather(*requests)
+    assert calls == 1
+    assert [r.json() for r in responses] == [{"id": "shared"}] * 3
+    assert scheduler.stats["coalesced"] == 2
+    assert scheduler.limiter.in_flight == 0
+
+
+async def test_follower_takes_over_from_a_cancelled_leader() -> None:
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.Event().wait()  # the leader's call, never answered
+        return httpx.Response(200, json={"id": "follower"})
+
+    scheduler = OutboundScheduler()
+    inner = httpx.MockTransport(handler)
+    leader = asyncio.create_task(scheduler.asend(completion_request(), inner))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(scheduler.asend(completion_request(), inner))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    response = await follower
+    assert response.json() == {"id": "follower"}
+    assert calls == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert scheduler.limiter.in_flight == 0
+
+
+async def test_coalesced_requests_share_the_error() -> None:
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await release.wait()
+        raise httpx.ConnectError("refused", request=request)
+
+    scheduler = OutboundScheduler(max_retries=0)
+    inner = httpx.MockTransport(handler)
+    requests = [
+        asyncio.create_task(scheduler.asend(completion_request(), inner))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*requests, return_exceptions=True)
+    assert all(isinstance(result, httpx.ConnectError) for result in results)
+    assert scheduler.limiter.in_flight == 0
+
+
+async def test_streamed_requests_are_not_coalesced() -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        # Unread, like a response from the network, so the slot is held until closed.
+        return httpx.Response(200, stream=httpx.ByteStream(b"data: [DONE]\n\n"))
+
+    scheduler = OutboundScheduler()
+    inner = httpx.MockTransport(handler)
+    with priority(BATCH):
+        responses = await asyncio.gather(
+            *(scheduler.asend(completion_request(stream=True), inner) for _ in range(2))
+        )
+    assert calls == 2
+    assert scheduler.limiter.in_flight == 2
+    for response in responses:
+        assert await response.aread() == b"data: [DONE]\n\n"
+        await response.aclose()
+    assert scheduler.limiter.in_flight == 0
@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from gen_ui_backend.server import create_app
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    # The chart nodes' chat model is built, but these requests never reach it.
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    return TestClient(create_app(warmup="off"))
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        (
+            "/charts/invoke",
+            {
+                "input": {
+                    "input": {"content": "apples"},
+                    "dataset_id": "nope",
+                    "display_formats": [],
+                }
+            },
+        ),
+        ("/charts/rows", {"dataset_id": "nope"}),
+        (
+            "/batch/charts",
+            {"dataset_id": "nope", "inputs": ["apples"], "display_formats": []},
+        ),
+    ],
+)
+def test_unknown_datasets_are_not_found(
+    client: TestClient, path: str, body: dict
+) -> None:
+    response = client.post(path, json=body)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Unknown dataset: nope"}
+
+
+def test_rows_are_served_by_offset(client: TestClient) -> None:
+    body = {"dataset_id": "fruits", "selected_filters": {"form": "fresh"}}
+    first = client.post("/charts/rows", json={**body, "limit": 5}).json()
+    rest = client.post("/charts/rows", json={**body, "offset": 5}).json()
+    assert len(first["rows"]) == 5
+    assert rest["offset"] == 5
+    assert len(rest["rows"]) == first["total_rows"] - 5
+    assert all(row["form"].lower() == "fresh" for row in first["rows"] + rest["rows"])
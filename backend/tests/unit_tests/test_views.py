@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from gen_ui_backend.charts.aggregate import AGGREGATIONS, aggregate
+from gen_ui_backend.charts.datasets import (
+    DATASET_FILES,
+    DATASETS_DIR,
+    Dataset,
+    load_csv,
+)
+from gen_ui_backend.charts.filters import filter_indices
+from gen_ui_backend.charts.schema import Filter
+from gen_ui_backend.charts.views import MaterializedViews, filter_key, popular_filters
+
+FILTERS = [
+    None,
+    Filter(form="fresh"),
+    Filter(form="Canned"),
+    Filter(name=["apples", "pears"]),
+    Filter(minRetailPrice=1, maxRetailPrice=2),
+    Filter(form="frozen", maxCupEquivalentPrice=1),
+    Filter(name=["no such fruit"]),
+]
+
+
+@pytest.fixture(scope="module")
+def dataset() -> Dataset:
+    return load_csv("fruits", DATASETS_DIR / DATASET_FILES["fruits"])
+
+
+def live(dataset: Dataset, selected_filters: Optional[Filter], key: str) -> dict:
+    return aggregate(dataset, filter_indices(dataset, selected_filters), key)  # type: ignore[return-value]
+
+
+@pytest.mark.parametrize("selected_filters", FILTERS)
+def test_views_match_live_aggregation(
+    dataset: Dataset, selected_filters: Optional[Filter]
+) -> None:
+    views = MaterializedViews()
+    for key in AGGREGATIONS:
+        expected = live(dataset, selected_filters, key)
+        # Built on the first lookup, then served from the view.
+        assert views.get(dataset, selected_filters, key) == expected
+        assert views.get(dataset, selected_filters, key) == expected
+    assert views.stats["hits"] == views.stats["misses"] == len(AGGREGATIONS)
+
+
+def test_eagerly_built_and_shared_views_match_live_aggregation(
+    dataset: Dataset, tmp_path: Path
+) -> None:
+    path = str(tmp_path / "views.sqlite")
+    builder = MaterializedViews(path=path)
+    builder.build(dataset, popular_filters(dataset) + FILTERS)
+    reader = MaterializedViews(path=path)
+    for selected_filters in FILTERS:
+        for key in AGGREGATIONS:
+            expected = live(dataset, selected_filters, key)
+            assert builder.get(dataset, selected_filters, key) == expected
+            # Read back from the file, through JSON.
+            assert reader.get(dataset, selected_filters, key) == expected
+    assert reader.stats["misses"] == 0
+
+
+def test_given_indices_and_equivalent_filters_share_a_view(dataset: Dataset) -> None:
+    views = MaterializedViews()
+    selected_filters = Filter(name=["Pears", "apples"])
+    indices = np.asarray(filter_indices(dataset, selected_filters), dtype=np.intp)
+    key = "bar_average_retail_price_by_form"
+    assert views.get(dataset, selected_filters, key, indices) == live(
+        dataset, selected_filters, key
+    )
+    same = Filter(name=["pears", "APPLES"])
+    assert filter_key(same) == filter_key(selected_filters)
+    assert views.get(dataset, same, key) == live(dataset, same, key)
+    assert views.stats["hits"] == 1
+
+
+def test_a_new_dataset_version_invalidates_its_views() -> None:
+    records = [
+        {"name": "Apples", "form": "Fresh", "retailPrice": 1.0},
+        {"name": "Pears", "form": "Fresh", "retailPrice": 2.0},
+    ]
+    views = MaterializedViews()
+    old = Dataset.from_records("fruits", records)
+    views.get(old, None, "fruit_pie")
+    new = Dataset.from_records(
+        "fruits", records + [{"name": "Plums", "form": "Dried", "retailPrice": 3.0}]
+    )
+    assert views.get(new, None, "fruit_pie") == live(new, None, "fruit_pie")
+    assert views.stats["invalidated"] == 1
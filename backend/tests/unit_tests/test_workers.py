@@ -0,0 +1,60 @@
+import threading
+import time
+from socket import socket
+from typing import List
+
+from gen_ui_backend import workers
+from gen_ui_backend.workers import Worker, WorkerPool
+
+
+def crash() -> None:
+    raise SystemExit(3)
+
+
+def serve() -> None:
+    time.sleep(60)
+
+
+class FakePool(WorkerPool):
+    """Spawns processes running `targets` in turn (the last one from then on)."""
+
+    def __init__(self, targets: list, **kwargs) -> None:
+        super().__init__("unused:app", port=0, **kwargs)
+        self.targets = targets
+        self.spawned: List[float] = []
+
+    def _spawn(self, sockets: List[socket]) -> Worker:
+        target = self.targets[min(len(self.spawned), len(self.targets) - 1)]
+        self.spawned.append(time.monotonic())
+        ready = workers.spawn.Event()
+        ready.set()
+        process = workers.spawn.Process(target=target)
+        process.start()
+        return process, ready
+
+
+def stop_when(pool: FakePool, done) -> None:
+    def watch() -> None:
+        while not done():
+            time.sleep(0.01)
+        pool._exit.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def test_replaces_a_crashed_worker_and_stops_them_all() -> None:
+    pool = FakePool([crash, serve, serve], workers=2, restart_backoff=0.01)
+    stop_when(pool, lambda: len(pool.spawned) == 3)
+    assert pool.run() == 0
+    assert len(pool.spawned) == 3
+    assert not any(process.is_alive() for process, _ in pool.processes)
+
+
+def test_crash_loops_back_off_then_exit_non_zero() -> None:
+    pool = FakePool([crash], workers=1, restart_backoff=0.1, max_restarts=3)
+    assert pool.run() == 1
+    # The first start and three replacements, each waiting twice as long as the last.
+    assert len(pool.spawned) == 4
+    gaps = [b - a for a, b in zip(pool.spawned, pool.spawned[1:])]
+    for gap, backoff in zip(gaps, [0.1, 0.2, 0.4]):
+        assert gap >= backoff
@@ -37,12 +37,22 @@ type FilterGraphInput = {
   input: string;
   fruits: Fruits[];
   display_formats: Omit<DataDisplayTypeAndDescription, "propsFn">[];
-  
+  /**
+   * Identifies the conversation, so follow-ups can refine the previous query
+   * when the backend runs with sessions enabled.
+   */
+  sessionId?: string;
 };
-type FilterGraphRunnableInput = Omit<FilterGraphInput, "input"> & {
+type FilterGraphRunnableInput = Omit<FilterGraphInput, "input" | "sessionId"> & {
   input: { content: string };
 };
 type CreateStreamableUIReturnType = ReturnType<typeof createStreamableUI>;
+type FilteredRowsPage = {
+  page: number;
+  pages: number;
+  total_rows: number;
+  rows: Fruits[];
+};
 
 function handleSelectedFilters(
   selectedFilters: Partial<Filter>,
@@ -89,6 +99,44 @@ function handleSelectedFilters(
   ui.update(buttonsDiv);
 }
 
+function handleFilteredRows(
+  page: FilteredRowsPage,
+  ui: CreateStreamableUIReturnType,
+) {
+  // Rows arrive before the chart is chosen, so show the first page straight away.
+  // Only the first page(s) are streamed; the rest are served by POST /charts/rows.
+  if (page.page !== 0) {
+    return;
+  }
+  ui.append(
+    <div className="px-6 mt-4">
+      <p className="text-sm text-gray-600 mb-2">
+        {page.total_rows} matching items
+      </p>
+      <div className="max-h-64 overflow-auto">
+        <table className="w-full text-sm text-left">
+          <thead>
+            <tr className="text-gray-800">
+              <th>Name</th>
+              <th>Form</th>
+              <th>Retail Price</th>
+            </tr>
+          </thead>
+          <tbody>
+            {page.rows.map((row, index) => (
+              <tr key={index} className="text-gray-600">
+                <td>{row.name}</td>
+                <td>{row.form}</td>
+                <td>{row.retailPrice.toFixed(2)}</td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      </div>
+    </div>,
+  );
+}
+
 function handleChartType(
   chartType: ChartType,
   ui: CreateStreamableUIReturnType,
@@ -104,7 +152,7 @@ function handleChartType(
 
 function handleConstructingCharts(
   input: {
-    fruits: Fruits[];
+    props: BarChartProps | PieChartProps | LineChartProps | null;
     chartType: ChartType;
     displayFormat: string;
   },
@@ -121,10 +169,13 @@ function handleConstructingCharts(
       `Display format ${input.displayFormat} not found in DISPLAY_FORMATS`,
     );
   }
+  if (!input.props) {
+    throw new Error(
+      `No chart props were computed for display format ${input.displayFormat}`,
+    );
+  }
   let barChart;
-  //console.log(displayDataObj)
-  const props = displayDataObj.propsFn(input.fruits);
-  //console.log(props)
+  const props = input.props;
   if (input.chartType === "bar") {
     barChart = <BarChart {...(props as BarChartProps)} />;
   } else if (input.chartType === "pie") {
@@ -191,7 +242,7 @@ function handleDisplayFormat(
 
 
 
-async function filterGraph(inputs: FilterGraphInput) {
+async function filterGraph({ sessionId, ...inputs }: FilterGraphInput) {
   "use server";
 
   /*const client = new Client({
@@ -215,7 +266,8 @@ async function filterGraph(inputs: FilterGraphInput) {
   const streamEventsRunnable = RunnableLambda.from(async function* (
     input: FilterGraphRunnableInput,
   ) {
-    const streamResponse = remoteRunnable.streamEvents(input,{version:'v2'
+    const streamResponse = remoteRunnable.streamEvents(input,{version:'v2',
+      configurable: { thread_id: sessionId },
     });
     for await (const event of streamResponse) {
       //console.log(event)
@@ -240,7 +292,9 @@ async function filterGraph(inputs: FilterGraphInput) {
     }
     // console.log(name)
     
-    if (name === "generate_filters") {
+    if (name === "filtered_rows") {
+      return handleFilteredRows(data.output, fields.ui);
+    } else if (name === "generate_filters") {
       const { selected_filters }: { selected_filters: Partial<Filter> } =
         data.output;
       return handleSelectedFilters(selected_filters, fields.ui);
@@ -250,17 +304,24 @@ async function filterGraph(inputs: FilterGraphInput) {
     } else if (name === "generate_data_display_format") {
       displayFormat = data.output.display_format;
       return handleDisplayFormat(displayFormat, chartType, fields.ui);
-    } else if (name === "filter_data") {
-      const {fruits } = data.output;
+    } else if (name === "generate_chart_config") {
+      // In `single_call` mode one node picks the filters, chart type and display
+      // format together.
+      chartType = data.output.chart_type;
+      displayFormat = data.output.display_format;
+      handleSelectedFilters(data.output.selected_filters, fields.ui);
+      return handleChartType(chartType, fields.ui);
+    } else if (name === "aggregate_data") {
+      // The backend aggregates the filtered rows into chart props.
+      const { props } = data.output;
       if ( !displayFormat || !chartType) {
         throw new Error(
           "Chart type and display format must be set before filtering data",
         );
       }
-      //console.log(fruits)
       return handleConstructingCharts(
         {
-          fruits,
+          props,
           chartType,
           displayFormat,
         },
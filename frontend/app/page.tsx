@@ -140,6 +140,7 @@ function ChartContent() {
   const [loading, setLoading] = useState(false);
   const [elements, setElements] = useState<JSX.Element[]>([]);
   const [fruits, setFruits] = useState<Fruits[]>([]);
+  const [sessionId] = useState(() => crypto.randomUUID());
   const [selectedFilters, setSelectedFilters] = useState<Partial<Filter>>();
   const [selectedChartType, setSelectedChartType] = useState<ChartType>("bar");
   const [currentFilter, setCurrentFilter] = useState("");
@@ -309,6 +310,7 @@ function ChartContent() {
     const element = await actions.filterGraph({
       input,
       fruits,
+      sessionId,
       display_formats: DISPLAY_FORMATS.map((d) => ({
         title: d.title,
         description: d.description,
@@ -56,5 +56,8 @@ export interface Filter {
   name?: string;
   form?: string;
   retailPrice?: string;
-  
+  minRetailPrice?: number;
+  maxRetailPrice?: number;
+  minCupEquivalentPrice?: number;
+  maxCupEquivalentPrice?: number;
 }